@@ -0,0 +1,76 @@
+"""
+Нативные async-представления элементов для запуска под ASGI.
+
+Правило доступа, пользователь из JWT и сами элементы читаются через
+async ORM и async API кеша, без отдельного потока на запрос.
+Права применяются так же, как в ElementViewSet: чтение фильтруется
+в SQL (чужой недоступный элемент — 404), создание требует create_permission.
+"""
+from asgiref.sync import sync_to_async
+from rest_framework import status
+from rest_framework.exceptions import NotFound
+
+from my_auth.async_views import AsyncAPIView, json_response
+from users.models import Element
+
+from .permissions import RoleAccessPermission
+from .serializers import ElementSerializer
+from .views import ElementPagination
+
+
+class AsyncElementMixin:
+    authentication_required = True
+    permission_classes = [RoleAccessPermission]
+    model = Element
+    owner_field = 'owner'
+    serializer_class = ElementSerializer
+
+    async def aget_access_rule(self):
+        """Правило роли пользователя для Element, кешируется на запрос."""
+        if not hasattr(self, '_access_rule'):
+            self._access_rule = await RoleAccessPermission.aget_rule(
+                self.request.user, self.model
+            )
+        return self._access_rule
+
+    async def get_queryset(self):
+        queryset = self.model.objects.select_related(self.owner_field).order_by('id')
+        return RoleAccessPermission.filter_by_rule(
+            await self.aget_access_rule(), self.request.user, queryset,
+            self.request.method, self.owner_field,
+        )
+
+
+class AsyncElementListView(AsyncElementMixin, AsyncAPIView):
+    """
+    Async-варианты списка и создания элементов (ElementViewSet).
+    """
+
+    async def get(self, request):
+        paginator = ElementPagination()
+        page = await paginator.apaginate_queryset(await self.get_queryset(),
+                                                  request, self)
+        data = self.serializer_class(page, many=True).data
+        return json_response(paginator.get_paginated_data(data))
+
+    async def post(self, request):
+        serializer = self.serializer_class(data=self.parse(request))
+        # Валидация владельца (PrimaryKeyRelatedField) обращается к базе
+        await sync_to_async(serializer.is_valid)(raise_exception=True)
+        # create_permission проверен в RoleAccessPermission.ahas_permission
+        data = {**serializer.validated_data, self.owner_field: request.user}
+        element = await self.model.objects.acreate(**data)
+        return json_response(self.serializer_class(element).data,
+                             status_code=status.HTTP_201_CREATED)
+
+
+class AsyncElementDetailView(AsyncElementMixin, AsyncAPIView):
+    """
+    Async-вариант получения элемента (ElementViewSet.retrieve).
+    """
+
+    async def get(self, request, pk):
+        element = await (await self.get_queryset()).filter(pk=pk).afirst()
+        if element is None:
+            raise NotFound()
+        return json_response(self.serializer_class(element).data)
@@ -0,0 +1,207 @@
+import logging
+
+from django.db import DatabaseError, transaction
+from rest_framework import status
+from rest_framework.decorators import action
+from rest_framework.exceptions import ValidationError
+from rest_framework.response import Response
+
+from users import response_cache
+
+from .permissions import RoleAccessPermission
+
+logger = logging.getLogger(__name__)
+
+
+BULK_WRITE_ERROR = {'detail': "Не удалось сохранить объект", 'code': 'write_failed'}
+
+
+def chunked(items, size):
+    for start in range(0, len(items), size):
+        yield items[start:start + size]
+
+
+class BulkModelMixin:
+    """
+    Пакетные операции для ModelViewSet с RoleAccessPermission:
+        POST   <prefix>/bulk/  [{...}, ...]               — создание
+        PUT    <prefix>/bulk/  [{"id": 1, ...}, ...]      — обновление
+        PATCH  <prefix>/bulk/  [{"id": 1, ...}, ...]      — частичное обновление
+        DELETE <prefix>/bulk/  [1, 2, ...]                — удаление
+
+    Правило доступа читается один раз на запрос. Изменяемые и удаляемые
+    объекты выбираются из queryset представления с фильтром прав метода
+    (get_bulk_queryset): недоступные получают 404, как в get_object.
+    Запись идёт через bulk_create, bulk_update и DELETE ... WHERE id IN
+    отдельными транзакциями по bulk_chunk_size объектов. В ответе —
+    результат по каждому элементу в порядке запроса. Кешированные списки
+    модели (users.response_cache) сбрасываются после операции.
+    """
+    bulk_chunk_size = 500
+    bulk_max_items = 10000
+    # Поле владельца; None — у модели нет владельца
+    owner_field = 'owner'
+
+    @action(detail=False, methods=['post', 'put', 'patch', 'delete'],
+            url_path='bulk')
+    def bulk(self, request):
+        items = request.data
+        if not isinstance(items, list):
+            raise ValidationError({'detail': "Ожидается список объектов"})
+        if len(items) > self.bulk_max_items:
+            raise ValidationError(
+                {'detail': f"Не более {self.bulk_max_items} объектов за запрос"}
+            )
+
+        get_access_rule = getattr(self, 'get_access_rule', None)
+        rule = (get_access_rule() if get_access_rule is not None
+                else RoleAccessPermission.get_rule(request.user, self.get_bulk_model()))
+        if request.method == 'POST':
+            results = self.perform_bulk_create(items, rule)
+        elif request.method == 'DELETE':
+            results = self.perform_bulk_destroy(items, rule)
+        else:
+            results = self.perform_bulk_update(items, rule,
+                                               partial=request.method == 'PATCH')
+        # bulk_create и bulk_update не вызывают сигналы: кеш ответов сбрасываем сами
+        model = self.get_bulk_model()
+        transaction.on_commit(lambda: response_cache.invalidate(model))
+        return Response({'results': results}, status=status.HTTP_200_OK)
+
+    def get_bulk_model(self):
+        return self.get_serializer_class().Meta.model
+
+    def get_bulk_fields(self):
+        """Поля, которые можно передать в пакетной операции."""
+        serializer = self.get_serializer_class()()
+        return [name for name, field in serializer.fields.items()
+                if not field.read_only and name != self.owner_field]
+
+    def validate_bulk_item(self, item, fields, partial=False):
+        serializer = self.get_serializer_class()(data=item, partial=partial,
+                                                 fields=fields)
+        if serializer.is_valid():
+            return serializer.validated_data, None
+        return None, serializer.errors
+
+    def save_chunks(self, objects, results, write, success_status):
+        """
+        Пишет объекты пачками в отдельных транзакциях. objects —
+        список пар (индекс в запросе, объект).
+        """
+        for chunk in chunked(objects, self.bulk_chunk_size):
+            try:
+                with transaction.atomic():
+                    write([obj for _, obj in chunk])
+            except DatabaseError:
+                # Текст ошибки базы (имена ограничений, SQL) клиенту не отдаём
+                logger.exception("Не удалось записать пачку объектов %s",
+                                 self.get_bulk_model()._meta.label)
+                for index, obj in chunk:
+                    results[index] = {'id': obj.pk, 'status': 400,
+                                      'errors': BULK_WRITE_ERROR}
+                continue
+            for index, obj in chunk:
+                results[index] = {'id': obj.pk, 'status': success_status}
+
+    def perform_bulk_create(self, items, rule):
+        model = self.get_bulk_model()
+        results = [None] * len(items)
+        if rule is None or not rule.create_permission:
+            return [{'status': 403} for _ in items]
+
+        fields = self.get_bulk_fields()
+        objects = []
+        for index, item in enumerate(items):
+            data, errors = self.validate_bulk_item(item, fields)
+            if errors:
+                results[index] = {'status': 400, 'errors': errors}
+                continue
+            obj = model(**data)
+            if self.owner_field is not None:
+                setattr(obj, self.owner_field, self.request.user)
+            objects.append((index, obj))
+
+        self.save_chunks(objects, results,
+                         lambda chunk: model.objects.bulk_create(chunk), 201)
+        return results
+
+    def get_bulk_queryset(self):
+        """Объекты, доступные пользователю для метода запроса."""
+        return self.filter_queryset(self.get_queryset())
+
+    def load_bulk_targets(self, ids):
+        return self.get_bulk_queryset().in_bulk(ids)
+
+    def perform_bulk_update(self, items, rule, partial=False):
+        model = self.get_bulk_model()
+        results = [None] * len(items)
+        # bool — подкласс int, поэтому проверяем тип точно
+        existing = self.load_bulk_targets(
+            [item['id'] for item in items
+             if isinstance(item, dict) and type(item.get('id')) is int]
+        )
+
+        fields = self.get_bulk_fields()
+        objects, changed = [], set()
+        for index, item in enumerate(items):
+            if not isinstance(item, dict) or type(item.get('id')) is not int:
+                results[index] = {'status': 400,
+                                  'errors': {'id': "Ожидается объект с целым id"}}
+                continue
+            obj = existing.get(item['id'])
+            if obj is None:
+                # Нет объекта или нет прав на него
+                results[index] = {'id': item['id'], 'status': 404}
+                continue
+            data, errors = self.validate_bulk_item(item, fields, partial=partial)
+            if errors:
+                results[index] = {'id': obj.pk, 'status': 400, 'errors': errors}
+                continue
+            for name, value in data.items():
+                setattr(obj, name, value)
+            changed.update(data)
+            objects.append((index, obj))
+
+        if changed:
+            # bulk_update не вызывает pre_save: поля auto_now обновляем сами
+            for field in model._meta.concrete_fields:
+                if getattr(field, 'auto_now', False):
+                    for _, obj in objects:
+                        field.pre_save(obj, add=False)
+                    changed.add(field.name)
+            self.save_chunks(
+                objects, results,
+                lambda chunk: model.objects.bulk_update(chunk, sorted(changed)),
+                200,
+            )
+        else:
+            for index, obj in objects:
+                results[index] = {'id': obj.pk, 'status': 200}
+        return results
+
+    def perform_bulk_destroy(self, items, rule):
+        results = [None] * len(items)
+        ids = list(dict.fromkeys(pk for pk in items if type(pk) is int))
+
+        # Проверка и DELETE идут по одному queryset с фильтром прав в одной
+        # транзакции: строки заблокированы, а при праве только на свои
+        # объекты сам DELETE ограничен owner_id
+        deleted = set()
+        for chunk in chunked(ids, self.bulk_chunk_size):
+            with transaction.atomic():
+                queryset = self.get_bulk_queryset().filter(pk__in=chunk)
+                found = list(queryset.select_for_update()
+                             .values_list('pk', flat=True))
+                queryset.filter(pk__in=found).delete()
+            deleted.update(found)
+
+        for index, pk in enumerate(items):
+            if type(pk) is not int:
+                results[index] = {'status': 400, 'errors': {'id': "Ожидается целый id"}}
+            elif pk in deleted:
+                results[index] = {'id': pk, 'status': 204}
+            else:
+                # Нет объекта или нет прав на него
+                results[index] = {'id': pk, 'status': 404}
+        return results
@@ -1,85 +1,189 @@
 from django.contrib.contenttypes.models import ContentType
 from rest_framework import permissions
 
-from users.models import AccessRule
+from users import access_cache
+from users.metrics import record_rbac_decision
+
+# Действие AccessRule, которое проверяется для HTTP-метода
+METHOD_ACTIONS = {
+    'GET': 'read',
+    'HEAD': 'read',
+    'OPTIONS': 'read',
+    'PUT': 'update',
+    'PATCH': 'update',
+    'DELETE': 'delete',
+}
+
+# id ContentType по модели для async-проверок: get_for_model
+# не имеет async-варианта, а ContentType не меняются
+_content_type_ids = {}
 
 
 class RoleAccessPermission(permissions.BasePermission):
     """
     Проверяет права пользователя на объект или тип объекта через AccessRule.
+    Правила берутся из скомпилированной таблицы users.access_cache,
+    поэтому проверка не обращается к базе на каждом запросе.
     """
 
+    @staticmethod
+    def get_rule(user, model_class):
+        """Флаги AccessRule для роли пользователя и модели (или None)."""
+        ct = ContentType.objects.get_for_model(model_class)
+        return access_cache.get_rule(user.role_id, ct.id)
+
+    @staticmethod
+    async def aget_rule(user, model_class):
+        """Асинхронный вариант get_rule."""
+        content_type_id = _content_type_ids.get(model_class)
+        if content_type_id is None:
+            opts = model_class._meta
+            content_type_id = await ContentType.objects.filter(
+                app_label=opts.app_label, model=opts.model_name
+            ).values_list('id', flat=True).aget()
+            _content_type_ids[model_class] = content_type_id
+        return await access_cache.aget_rule(user.role_id, content_type_id)
+
+    @staticmethod
+    def get_view_model(view):
+        """Модель view: атрибут model, иначе queryset или serializer_class."""
+        model_class = getattr(view, 'model', None)
+        if model_class is not None:
+            return model_class
+        # Не используем `or`: bool(queryset) выполнил бы запрос ко всей таблице
+        model_class = getattr(view, 'queryset', None)
+        if model_class is None:
+            model_class = getattr(view, 'serializer_class', None)
+        if hasattr(model_class, 'model'):
+            model_class = model_class.model
+        if hasattr(model_class, 'Meta'):
+            model_class = model_class.Meta.model
+        return model_class
+
+    def get_view_rule(self, user, view, model_class=None):
+        """
+        Правило для модели view. View с get_access_rule()
+        (RBACModelViewSet) отдаёт правило, уже найденное в этом запросе.
+        """
+        get_access_rule = getattr(view, 'get_access_rule', None)
+        if get_access_rule is not None:
+            return get_access_rule()
+        return self.get_rule(user, model_class or self.get_view_model(view))
+
+    async def aget_view_rule(self, user, view, model_class=None):
+        """Асинхронный вариант get_view_rule (view.aget_access_rule)."""
+        aget_access_rule = getattr(view, 'aget_access_rule', None)
+        if aget_access_rule is not None:
+            return await aget_access_rule()
+        return await self.aget_rule(user, model_class or self.get_view_model(view))
+
     def has_permission(self, request, view):
         """
-        Проверка прав на уровне View для SAFE_METHODS (GET, HEAD, OPTIONS).
-        Для создания/редактирования/удаления проверка делается на уровне объекта.
+        Проверка прав на уровне View: чтение (SAFE_METHODS) и создание (POST).
+        PUT/PATCH/DELETE ограничиваются фильтром queryset (filter_by_rule):
+        недоступный объект получает 404.
         """
         user = request.user
         if not user.is_authenticated or not user.is_active:
             return False
 
-        if request.method not in permissions.SAFE_METHODS:
-            # Все POST/PUT/PATCH/DELETE проверяем на уровне объекта
+        if not self.checks_view_rule(request):
             return True
 
-        # Для GET проверяем read_permission
-        model_class = (getattr(view, 'queryset', None)
-                       or getattr(view, 'serializer_class', None))
-        if hasattr(model_class, 'model'):
-            model_class = model_class.model
+        model_class = self.get_view_model(view)
+        rule = self.get_view_rule(user, view, model_class)
+        return self.check_view_rule(rule, request, model_class)
 
-        ct = ContentType.objects.get_for_model(model_class)
-        try:
-            rule = AccessRule.objects.get(role=user.role, content_type=ct)
-        except AccessRule.DoesNotExist:
+    async def ahas_permission(self, request, view):
+        """Асинхронный вариант has_permission для async-представлений."""
+        user = request.user
+        if not user.is_authenticated or not user.is_active:
             return False
 
-        return rule.read_permission or rule.read_all_permission
+        if not self.checks_view_rule(request):
+            return True
+
+        model_class = self.get_view_model(view)
+        rule = await self.aget_view_rule(user, view, model_class)
+        return self.check_view_rule(rule, request, model_class)
+
+    @staticmethod
+    def checks_view_rule(request):
+        """Проверяется ли метод по правилу на уровне View."""
+        return request.method in permissions.SAFE_METHODS or request.method == 'POST'
+
+    @staticmethod
+    def check_view_rule(rule, request, model_class):
+        if request.method == 'POST':
+            allowed = rule is not None and rule.create_permission
+        else:
+            # Своих объектов может не быть: достаточно права на чтение своих
+            allowed = RoleAccessPermission.is_allowed(rule, 'read', is_owner=True)
+        return record_rbac_decision(model_class, request.method, allowed)
 
     def has_object_permission(self, request, view, obj):
         user = request.user
         if not user.is_authenticated or not user.is_active:
             return False
 
-        ct = ContentType.objects.get_for_model(obj.__class__)
-        try:
-            rule = AccessRule.objects.get(role=user.role, content_type=ct)
-        except AccessRule.DoesNotExist:
+        rule = self.get_view_rule(user, view, obj.__class__)
+        return self.check_object_rule(rule, request, view, obj)
+
+    async def ahas_object_permission(self, request, view, obj):
+        """Асинхронный вариант has_object_permission."""
+        user = request.user
+        if not user.is_authenticated or not user.is_active:
             return False
 
-        is_owner = hasattr(obj, 'owner') and obj.owner == user
+        rule = await self.aget_view_rule(user, view, obj.__class__)
+        return self.check_object_rule(rule, request, view, obj)
 
-        if request.method in permissions.SAFE_METHODS:
-            return (rule.read_all_permission or
-                    (rule.read_permission if is_owner else False))
-        elif request.method == 'POST':
-            return rule.create_permission
-        elif request.method in ['PUT', 'PATCH']:
-            return (rule.update_all_permission or
-                    (rule.update_permission if is_owner else False))
-        elif request.method == 'DELETE':
-            return (rule.delete_all_permission or
-                    (rule.delete_permission if is_owner else False))
+    def check_object_rule(self, rule, request, view, obj):
+        # owner_id сравнивается без загрузки пользователя-владельца
+        owner_field = getattr(view, 'owner_field', 'owner')
+        is_owner = (owner_field is not None
+                    and getattr(obj, f'{owner_field}_id', None) == request.user.pk)
+        allowed = self.is_allowed(rule, METHOD_ACTIONS.get(request.method), is_owner)
+        return record_rbac_decision(obj.__class__, request.method, allowed)
 
-        return False
+    @staticmethod
+    def is_allowed(rule, action, is_owner):
+        """Право на действие read/update/delete для своего или чужого объекта."""
+        if rule is None or action is None:
+            return False
+        if getattr(rule, f'{action}_all_permission'):
+            return True
+        return is_owner and getattr(rule, f'{action}_permission')
 
     @staticmethod
-    def filter_queryset(user, queryset):
-        """  Фильтрует queryset по правам чтения пользователя.
+    def filter_queryset(user, queryset, method='GET', owner_field='owner'):
+        """Фильтрует queryset по правам пользователя для HTTP-метода.
     - Если user неактивен или неаутентифицирован → пустой queryset.
-    - Если AccessRule.read_all_permission=True → возвращает весь queryset.
-    - Иначе → возвращает только объекты, где owner=user."""
+    - Если есть *_all_permission для действия метода → весь queryset.
+    - Если есть только *_permission → объекты, где owner_id = user.id.
+    - Иначе → пустой queryset.
+    Для PUT/PATCH/DELETE запрет превращается в WHERE по owner_id
+    (get_object вернёт 404, как и при чтении чужого объекта)."""
 
         if not user.is_authenticated or not user.is_active:
             return queryset.none()
 
-        ct = ContentType.objects.get_for_model(queryset.model)
-        try:
-            rule = AccessRule.objects.get(role=user.role, content_type=ct)
-        except AccessRule.DoesNotExist:
+        rule = RoleAccessPermission.get_rule(user, queryset.model)
+        return RoleAccessPermission.filter_by_rule(rule, user, queryset,
+                                                   method, owner_field)
+
+    @staticmethod
+    def filter_by_rule(rule, user, queryset, method='GET', owner_field='owner'):
+        """
+        filter_queryset для уже найденного правила. owner_field=None —
+        у модели нет владельца, права только на свои объекты не дают доступа.
+        """
+        if rule is None or not user.is_authenticated or not user.is_active:
             return queryset.none()
 
-        if rule.read_all_permission:
+        action = METHOD_ACTIONS.get(method, 'read')
+        if getattr(rule, f'{action}_all_permission'):
             return queryset
-        else:
-            return queryset.filter(owner=user)
+        if owner_field and getattr(rule, f'{action}_permission'):
+            return queryset.filter(**{f'{owner_field}_id': user.pk})
+        return queryset.none()
@@ -4,7 +4,37 @@ from rest_framework import serializers
 from users.models import Element
 
 
-class ElementSerializer(serializers.ModelSerializer):
+class SparseFieldsMixin:
+    """
+    Позволяет ограничить набор полей сериализатора: fields=['id', 'name'].
+    """
+
+    def __init__(self, *args, fields=None, **kwargs):
+        super().__init__(*args, **kwargs)
+        if fields is not None:
+            for name in set(self.fields) - set(fields):
+                self.fields.pop(name)
+
+    def get_projection(self):
+        """
+        Колонки для only() и связи для select_related(), нужные
+        читаемым полям сериализатора.
+        """
+        only, related = set(), set()
+        for field in self.fields.values():
+            if field.write_only:
+                continue
+            path = field.source.replace('.', '__')
+            only.add(path)
+            if '__' in path:
+                # Связь по select_related нельзя одновременно откладывать
+                relation = path.rsplit('__', 1)[0]
+                related.add(relation)
+                only.add(relation)
+        return only, related
+
+
+class ElementSerializer(SparseFieldsMixin, serializers.ModelSerializer):
     owner_email = serializers.CharField(source='owner.email', read_only=True)
 
     class Meta:
@@ -1,2 +1,474 @@
+from tempfile import TemporaryDirectory
+from unittest import mock
 
-# Create your tests here.
+from asgiref.sync import async_to_sync
+from django.contrib.contenttypes.models import ContentType
+from django.core.cache import cache
+from django.db import IntegrityError, connection
+from django.test import override_settings
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+from rest_framework.test import APITestCase
+
+from users.models import AccessRule, CustomUser, Element, Role
+from users.response_cache import response_cache
+
+LOCAL_CACHE = {'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'}}
+
+
+# Общий кеш тестов — во временной папке, а не в django_cache/ проекта
+TEST_CACHE_DIR = TemporaryDirectory(prefix='test-cache-')
+test_cache = override_settings(CACHES={'default': {
+    'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache',
+    'LOCATION': TEST_CACHE_DIR.name,
+}})
+
+
+def setUpModule():
+    test_cache.enable()
+
+
+def tearDownModule():
+    test_cache.disable()
+    TEST_CACHE_DIR.cleanup()
+
+
+# Тесты входят много раз подряд с одного адреса: лимиты входа
+# проверяются отдельно (users.tests.LoginThrottleTest)
+@override_settings(LOGIN_THROTTLE={'ENABLED': False})
+class ElementAPITestCase(APITestCase):
+    """
+    Менеджер с read_all_permission на Element и три владельца элементов.
+    """
+
+    @classmethod
+    def setUpTestData(cls):
+        role = Role.objects.create(name=Role.MANAGER)
+        AccessRule.objects.create(
+            role=role,
+            content_type=ContentType.objects.get_for_model(Element),
+            read_permission=True,
+            read_all_permission=True,
+        )
+        cls.owners = []
+        for i in range(3):
+            owner = CustomUser(email=f'owner{i}@example.com', first_name='Иван',
+                               role=role)
+            owner.set_password('password123')
+            owner.save()
+            cls.owners.append(owner)
+
+    def setUp(self):
+        cache.clear()
+        self.access = self.login(0)
+        self.client.credentials(HTTP_AUTHORIZATION=f'Bearer {self.access}')
+
+    def login(self, owner):
+        """Access-токен владельца owners[owner]."""
+        response = self.client.post(
+            '/api/login/',
+            {'email': f'owner{owner}@example.com', 'password': 'password123'},
+            format='json',
+        )
+        return response.data['access']
+
+    def create_elements(self, count):
+        Element.objects.bulk_create(
+            Element(name=f'element {i}', description='описание',
+                    owner=self.owners[i % len(self.owners)])
+            for i in range(count)
+        )
+
+
+@override_settings(RESPONSE_CACHE={'ENABLED': False})
+class ElementListQueriesTest(ElementAPITestCase):
+    """
+    Регрессия N+1: число запросов списка не зависит от числа элементов.
+    """
+
+    def test_list_query_count_is_constant(self):
+        self.create_elements(3)
+        self.client.get('/api/elements/')  # прогрев кеша правил
+
+        # ETag списка (max(updated_at), count) и страница
+        with self.assertNumQueries(2):
+            response = self.client.get('/api/elements/')
+        self.assertEqual(len(response.data['results']), 3)
+
+        self.create_elements(20)
+        with self.assertNumQueries(2):
+            response = self.client.get('/api/elements/')
+        self.assertEqual(len(response.data['results']), 23)
+        self.assertEqual(response.data['results'][0]['owner_email'],
+                         'owner0@example.com')
+
+    def test_sparse_fields_skip_unrequested_columns(self):
+        self.create_elements(2)
+        self.client.get('/api/elements/')
+
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get('/api/elements/?fields=name')
+        self.assertEqual(len(queries), 2)
+        self.assertNotIn('description', queries[-1]['sql'])
+        self.assertNotIn('users_customuser', queries[-1]['sql'])
+        self.assertEqual(set(response.data['results'][0]), {'id', 'name'})
+
+    def test_sparse_fields_reject_unknown(self):
+        response = self.client.get('/api/elements/?fields=name,password_hash')
+        self.assertEqual(response.status_code, 400)
+
+
+class ElementPaginationTest(ElementAPITestCase):
+    """
+    Keyset-пагинация: страницы без пропусков и повторов, count по запросу.
+    """
+
+    def test_cursor_walks_all_elements(self):
+        self.create_elements(12)
+        seen = []
+        url = '/api/elements/?page_size=5&fields=name'
+        while url:
+            response = self.client.get(url)
+            self.assertNotIn('count', response.data)
+            seen.extend(item['id'] for item in response.data['results'])
+            url = response.data['next']
+        self.assertEqual(seen, sorted(Element.objects.values_list('id', flat=True)))
+
+    def test_count_is_optional(self):
+        self.create_elements(3)
+        response = self.client.get('/api/elements/?count=1')
+        self.assertEqual(response.data['count'], 3)
+
+
+@override_settings(RESPONSE_CACHE={'ENABLED': False})
+class ElementConditionalGetTest(ElementAPITestCase):
+    """
+    ETag/Last-Modified: неизменённые список и элемент отдаются как 304.
+    """
+
+    def test_list_not_modified_until_change(self):
+        self.create_elements(3)
+        etag = self.client.get('/api/elements/')['ETag']
+
+        with self.assertNumQueries(1):
+            response = self.client.get('/api/elements/', HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 304)
+
+        Element.objects.first().delete()
+        response = self.client.get('/api/elements/', HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(len(response.data['results']), 2)
+
+    def test_list_etag_reads_only_the_page(self):
+        self.create_elements(12)
+        response = self.client.get('/api/elements/?page_size=5')
+        response = self.client.get(response.data['next'])
+
+        with CaptureQueriesContext(connection) as queries:
+            self.client.get(response.data['next'])
+        self.assertIn('LIMIT 6', queries[0]['sql'])
+
+    def test_list_etag_follows_page_changes(self):
+        self.create_elements(6)
+        url = '/api/elements/?page_size=3'
+        etag = self.client.get(url)['ETag']
+
+        # Удаление на странице подтягивает следующий элемент: count тот же
+        with self.captureOnCommitCallbacks(execute=True):
+            Element.objects.order_by('id')[1].delete()
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+
+        # Изменения за пределами страницы её тег не меняют
+        etag = response['ETag']
+        Element.objects.filter(pk=Element.objects.order_by('-id')[0].pk).update(
+            name='новое имя', updated_at=timezone.now()
+        )
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 304)
+
+    def test_list_etag_shared_by_role_with_read_all(self):
+        self.create_elements(3)
+        etag = self.client.get('/api/elements/')['ETag']
+
+        self.client.credentials(HTTP_AUTHORIZATION=f'Bearer {self.login(1)}')
+        response = self.client.get('/api/elements/', HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 304)
+
+        rule = AccessRule.objects.get()
+        rule.read_all_permission = False
+        with self.captureOnCommitCallbacks(execute=True):
+            rule.save()
+        response = self.client.get('/api/elements/', HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(len(response.data['results']), 1)
+
+    def test_detail_not_modified_until_change(self):
+        self.create_elements(1)
+        element = Element.objects.get()
+        url = f'/api/elements/{element.pk}/'
+        response = self.client.get(url)
+        self.assertIn('Last-Modified', response)
+
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=response['ETag'])
+        self.assertEqual(response.status_code, 304)
+
+        etag = response['ETag']
+        element.name = 'новое имя'
+        element.save()
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data['name'], 'новое имя')
+
+
+class ElementResponseCacheTest(ElementAPITestCase):
+    """
+    Кеш ответов списка: повтор без запросов, сброс после изменений.
+    """
+
+    def test_repeated_list_served_from_cache(self):
+        self.create_elements(3)
+        self.client.get('/api/elements/')
+
+        with self.assertNumQueries(0):
+            response = self.client.get('/api/elements/')
+        self.assertEqual(len(response.data['results']), 3)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            Element.objects.first().delete()
+        response = self.client.get('/api/elements/')
+        self.assertEqual(len(response.data['results']), 2)
+
+    def test_bulk_update_invalidates(self):
+        self.create_elements(1)
+        rule = AccessRule.objects.get()
+        rule.update_permission = True
+        with self.captureOnCommitCallbacks(execute=True):
+            rule.save()
+        self.client.get('/api/elements/')
+
+        # bulk_update не отправляет сигналы: сброс идёт из BulkModelMixin
+        with self.captureOnCommitCallbacks(execute=True):
+            self.client.patch('/api/elements/bulk/',
+                              [{'id': Element.objects.get().pk, 'name': 'новое имя'}],
+                              format='json')
+        response = self.client.get('/api/elements/')
+        self.assertEqual(response.data['results'][0]['name'], 'новое имя')
+
+    @override_settings(ALLOWED_HOSTS=['testserver', 'api.example.com'])
+    def test_links_follow_request_origin(self):
+        self.create_elements(3)
+        url = '/api/elements/?page_size=2'
+        self.client.get(url)
+
+        response = self.client.get(url, HTTP_HOST='api.example.com', secure=True)
+        self.assertTrue(response.data['next'].startswith('https://api.example.com/'))
+        response = self.client.get(url)
+        self.assertTrue(response.data['next'].startswith('http://testserver/'))
+
+    def test_soft_delete_invalidates(self):
+        self.create_elements(3)
+        self.client.get('/api/elements/')
+
+        # Пакетный soft delete — UPDATE без сигналов: сброс идёт из soft_delete
+        with self.captureOnCommitCallbacks(execute=True):
+            CustomUser.objects.filter(pk=self.owners[1].pk).soft_delete()
+        with CaptureQueriesContext(connection) as queries:
+            self.client.get('/api/elements/')
+        self.assertTrue(queries)
+
+    @override_settings(CACHES=LOCAL_CACHE)
+    def test_disabled_with_process_local_cache(self):
+        self.create_elements(3)
+        response_cache.clear()
+        self.client.get('/api/elements/')
+
+        # Поколения в LocMemCache не видны другим воркерам: ответ не кешируется
+        self.assertEqual(len(response_cache), 0)
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get('/api/elements/')
+        self.assertTrue(queries)
+        self.assertEqual(len(response.data['results']), 3)
+
+
+@override_settings(RESPONSE_CACHE={'ENABLED': False})
+class ElementOwnRulesTest(ElementAPITestCase):
+    """
+    Права только на свои объекты: изменение и удаление чужого элемента
+    отвечают 404 из фильтра queryset, создание требует create_permission.
+    """
+
+    def setUp(self):
+        super().setUp()
+        rule = AccessRule.objects.get()
+        rule.read_all_permission = False
+        rule.update_permission = rule.delete_permission = True
+        with self.captureOnCommitCallbacks(execute=True):
+            rule.save()
+        self.own = Element.objects.create(name='свой', owner=self.owners[0])
+        self.other = Element.objects.create(name='чужой', owner=self.owners[1])
+
+    def test_update_other_is_not_found(self):
+        url = f'/api/elements/{self.other.pk}/'
+        response = self.client.patch(url, {'name': 'новое'}, format='json')
+        self.assertEqual(response.status_code, 404)
+        response = self.client.put(url, {'name': 'новое', 'description': 'новое'},
+                                   format='json')
+        self.assertEqual(response.status_code, 404)
+        self.other.refresh_from_db()
+        self.assertEqual(self.other.name, 'чужой')
+
+        response = self.client.patch(f'/api/elements/{self.own.pk}/',
+                                     {'name': 'новое'}, format='json')
+        self.assertEqual(response.status_code, 200)
+
+    def test_delete_other_is_not_found(self):
+        response = self.client.delete(f'/api/elements/{self.other.pk}/')
+        self.assertEqual(response.status_code, 404)
+        self.assertTrue(Element.objects.filter(pk=self.other.pk).exists())
+
+        response = self.client.delete(f'/api/elements/{self.own.pk}/')
+        self.assertEqual(response.status_code, 200)
+        self.assertFalse(Element.objects.filter(pk=self.own.pk).exists())
+
+    def test_create_requires_permission(self):
+        data = {'name': 'новый', 'description': 'описание'}
+        response = self.client.post('/api/elements/', data, format='json')
+        self.assertEqual(response.status_code, 403)
+
+        rule = AccessRule.objects.get()
+        rule.create_permission = True
+        with self.captureOnCommitCallbacks(execute=True):
+            rule.save()
+        response = self.client.post('/api/elements/', data, format='json')
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(Element.objects.get(pk=response.data['id']).owner,
+                         self.owners[0])
+
+
+@override_settings(RESPONSE_CACHE={'ENABLED': False})
+class ElementBulkTest(ElementAPITestCase):
+    """
+    Пакетные операции с правами только на свои объекты: чужие
+    объекты не видны и получают 404, как в get_object.
+    """
+
+    def setUp(self):
+        super().setUp()
+        rule = AccessRule.objects.get()
+        rule.update_permission = rule.delete_permission = True
+        with self.captureOnCommitCallbacks(execute=True):
+            rule.save()
+        self.own = Element.objects.create(name='свой', owner=self.owners[0])
+        self.other = Element.objects.create(name='чужой', owner=self.owners[1])
+
+    def statuses(self, response):
+        return [result['status'] for result in response.data['results']]
+
+    def test_update_out_of_scope_is_not_found(self):
+        response = self.client.patch(
+            '/api/elements/bulk/',
+            [{'id': self.own.pk, 'name': 'новое'},
+             {'id': self.other.pk, 'name': 'новое'},
+             {'id': True, 'name': 'новое'}],
+            format='json',
+        )
+        self.assertEqual(self.statuses(response), [200, 404, 400])
+        self.own.refresh_from_db()
+        self.other.refresh_from_db()
+        self.assertEqual((self.own.name, self.other.name), ('новое', 'чужой'))
+
+    def test_write_error_is_not_exposed(self):
+        error = IntegrityError('UNIQUE constraint failed: users_element.name')
+        with mock.patch.object(Element.objects, 'bulk_update', side_effect=error), \
+                self.assertLogs('elements.bulk', 'ERROR'):
+            response = self.client.patch('/api/elements/bulk/',
+                                         [{'id': self.own.pk, 'name': 'новое'}],
+                                         format='json')
+        result, = response.data['results']
+        self.assertEqual(result['status'], 400)
+        self.assertEqual(result['errors']['code'], 'write_failed')
+        self.assertNotIn('users_element', str(response.data))
+
+    def test_destroy_only_own(self):
+        response = self.client.delete(
+            '/api/elements/bulk/',
+            [self.own.pk, self.other.pk, self.other.pk + 1000, True, 'x'],
+            format='json',
+        )
+        self.assertEqual(self.statuses(response), [204, 404, 404, 400, 400])
+        self.assertEqual(list(Element.objects.values_list('pk', flat=True)),
+                         [self.other.pk])
+
+
+@override_settings(RESPONSE_CACHE={'ENABLED': False})
+class AsyncElementViewsTest(ElementAPITestCase):
+    """
+    Async-представления элементов отвечают так же, как ElementViewSet.
+    """
+
+    def setUp(self):
+        super().setUp()
+        self.create_elements(5)
+        self.headers = {'Authorization': f'Bearer {self.access}'}
+
+    def set_rule(self, **permissions):
+        rule = AccessRule.objects.get()
+        for name, value in permissions.items():
+            setattr(rule, name, value)
+        with self.captureOnCommitCallbacks(execute=True):
+            rule.save()
+
+    async def test_list_matches_sync(self):
+        sync = await self.async_client.get('/api/elements/', headers=self.headers)
+        response = await self.async_client.get('/api/async/elements/',
+                                               headers=self.headers)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json(), sync.json())
+        self.assertEqual(len(response.json()['results']), 5)
+
+    async def test_retrieve(self):
+        element = await Element.objects.order_by('id').afirst()
+        response = await self.async_client.get(f'/api/async/elements/{element.pk}/',
+                                               headers=self.headers)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()['name'], element.name)
+
+        response = await self.async_client.get('/api/async/elements/100000/',
+                                               headers=self.headers)
+        self.assertEqual(response.status_code, 404)
+
+    def test_retrieve_out_of_scope_is_not_found(self):
+        self.set_rule(read_all_permission=False)
+        own = Element.objects.filter(owner=self.owners[0]).first()
+        other = Element.objects.filter(owner=self.owners[1]).first()
+        for element, expected in ((own, 200), (other, 404)):
+            response = async_to_sync(self.async_client.get)(
+                f'/api/async/elements/{element.pk}/', headers=self.headers
+            )
+            self.assertEqual(response.status_code, expected)
+
+    def test_create_requires_permission(self):
+        data = {'name': 'новый', 'description': 'описание'}
+        post = async_to_sync(self.async_client.post)
+        response = post('/api/async/elements/', data,
+                        content_type='application/json', headers=self.headers)
+        self.assertEqual(response.status_code, 403)
+
+        self.set_rule(create_permission=True)
+        response = post('/api/async/elements/', data,
+                        content_type='application/json', headers=self.headers)
+        self.assertEqual(response.status_code, 201)
+        element = Element.objects.get(pk=response.json()['id'])
+        self.assertEqual(element.owner, self.owners[0])
+
+    async def test_requires_token(self):
+        response = await self.async_client.get('/api/async/elements/')
+        self.assertEqual(response.status_code, 401)
+
+    def test_deleted_user_is_rejected(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            CustomUser.objects.filter(pk=self.owners[0].pk).soft_delete()
+        response = async_to_sync(self.async_client.get)('/api/async/elements/',
+                                                        headers=self.headers)
+        self.assertEqual(response.status_code, 401)
@@ -1,6 +1,7 @@
 from django.urls import include, path
 from rest_framework.routers import DefaultRouter
 
+from .async_views import AsyncElementDetailView, AsyncElementListView
 from .views import ElementViewSet
 
 router = DefaultRouter()
@@ -9,6 +10,12 @@ router.register(r'elements', ElementViewSet, basename='element')
 
 urlpatterns = [
     path('api/', include(router.urls)),
+
+    # Async-варианты для ASGI
+    path('api/async/elements/', AsyncElementListView.as_view(),
+         name='async-element-list'),
+    path('api/async/elements/<int:pk>/', AsyncElementDetailView.as_view(),
+         name='async-element-detail'),
 ]
 
 
@@ -1,26 +1,49 @@
-from rest_framework import status, viewsets
+from rest_framework import status
+from rest_framework.decorators import action
 from rest_framework.response import Response
 
+from users.export import get_export_type, serializer_columns, stream_export
 from users.models import Element
+from users.pagination import KeysetPagination
+from users.response_cache import CachedListMixin
 
 from .permissions import RoleAccessPermission
 from .serializers import ElementSerializer
+from .viewsets import RBACModelViewSet
 
 
-class ElementViewSet(viewsets.ModelViewSet):
-    queryset = Element.objects.all()
-    serializer_class = ElementSerializer
-    permission_classes = [RoleAccessPermission]
+class ElementPagination(KeysetPagination):
+    """
+    Настройки пагинации для списка элементов
+    """
+    page_size = 100
+    page_size_query_param = 'page_size'
+    max_page_size = 1000
+
 
-    def get_queryset(self):
-        return RoleAccessPermission.filter_queryset(self.request.user,
-                                                    Element.objects.all())
+class ElementViewSet(CachedListMixin, RBACModelViewSet):
+    """
+    CRUD для Element. Для чтения поддерживается ?fields=id,name,...:
+    из базы выбираются только колонки запрошенных полей.
+    Пакетные операции — elements/bulk/ (см. BulkModelMixin).
+    Ответы списка кешируются в памяти процесса (см. CachedListMixin).
+    """
+    model = Element
+    serializer_class = ElementSerializer
+    pagination_class = ElementPagination
 
-    def perform_create(self, serializer):
+    @action(detail=False, methods=['get'])
+    def export(self, request):
         """
-        Автоматически устанавливаем owner текущим пользователем.
+        Потоковая выгрузка доступных пользователю элементов:
+        ?type=ndjson|csv, поддерживается ?fields=.
         """
-        serializer.save(owner=self.request.user)
+        export_type = get_export_type(request)
+        queryset = RoleAccessPermission.filter_by_rule(
+            self.get_access_rule(), request.user, Element.objects.order_by('id')
+        )
+        return stream_export(queryset, serializer_columns(self.get_serializer()),
+                             export_type, 'elements')
 
     def destroy(self, request, *args, **kwargs):
         instance = self.get_object()
@@ -0,0 +1,143 @@
+from django.contrib.contenttypes.models import ContentType
+from rest_framework import serializers, viewsets
+from rest_framework.exceptions import ValidationError
+from rest_framework.permissions import SAFE_METHODS
+
+from users import access_cache
+from users.conditional import ConditionalGetMixin
+from users.pagination import KeysetPagination
+from users.profiling import ProfilingMixin
+
+from .bulk import BulkModelMixin
+from .permissions import RoleAccessPermission
+from .serializers import SparseFieldsMixin
+
+
+class RBACPagination(KeysetPagination):
+    page_size = 100
+    max_page_size = 1000
+
+
+class RBACModelViewSet(ProfilingMixin, ConditionalGetMixin, BulkModelMixin,
+                       viewsets.ModelViewSet):
+    """
+    Базовый CRUD для бизнес-объекта под RoleAccessPermission:
+        model       — модель объекта;
+        owner_field — поле владельца (None, если владельца нет).
+
+    ContentType модели вычисляется один раз на класс при первом запросе
+    (при создании класса таблицы ContentType может ещё не быть), правило
+    доступа — один раз на запрос из users.access_cache. Права метода
+    запроса применяются к queryset в SQL, список — keyset-пагинация,
+    ?fields=id,name,... — выбор полей (для SparseFieldsMixin-сериализаторов),
+    пакетные операции — <prefix>/bulk/ (см. BulkModelMixin),
+    ETag/Last-Modified для чтения — см. ConditionalGetMixin.
+    """
+    model = None
+    owner_field = 'owner'
+    permission_classes = [RoleAccessPermission]
+    pagination_class = RBACPagination
+
+    @classmethod
+    def get_content_type(cls):
+        # Смотрим в __dict__, чтобы подкласс не взял ContentType родителя
+        content_type = cls.__dict__.get('_content_type')
+        if content_type is None:
+            content_type = ContentType.objects.get_for_model(cls.model)
+            cls._content_type = content_type
+        return content_type
+
+    def get_access_rule(self):
+        """Правило роли пользователя для модели, кешируется на запрос."""
+        if not hasattr(self, '_access_rule'):
+            self._access_rule = access_cache.get_rule(
+                self.request.user.role_id, self.get_content_type().id
+            )
+        return self._access_rule
+
+    def get_cache_scope(self):
+        """
+        С read_all_permission список одинаков для всей роли, иначе
+        зависит от пользователя (ETag и ключ кеша ответов).
+        """
+        rule = self.get_access_rule()
+        if rule is not None and rule.read_all_permission:
+            return ('role', self.request.user.role_id)
+        return super().get_cache_scope()
+
+    def get_sparse_fields(self):
+        """Поля из ?fields= (только для чтения) или None — все поля."""
+        if not hasattr(self, '_sparse_fields'):
+            self._sparse_fields = None
+            raw = self.request.query_params.get('fields')
+            serializer_class = self.get_serializer_class()
+            if (raw and self.request.method in SAFE_METHODS
+                    and issubclass(serializer_class, SparseFieldsMixin)):
+                fields = {name.strip() for name in raw.split(',') if name.strip()}
+                unknown = fields - set(serializer_class().fields)
+                if unknown:
+                    raise ValidationError(
+                        {'fields': f"Неизвестные поля: {', '.join(sorted(unknown))}"}
+                    )
+                self._sparse_fields = fields | {'id'}
+        return self._sparse_fields
+
+    def get_serializer(self, *args, **kwargs):
+        if issubclass(self.get_serializer_class(), SparseFieldsMixin):
+            kwargs.setdefault('fields', self.get_sparse_fields())
+        return super().get_serializer(*args, **kwargs)
+
+    def get_bulk_model(self):
+        return self.model
+
+    def get_base_queryset(self):
+        """
+        Queryset до проверки прав. Если сериализатор умеет get_projection
+        (SparseFieldsMixin), читаются только нужные ему колонки.
+        """
+        queryset = self.model.objects.order_by('id')
+        serializer = self.get_serializer()
+        if isinstance(serializer, SparseFieldsMixin):
+            only, related = serializer.get_projection()
+            if self.get_updated_field(self.model) is not None:
+                # Нужно для Last-Modified объекта
+                only.add(self.updated_field)
+            queryset = queryset.only(*only)
+            if related:
+                queryset = queryset.select_related(*related)
+        return queryset
+
+    def get_queryset(self):
+        return RoleAccessPermission.filter_by_rule(
+            self.get_access_rule(), self.request.user, self.get_base_queryset(),
+            self.request.method, self.owner_field,
+        )
+
+    def perform_create(self, serializer):
+        """Владельцем нового объекта становится текущий пользователь."""
+        if self.owner_field is None:
+            serializer.save()
+        else:
+            serializer.save(**{self.owner_field: self.request.user})
+
+
+def rbac_serializer(model, fields='__all__'):
+    """ModelSerializer с поддержкой ?fields= для модели."""
+    meta = type('Meta', (), {'model': model, 'fields': fields})
+    return type(f'{model.__name__}Serializer',
+                (SparseFieldsMixin, serializers.ModelSerializer),
+                {'Meta': meta})
+
+
+def rbac_viewset(model, serializer_class=None, owner_field='owner', **attrs):
+    """
+    Фабрика RBACModelViewSet для модели: router.register(r'products',
+    rbac_viewset(Product, owner_field=None), basename='product').
+    Остальные атрибуты класса (например, __doc__) передаются в attrs.
+    """
+    attrs.update(
+        model=model,
+        owner_field=owner_field,
+        serializer_class=serializer_class or rbac_serializer(model),
+    )
+    return type(f'{model.__name__}ViewSet', (RBACModelViewSet,), attrs)
@@ -0,0 +1,202 @@
+"""
+Нативные async-представления для запуска под ASGI (testproject.asgi).
+
+bcrypt выполняется в пуле users.hashing и не занимает воркер на время
+хеширования, поэтому волна логинов не блокирует остальные эндпоинты.
+Формат запросов и ответов совпадает с синхронными DRF-представлениями.
+"""
+import json
+
+from asgiref.sync import sync_to_async
+from django.http import JsonResponse
+from django.utils.decorators import classonlymethod
+from django.views import View
+from django.views.decorators.csrf import csrf_exempt
+from rest_framework import status
+from rest_framework.exceptions import (
+    APIException,
+    NotAuthenticated,
+    ParseError,
+    PermissionDenied,
+    Throttled,
+)
+from rest_framework.settings import api_settings
+
+from users.hashing import PasswordHashingBusy, password_hasher
+from users.metrics import login_attempts
+from users.models import CustomUser
+from users.throttling import LoginRateThrottle, login_throttle
+
+from .authentication import CustomUserJWTAuthentication
+from .serializers import (
+    ChangePasswordSerializer,
+    LoginSerializer,
+    UserProfileSerializer,
+    UserRegistrationSerializer,
+    registration_data,
+    token_pair_data,
+)
+from .tokens import CustomRefreshToken
+from .views import UserApiListPagination
+
+
+def json_response(data, status_code=status.HTTP_200_OK):
+    return JsonResponse(data, status=status_code, safe=False,
+                        json_dumps_params={'ensure_ascii': False})
+
+
+class AsyncAPIView(View):
+    """
+    База для async-представлений: разбор JSON, JWT-аутентификация,
+    проверка прав (ahas_permission у permission_classes)
+    и преобразование APIException в ответ, как в DRF.
+    """
+    authentication_required = False
+    permission_classes = ()
+
+    @classonlymethod
+    def as_view(cls, **initkwargs):
+        # Как и APIView, работаем только с токенами, без сессий и CSRF
+        return csrf_exempt(super().as_view(**initkwargs))
+
+    async def dispatch(self, request, *args, **kwargs):
+        # Как у DRF Request: пагинация и view читают query_params
+        request.query_params = request.GET
+        try:
+            if self.authentication_required:
+                request.user = await self.authenticate(request)
+                await self.check_permissions(request)
+            return await super().dispatch(request, *args, **kwargs)
+        except APIException as exc:
+            detail = exc.detail
+            if not isinstance(detail, (list, dict)):
+                detail = {'detail': detail}
+            response = json_response(detail, status_code=exc.status_code)
+            if getattr(exc, 'wait', None):
+                response['Retry-After'] = '%d' % exc.wait
+            return response
+
+    async def authenticate(self, request):
+        result = await CustomUserJWTAuthentication().aauthenticate(request)
+        if result is None:
+            raise NotAuthenticated()
+        return result[0]
+
+    def get_permissions(self):
+        return [permission() for permission in self.permission_classes]
+
+    async def check_permissions(self, request):
+        for permission in self.get_permissions():
+            if not await permission.ahas_permission(request, self):
+                raise PermissionDenied(getattr(permission, 'message', None))
+
+    async def check_object_permissions(self, request, obj):
+        for permission in self.get_permissions():
+            if not await permission.ahas_object_permission(request, self, obj):
+                raise PermissionDenied(getattr(permission, 'message', None))
+
+    @staticmethod
+    def parse(request):
+        try:
+            return json.loads(request.body or b'{}')
+        except ValueError:
+            raise ParseError()
+
+
+class AsyncLoginView(AsyncAPIView):
+    """
+    Async-вариант CustomTokenObtainPairView.
+    """
+
+    async def post(self, request):
+        serializer = LoginSerializer(data=self.parse(request))
+        serializer.is_valid(raise_exception=True)
+        email = serializer.validated_data['email']
+        password = serializer.validated_data['password']
+
+        # До поиска пользователя и bcrypt, как LoginRateThrottle
+        wait = await sync_to_async(login_throttle.check)(
+            email, LoginRateThrottle().get_ident(request)
+        )
+        if wait is not None:
+            raise Throttled(wait)
+
+        try:
+            user = await CustomUser.objects.select_related('role').aget(
+                email=email, is_active=True
+            )
+        except CustomUser.DoesNotExist:
+            user = None
+
+        try:
+            if user is None:
+                # Неизвестный email проверяется так же долго, как известный
+                await password_hasher.acheck_dummy(password)
+                outcome = 'unknown_email'
+            else:
+                valid = await user.acheck_password(password)
+                outcome = 'success' if valid else 'wrong_password'
+        except PasswordHashingBusy:
+            login_attempts.inc(outcome='busy')
+            raise
+        if outcome != 'success':
+            login_attempts.inc(outcome=outcome)
+            return json_response(
+                {api_settings.NON_FIELD_ERRORS_KEY: ["Неверный email или пароль"]},
+                status_code=status.HTTP_400_BAD_REQUEST
+            )
+
+        refresh = await sync_to_async(CustomRefreshToken.for_user)(user)
+        login_attempts.inc(outcome=outcome)
+        return json_response(token_pair_data(user, refresh))
+
+
+class AsyncUserRegistrationView(AsyncAPIView):
+    """
+    Async-вариант UserRegistrationView.
+    """
+
+    async def post(self, request):
+        serializer = UserRegistrationSerializer(data=self.parse(request))
+        await sync_to_async(serializer.is_valid)(raise_exception=True)
+        user = await serializer.acreate(serializer.validated_data)
+
+        refresh = await sync_to_async(CustomRefreshToken.for_user)(user)
+        return json_response(registration_data(user, refresh),
+                             status_code=status.HTTP_201_CREATED)
+
+
+class AsyncChangePasswordView(AsyncAPIView):
+    """
+    Async-вариант ChangePasswordView.
+    """
+    authentication_required = True
+
+    async def put(self, request):
+        serializer = ChangePasswordSerializer(data=self.parse(request))
+        serializer.is_valid(raise_exception=True)
+        user = await CustomUser.objects.aget(pk=request.user.pk)
+
+        if not await user.acheck_password(serializer.validated_data['old_password']):
+            return json_response(
+                {'old_password': 'Неверный текущий пароль'},
+                status_code=status.HTTP_400_BAD_REQUEST
+            )
+
+        await user.aset_password(serializer.validated_data['new_password'])
+        await user.asave()
+        return json_response({'detail': 'Пароль успешно изменён'})
+
+
+class AsyncUserListView(AsyncAPIView):
+    """
+    Async-вариант UserListView.
+    """
+    authentication_required = True
+
+    async def get(self, request):
+        paginator = UserApiListPagination()
+        queryset = CustomUser.objects.filter(is_active=True).order_by('id')
+        page = await paginator.apaginate_queryset(queryset, request, self)
+        data = UserProfileSerializer(page, many=True).data
+        return json_response(paginator.get_paginated_data(data))
@@ -0,0 +1,154 @@
+from django.db import DEFAULT_DB_ALIAS
+from django.utils.translation import gettext_lazy as _
+from rest_framework_simplejwt.authentication import JWTAuthentication
+from rest_framework_simplejwt.exceptions import (
+    AuthenticationFailed,
+    InvalidToken,
+    TokenError,
+)
+from rest_framework_simplejwt.settings import api_settings
+
+from users.models import CustomUser, Role
+from users.token_cache import token_cache
+from users.token_versions import (
+    aget_token_version,
+    aremember_token_version,
+    get_token_version,
+    remember_token_version,
+)
+
+from .tokens import (
+    IS_ACTIVE_CLAIM,
+    ROLE_CLAIM,
+    ROLE_ID_CLAIM,
+    TOKEN_VERSION_CLAIM,
+    USER_ID_CLAIM,
+)
+
+
+def user_from_claims(validated_token):
+    """
+    Строит CustomUser из claims токена без запроса к базе.
+    Остальные поля отложены (deferred): загрузятся при обращении,
+    а save() обновит только загруженные поля.
+    """
+    values = {
+        'id': validated_token[USER_ID_CLAIM],
+        'email': validated_token['email'],
+        'is_active': validated_token[IS_ACTIVE_CLAIM],
+        'role_id': validated_token[ROLE_ID_CLAIM],
+        'token_version': validated_token[TOKEN_VERSION_CLAIM],
+    }
+    user = CustomUser.from_db(
+        DEFAULT_DB_ALIAS,
+        list(values),
+        [values[f.attname] for f in CustomUser._meta.concrete_fields
+         if f.attname in values],
+    )
+    user.role = Role.from_db(
+        DEFAULT_DB_ALIAS,
+        ['id', 'name'],
+        [validated_token[ROLE_ID_CLAIM], validated_token[ROLE_CLAIM]],
+    )
+    return user
+
+
+class CustomUserJWTAuthentication(JWTAuthentication):
+    """
+    JWT-аутентификация для CustomUser без запросов к базе.
+
+    Пользователь строится из claims токена, если версия токенов в claims
+    совпадает с версией в хранилище (users.token_versions). Иначе
+    (смена пароля или роли, soft delete, пустое хранилище) пользователь
+    читается из базы одним запросом вместе с ролью.
+    """
+
+    def get_validated_token(self, raw_token):
+        """
+        Как в JWTAuthentication, но подпись и claims токена проверяются
+        один раз: повторные запросы берут их из users.token_cache.
+        """
+        messages = []
+        for AuthToken in api_settings.AUTH_TOKEN_CLASSES:
+            try:
+                return token_cache.validate(AuthToken, raw_token)
+            except TokenError as e:
+                messages.append({
+                    'token_class': AuthToken.__name__,
+                    'token_type': AuthToken.token_type,
+                    'message': e.args[0],
+                })
+
+        raise InvalidToken({
+            'detail': _("Given token not valid for any token type"),
+            'messages': messages,
+        })
+
+    def get_user(self, validated_token):
+        if USER_ID_CLAIM not in validated_token:
+            # Токен старого формата без claims пользователя. Email уникален
+            # только среди активных, поэтому ищем активного пользователя
+            user = CustomUser.objects.select_related('role').filter(
+                email=validated_token.get('email'), is_active=True
+            ).first()
+            if user is None:
+                raise InvalidToken(_("User not found"))
+            return user
+
+        user_id = validated_token[USER_ID_CLAIM]
+        version = validated_token.get(TOKEN_VERSION_CLAIM)
+        if (validated_token.get(IS_ACTIVE_CLAIM)
+                and get_token_version(user_id) == version):
+            return user_from_claims(validated_token)
+
+        try:
+            user = CustomUser.objects.select_related('role').get(pk=user_id)
+        except CustomUser.DoesNotExist:
+            raise InvalidToken(_("User not found"))
+
+        remember_token_version(user.pk, user.token_version)
+        if not user.is_active:
+            raise AuthenticationFailed(_("User is inactive"), code="user_inactive")
+        return user
+
+    async def aauthenticate(self, request):
+        """
+        Асинхронный вариант authenticate для async-представлений:
+        пользователь читается через async ORM и async API кеша.
+        """
+        header = self.get_header(request)
+        if header is None:
+            return None
+
+        raw_token = self.get_raw_token(header)
+        if raw_token is None:
+            return None
+
+        validated_token = self.get_validated_token(raw_token)
+        return await self.aget_user(validated_token), validated_token
+
+    async def aget_user(self, validated_token):
+        """Асинхронный вариант get_user."""
+        if USER_ID_CLAIM not in validated_token:
+            user = await CustomUser.objects.select_related('role').filter(
+                email=validated_token.get('email'), is_active=True
+            ).afirst()
+            if user is None:
+                raise InvalidToken(_("User not found"))
+            return user
+
+        user_id = validated_token[USER_ID_CLAIM]
+        version = validated_token.get(TOKEN_VERSION_CLAIM)
+        if (validated_token.get(IS_ACTIVE_CLAIM)
+                and await aget_token_version(user_id) == version):
+            return user_from_claims(validated_token)
+
+        try:
+            user = await CustomUser.objects.select_related('role').aget(pk=user_id)
+        except CustomUser.DoesNotExist:
+            raise InvalidToken(_("User not found"))
+
+        await aremember_token_version(user.pk, user.token_version)
+        if not user.is_active:
+            raise AuthenticationFailed(_("User is inactive"), code="user_inactive")
+        return user
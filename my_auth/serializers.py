@@ -1,8 +1,26 @@
-
+from django.utils.translation import gettext_lazy as _
 from rest_framework import serializers
-from rest_framework_simplejwt.tokens import RefreshToken, TokenError
-
+from rest_framework_simplejwt.exceptions import AuthenticationFailed
+from rest_framework_simplejwt.serializers import (
+    TokenRefreshSerializer,
+    TokenVerifySerializer,
+)
+from rest_framework_simplejwt.settings import api_settings
+from rest_framework_simplejwt.token_blacklist.models import BlacklistedToken
+from rest_framework_simplejwt.tokens import TokenError, UntypedToken
+
+from users.blacklist_filter import blacklist_filter
+from users.hashing import PasswordHashingBusy, password_hasher
+from users.metrics import login_attempts
 from users.models import CustomUser, Role
+from users.token_cache import token_cache
+
+from .tokens import (
+    USER_ID_CLAIM,
+    CustomRefreshToken,
+    set_user_claims,
+    token_user_lookup,
+)
 
 
 class UserRegistrationSerializer(serializers.ModelSerializer):
@@ -13,6 +31,9 @@ class UserRegistrationSerializer(serializers.ModelSerializer):
         model = CustomUser
         fields = ('first_name', 'last_name', 'middle_name',
                   'email', 'password', 'password_confirm')
+        # Уникальность среди активных проверяет validate_email,
+        # без второго такого же запроса от UniqueValidator
+        extra_kwargs = {'email': {'validators': []}}
 
     def validate_email(self, value):
         if CustomUser.objects.filter(email=value, is_active=True).exists():
@@ -38,6 +59,19 @@ class UserRegistrationSerializer(serializers.ModelSerializer):
 
         return user
 
+    async def acreate(self, validated_data):
+        """Асинхронный вариант create: bcrypt не блокирует event loop."""
+        validated_data = dict(validated_data)
+        validated_data.pop('password_confirm')
+        password = validated_data.pop('password')
+
+        user_role = await Role.objects.aget(name='user')
+        user = CustomUser(**validated_data, role=user_role)
+        await user.aset_password(password)
+        await user.asave()
+
+        return user
+
 
 class UserProfileSerializer(serializers.ModelSerializer):
     class Meta:
@@ -47,35 +81,122 @@ class UserProfileSerializer(serializers.ModelSerializer):
         read_only_fields = ('id', 'email', 'is_active')
 
 
-class CustomTokenObtainPairSerializer(serializers.Serializer):
+def token_pair_data(user, refresh):
+    """Ответ логина: пара токенов и краткие данные пользователя."""
+    return {
+        "refresh": str(refresh),
+        "access": str(refresh.access_token),
+        "user": {
+            "id": user.id,
+            "email": user.email,
+            "first_name": user.first_name,
+            "last_name": user.last_name,
+            "role": user.role.name
+        }
+    }
+
+
+def registration_data(user, refresh):
+    """Ответ регистрации: профиль и пара токенов."""
+    return {
+        'success': True,
+        'message': 'Пользователь успешно зарегистрирован',
+        'user': UserProfileSerializer(user).data,
+        'tokens': {
+            'refresh': str(refresh),  # Refresh token
+            'access': str(refresh.access_token),  # Access token
+        }
+    }
+
+
+class LoginSerializer(serializers.Serializer):
     email = serializers.EmailField()
     password = serializers.CharField(write_only=True)
 
+
+class CustomTokenObtainPairSerializer(LoginSerializer):
     def validate(self, attrs):
         email = attrs.get("email")
         password = attrs.get("password")
 
-        try:
-            user = CustomUser.objects.get(email=email, is_active=True)
-        except CustomUser.DoesNotExist:
-            raise serializers.ValidationError("Неверный email или пароль")
+        user = CustomUser.objects.select_related('role').filter(
+            email=email, is_active=True
+        ).first()
 
-        if not user.check_password(password):
+        try:
+            if user is None:
+                # Неизвестный email проверяется так же долго, как известный
+                password_hasher.check_dummy(password)
+                login_attempts.inc(outcome='unknown_email')
+                raise serializers.ValidationError("Неверный email или пароль")
+            valid = user.check_password(password)
+        except PasswordHashingBusy:
+            login_attempts.inc(outcome='busy')
+            raise
+        if not valid:
+            login_attempts.inc(outcome='wrong_password')
             raise serializers.ValidationError("Неверный email или пароль")
 
         # Создаём токены
-        refresh = RefreshToken.for_user(user)
-        return {
-            "refresh": str(refresh),
-            "access": str(refresh.access_token),
-            "user": {
-                "id": user.id,
-                "email": user.email,
-                "first_name": user.first_name,
-                "last_name": user.last_name,
-                "role": user.role.name
-            }
-        }
+        refresh = CustomRefreshToken.for_user(user)
+        login_attempts.inc(outcome='success')
+        return token_pair_data(user, refresh)
+
+
+class CustomTokenRefreshSerializer(TokenRefreshSerializer):
+    """
+    Обновление access-токена с актуальными claims пользователя
+    (роль, версия токенов), чтобы новый токен снова проходил
+    аутентификацию без запроса к базе.
+    """
+    token_class = CustomRefreshToken
+
+    def validate(self, attrs):
+        refresh = self.token_class(attrs['refresh'])
+
+        try:
+            user = CustomUser.objects.select_related('role').filter(
+                **token_user_lookup(refresh.payload)
+            ).get(is_active=True)
+        except CustomUser.DoesNotExist:
+            raise AuthenticationFailed(
+                self.error_messages['no_active_account'],
+                'no_active_account',
+            )
+
+        access = set_user_claims(refresh.access_token, user)
+        data = {'access': str(access)}
+
+        if api_settings.ROTATE_REFRESH_TOKENS:
+            if api_settings.BLACKLIST_AFTER_ROTATION:
+                refresh.blacklist()
+            refresh.set_jti()
+            refresh.set_exp()
+            refresh.set_iat()
+            set_user_claims(refresh, user)
+            refresh.outstand()
+            data['refresh'] = str(refresh)
+
+        return data
+
+
+class CustomTokenVerifySerializer(TokenVerifySerializer):
+    """
+    Проверка токена с кешем декодирования (users.token_cache).
+    Чёрный список проверяется на каждом запросе: сначала фильтром
+    Блума, в базу — только если jti может быть в списке.
+    """
+
+    def validate(self, attrs):
+        token = token_cache.validate(UntypedToken, attrs['token'])
+
+        jti = token.get(api_settings.JTI_CLAIM)
+        if (blacklist_filter.might_contain(jti)
+                and BlacklistedToken.objects.filter(token__jti=jti).exists()):
+            raise serializers.ValidationError(_("Token is blacklisted"))
+
+        return {}
+
 
 class LogoutSerializer(serializers.Serializer):
     refresh = serializers.CharField()
@@ -86,11 +207,15 @@ class LogoutSerializer(serializers.Serializer):
 
     def save(self, **kwargs):
         try:
-            token = RefreshToken(self.token)
+            token = CustomRefreshToken(self.token)
             token.blacklist()
         except TokenError:
             raise serializers.ValidationError("Неверный или "
                                               "уже использованный токен")
+        # Проверенные токены пользователя больше не берутся из кеша процесса
+        user_id = token.get(USER_ID_CLAIM)
+        if user_id is not None:
+            token_cache.forget_users([user_id])
 
 class UpdateProfileSerializer(serializers.ModelSerializer):
     class Meta:
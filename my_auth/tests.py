@@ -1,2 +1,299 @@
+from contextlib import contextmanager
+from tempfile import TemporaryDirectory
+from unittest import mock
 
-# Create your tests here.
+from django.core.cache import cache
+from django.test import override_settings
+from rest_framework.test import APITestCase
+from rest_framework_simplejwt.token_blacklist.models import BlacklistedToken
+from rest_framework_simplejwt.tokens import (
+    AccessToken,
+    RefreshToken,
+    Token,
+    UntypedToken,
+)
+
+from my_auth.authentication import CustomUserJWTAuthentication
+from users.models import CustomUser, Role
+from users.token_cache import token_cache
+from users.token_versions import _timeout, get_token_version, remember_token_version
+
+LOCAL_CACHE = {'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'}}
+
+
+# Общий кеш тестов — во временной папке, а не в django_cache/ проекта
+TEST_CACHE_DIR = TemporaryDirectory(prefix='test-cache-')
+test_cache = override_settings(CACHES={'default': {
+    'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache',
+    'LOCATION': TEST_CACHE_DIR.name,
+}})
+
+
+def setUpModule():
+    test_cache.enable()
+
+
+def tearDownModule():
+    test_cache.disable()
+    TEST_CACHE_DIR.cleanup()
+
+
+# Тесты входят много раз подряд с одного адреса: лимиты входа
+# проверяются отдельно (users.tests.LoginThrottleTest)
+@override_settings(LOGIN_THROTTLE={'ENABLED': False})
+class AuthAPITestCase(APITestCase):
+    """
+    Пользователь с ролью user, вошедший через /api/login/.
+    """
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.role = Role.objects.create(name=Role.USER)
+        cls.user = CustomUser(email='user@example.com', first_name='Иван',
+                              last_name='Петров', role=cls.role)
+        cls.user.set_password('password123')
+        cls.user.save()
+
+    def setUp(self):
+        cache.clear()
+        self.tokens = self.login()
+        self.client.credentials(
+            HTTP_AUTHORIZATION=f"Bearer {self.tokens['access']}"
+        )
+
+    def login(self, password='password123'):
+        response = self.client.post(
+            '/api/login/',
+            {'email': 'user@example.com', 'password': password},
+            format='json',
+        )
+        return response.data
+
+
+class TokenVersionTest(AuthAPITestCase):
+    """
+    Версия токенов: после смены роли и soft delete claims выданных
+    токенов не принимаются без проверки по базе.
+    """
+
+    def test_login_stores_version(self):
+        self.assertEqual(self.client.get('/api/update').status_code, 200)
+        self.assertEqual(get_token_version(self.user.pk), self.user.token_version)
+
+    def test_soft_delete_revokes_token(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            response = self.client.delete('/api/profile/delete')
+        self.assertEqual(response.status_code, 200)
+
+        user = CustomUser.objects.get(pk=self.user.pk)
+        self.assertFalse(user.is_active)
+        self.assertIsNotNone(user.deleted_at)
+        self.assertEqual(user.token_version, self.user.token_version + 1)
+        # Пользователь перечитан из базы: остальные поля не затёрты
+        self.assertEqual(user.last_name, 'Петров')
+        self.assertTrue(user.check_password('password123'))
+
+        self.assertEqual(self.client.get('/api/update').status_code, 401)
+
+    def test_role_change_in_other_process(self):
+        authentication = CustomUserJWTAuthentication()
+        token = authentication.get_validated_token(self.tokens['access'])
+        authentication.get_user(token)
+        with self.assertNumQueries(0):
+            self.assertEqual(authentication.get_user(token).role.name, Role.USER)
+
+        # Другой процесс меняет роль: новая версия попадает в общий кеш,
+        # и claims старого токена больше не принимаются
+        user = CustomUser.objects.get(pk=self.user.pk)
+        with self.captureOnCommitCallbacks(execute=True):
+            user.role = Role.objects.create(name=Role.MANAGER)
+            user.save()
+
+        with self.assertNumQueries(1):
+            self.assertEqual(authentication.get_user(token).role.name, Role.MANAGER)
+
+    def test_stale_read_does_not_restore_old_version(self):
+        authentication = CustomUserJWTAuthentication()
+        token = authentication.get_validated_token(self.tokens['access'])
+        # Медленный запрос прочитал строку до смены роли...
+        stale = CustomUser.objects.select_related('role').get(pk=self.user.pk)
+        with self.captureOnCommitCallbacks(execute=True):
+            user = CustomUser.objects.get(pk=self.user.pk)
+            user.role = Role.objects.create(name=Role.MANAGER)
+            user.save()
+
+        # ...и записывает прочитанную версию уже после неё
+        queryset = mock.Mock(get=mock.Mock(return_value=stale))
+        with mock.patch.object(CustomUser.objects, 'select_related',
+                               return_value=queryset):
+            authentication.get_user(token)
+        self.assertEqual(get_token_version(self.user.pk), user.token_version)
+
+        with self.assertNumQueries(1):
+            self.assertEqual(authentication.get_user(token).role.name, Role.MANAGER)
+
+    def test_stale_read_after_bulk_soft_delete(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            CustomUser.objects.filter(pk=self.user.pk).soft_delete()
+        remember_token_version(self.user.pk, self.user.token_version)
+        self.assertEqual(get_token_version(self.user.pk), self.user.token_version + 1)
+        self.assertEqual(self.client.get('/api/update').status_code, 401)
+
+    def test_process_local_cache_caps_timeout(self):
+        self.assertEqual(_timeout(), 60 * 60 * 24)
+        with override_settings(CACHES=LOCAL_CACHE):
+            self.assertEqual(_timeout(), 5)
+
+
+class TokenCacheTest(AuthAPITestCase):
+    """
+    Кеш проверенных токенов: подпись проверяется один раз, запись
+    живёт до exp, логаут и soft delete удаляют токены пользователя.
+    """
+
+    def setUp(self):
+        token_cache.clear()
+        super().setUp()
+
+    @contextmanager
+    def count_decodes(self):
+        decodes = []
+        original = Token.__init__
+
+        def counting(token, *args, **kwargs):
+            decodes.append(type(token))
+            original(token, *args, **kwargs)
+
+        with mock.patch.object(Token, '__init__', counting):
+            yield decodes
+
+    def test_decodes_once(self):
+        with self.count_decodes() as decodes:
+            for _ in range(3):
+                self.assertEqual(self.client.get('/api/update').status_code, 200)
+            for _ in range(2):
+                response = self.client.post('/api/token/verify/',
+                                            {'token': self.tokens['access']},
+                                            format='json')
+                self.assertEqual(response.status_code, 200)
+        self.assertEqual(decodes, [AccessToken, UntypedToken])
+
+    def test_expired_entry_is_dropped(self):
+        token = token_cache.validate(AccessToken, self.tokens['access'])
+        expired = token['exp'] + 1
+        with self.count_decodes() as decodes, \
+                mock.patch('users.token_cache.time.time', return_value=expired):
+            token_cache.validate(AccessToken, self.tokens['access'])
+        self.assertEqual(decodes, [AccessToken])
+
+    @override_settings(TOKEN_VERIFY_CACHE={'MAX_ENTRIES': 2})
+    def test_bounded(self):
+        for _ in range(3):
+            token_cache.validate(AccessToken, self.login()['access'])
+        self.assertEqual(len(token_cache), 2)
+
+    def test_logout_forgets_user_tokens(self):
+        self.client.get('/api/update')
+        response = self.client.post('/api/logout', {'refresh': self.tokens['refresh']},
+                                    format='json')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(len(token_cache), 0)
+
+    def test_soft_delete_forgets_user_tokens(self):
+        self.client.get('/api/update')
+        with self.captureOnCommitCallbacks(execute=True):
+            CustomUser.objects.filter(pk=self.user.pk).soft_delete()
+        self.assertEqual(len(token_cache), 0)
+
+        with self.count_decodes() as decodes:
+            self.assertEqual(self.client.get('/api/update').status_code, 401)
+        self.assertEqual(decodes, [AccessToken])
+
+
+class AsyncAuthViewsTest(AuthAPITestCase):
+    """
+    Async-варианты входа, смены пароля и списка пользователей.
+    """
+
+    async def test_login(self):
+        response = await self.async_client.post(
+            '/api/async/login/',
+            {'email': 'user@example.com', 'password': 'password123'},
+            content_type='application/json',
+        )
+        self.assertEqual(response.status_code, 200)
+        self.assertLessEqual({'access', 'refresh'}, set(response.json()))
+
+        response = await self.async_client.post(
+            '/api/async/login/',
+            {'email': 'user@example.com', 'password': 'wrong'},
+            content_type='application/json',
+        )
+        self.assertNotEqual(response.status_code, 200)
+
+    async def test_user_list_matches_sync(self):
+        headers = {'Authorization': f"Bearer {self.tokens['access']}"}
+        sync = await self.async_client.get('/api/users', headers=headers)
+        response = await self.async_client.get('/api/async/users', headers=headers)
+        self.assertEqual(response.status_code, sync.status_code)
+        self.assertEqual(response.json(), sync.json())
+
+    async def test_user_list_requires_token(self):
+        response = await self.async_client.get('/api/async/users')
+        self.assertEqual(response.status_code, 401)
+
+    async def test_change_password(self):
+        headers = {'Authorization': f"Bearer {self.tokens['access']}"}
+        data = {'old_password': 'wrong', 'new_password': 'new-password456',
+                'new_password_confirm': 'new-password456'}
+        response = await self.async_client.put('/api/async/profile/change-password',
+                                               data, content_type='application/json',
+                                               headers=headers)
+        self.assertEqual(response.status_code, 400)
+
+        data['old_password'] = 'password123'
+        response = await self.async_client.put('/api/async/profile/change-password',
+                                               data, content_type='application/json',
+                                               headers=headers)
+        self.assertEqual(response.status_code, 200)
+        user = await CustomUser.objects.aget(pk=self.user.pk)
+        self.assertTrue(await user.acheck_password('new-password456'))
+
+
+class ReregisteredEmailTest(AuthAPITestCase):
+    """
+    Email уникален только среди активных: после soft delete его можно
+    зарегистрировать снова, и токены нового пользователя работают.
+    """
+
+    def reregister(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            self.client.delete('/api/profile/delete')
+        self.client.credentials()
+        response = self.client.post('/api/register', {
+            'first_name': 'Пётр', 'email': 'user@example.com',
+            'password': 'password456', 'password_confirm': 'password456',
+        }, format='json')
+        self.assertEqual(response.status_code, 201)
+        return CustomUser.objects.get(email='user@example.com', is_active=True)
+
+    def test_logout(self):
+        user = self.reregister()
+        tokens = self.login('password456')
+        self.client.credentials(HTTP_AUTHORIZATION=f"Bearer {tokens['access']}")
+
+        response = self.client.post('/api/logout', {'refresh': tokens['refresh']},
+                                    format='json')
+        self.assertEqual(response.status_code, 200)
+        blacklisted = BlacklistedToken.objects.get(token__jti=RefreshToken(
+            tokens['refresh'], verify=False)['jti'])
+        self.assertEqual(blacklisted.token.user, user)
+
+    def test_refresh(self):
+        user = self.reregister()
+        tokens = self.login('password456')
+        response = self.client.post('/api/token/refresh/',
+                                    {'refresh': tokens['refresh']}, format='json')
+        self.assertEqual(response.status_code, 200)
+        access = AccessToken(response.data['access'])
+        self.assertEqual(access['user_id'], user.pk)
@@ -0,0 +1,92 @@
+from django.contrib.auth import get_user_model
+from rest_framework_simplejwt.settings import api_settings
+from rest_framework_simplejwt.token_blacklist.models import (
+    BlacklistedToken,
+    OutstandingToken,
+)
+from rest_framework_simplejwt.tokens import RefreshToken, Token
+from rest_framework_simplejwt.utils import datetime_from_epoch
+
+from users.blacklist_filter import blacklist_filter
+from users.token_versions import remember_token_version
+
+USER_ID_CLAIM = 'user_id'
+ROLE_CLAIM = 'role'
+ROLE_ID_CLAIM = 'role_id'
+IS_ACTIVE_CLAIM = 'is_active'
+TOKEN_VERSION_CLAIM = 'ver'
+
+
+def set_user_claims(token, user):
+    """
+    Записывает в токен данные, достаточные для построения пользователя
+    без запроса к базе (см. my_auth.authentication).
+    """
+    token[USER_ID_CLAIM] = user.pk
+    token[ROLE_CLAIM] = user.role.name
+    token[ROLE_ID_CLAIM] = user.role_id
+    token[IS_ACTIVE_CLAIM] = user.is_active
+    token[TOKEN_VERSION_CLAIM] = user.token_version
+    return token
+
+
+def token_user_lookup(payload):
+    """
+    Условие поиска владельца токена. Email (USER_ID_CLAIM SimpleJWT)
+    уникален только среди активных пользователей, поэтому ищем по user_id,
+    а у токенов без него — активного пользователя с этим email.
+    """
+    user_id = payload.get(USER_ID_CLAIM)
+    if user_id is not None:
+        return {'pk': user_id}
+    return {'email': payload.get(api_settings.USER_ID_CLAIM), 'is_active': True}
+
+
+class UserClaimsToken(Token):
+    """
+    Добавляет claims пользователя при выпуске токена.
+    Стоит в MRO после BlacklistMixin, поэтому OutstandingToken
+    сохраняется уже с полным набором claims.
+    """
+
+    @classmethod
+    def for_user(cls, user):
+        token = super().for_user(user)
+        set_user_claims(token, user)
+        remember_token_version(user.pk, user.token_version)
+        return token
+
+
+class CustomRefreshToken(RefreshToken, UserClaimsToken):
+    """
+    Refresh-токен с claims пользователя; access-токен наследует их
+    через RefreshToken.access_token.
+    """
+
+    def check_blacklist(self):
+        # В базу идём, только если фильтр Блума допускает, что jti в списке
+        if blacklist_filter.might_contain(self.payload[api_settings.JTI_CLAIM]):
+            super().check_blacklist()
+
+    def outstand(self):
+        """
+        Как в BlacklistMixin, но владелец ищется по token_user_lookup:
+        get(email=...) после повторной регистрации удалённого email
+        нашёл бы двух пользователей (MultipleObjectsReturned).
+        """
+        return OutstandingToken.objects.get_or_create(
+            jti=self.payload[api_settings.JTI_CLAIM],
+            defaults={
+                'user': get_user_model().objects.filter(
+                    **token_user_lookup(self.payload)
+                ).first(),
+                'created_at': self.current_time,
+                'token': str(self),
+                'expires_at': datetime_from_epoch(self.payload['exp']),
+            },
+        )
+
+    def blacklist(self):
+        """Как в BlacklistMixin, через outstand."""
+        token, _ = self.outstand()
+        return BlacklistedToken.objects.get_or_create(token=token)
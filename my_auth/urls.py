@@ -1,12 +1,20 @@
 from django.urls import path
-from rest_framework_simplejwt.views import TokenRefreshView, TokenVerifyView
 
+from .async_views import (
+    AsyncChangePasswordView,
+    AsyncLoginView,
+    AsyncUserListView,
+    AsyncUserRegistrationView,
+)
 from .views import (
                     AdminDetailView,
                     ChangePasswordView,
                     CustomTokenObtainPairView,
+                    CustomTokenRefreshView,
+                    CustomTokenVerifyView,
                     LogoutView,
                     UserDeleteView,
+                    UserExportView,
                     UserListView,
                     UserRegistrationView,
                     UserUpdateView,
@@ -17,9 +25,10 @@ app_name = 'my_auth'
 urlpatterns = [
     path('api/register', UserRegistrationView.as_view(), name='user-register'),
     path('api/users', UserListView.as_view(), name='user-list'),
+    path('api/users/export', UserExportView.as_view(), name='user-export'),
     path('api/login/', CustomTokenObtainPairView.as_view(), name='user-login'),
-    path('api/token/refresh/', TokenRefreshView.as_view(), name='token_refresh'),
-    path('api/token/verify/', TokenVerifyView.as_view(), name='token_verify'),
+    path('api/token/refresh/', CustomTokenRefreshView.as_view(), name='token_refresh'),
+    path('api/token/verify/', CustomTokenVerifyView.as_view(), name='token_verify'),
     path('api/logout', LogoutView.as_view(), name='user-logout'),
     path('api/update', UserUpdateView.as_view(), name='user-update'),
     path('api/profile/change-password',
@@ -27,5 +36,13 @@ urlpatterns = [
          name='change-password'
     ),
     path('api/profile/delete', UserDeleteView.as_view(), name='user-delete'),
-    path('api/users/<int:pk>', AdminDetailView.as_view(), name='user-detail')
+    path('api/users/<int:pk>', AdminDetailView.as_view(), name='user-detail'),
+
+    # Async-варианты для ASGI
+    path('api/async/register', AsyncUserRegistrationView.as_view(),
+         name='async-user-register'),
+    path('api/async/login/', AsyncLoginView.as_view(), name='async-user-login'),
+    path('api/async/profile/change-password', AsyncChangePasswordView.as_view(),
+         name='async-change-password'),
+    path('api/async/users', AsyncUserListView.as_view(), name='async-user-list'),
 ]
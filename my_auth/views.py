@@ -5,37 +5,48 @@ from rest_framework.generics import (
     RetrieveUpdateAPIView,
     RetrieveUpdateDestroyAPIView,
 )
-from rest_framework.pagination import PageNumberPagination
 from rest_framework.permissions import AllowAny, IsAuthenticated
 from rest_framework.response import Response
 from rest_framework.views import APIView
-from rest_framework_simplejwt.tokens import RefreshToken
-from rest_framework_simplejwt.views import TokenViewBase
+from rest_framework_simplejwt.views import (
+    TokenRefreshView,
+    TokenVerifyView,
+    TokenViewBase,
+)
 
+from users.conditional import ConditionalGetMixin
+from users.export import get_export_type, serializer_columns, stream_export
 from users.models import CustomUser
+from users.pagination import KeysetPagination
+from users.profiling import ProfilingMixin
+from users.throttling import LoginRateThrottle
 
 from .permissions import IsAdmin
 from .serializers import (
     ChangePasswordSerializer,
     CustomTokenObtainPairSerializer,
+    CustomTokenVerifySerializer,
     LogoutSerializer,
     UpdateProfileSerializer,
     UserProfileSerializer,
     UserRegistrationSerializer,
     UserUpdateSerializer,
+    registration_data,
 )
+from .tokens import CustomRefreshToken
 
 
-class UserApiListPagination(PageNumberPagination):
+class UserApiListPagination(KeysetPagination):
     """
     Настройки пагинации для списка пользователей
     """
     page_size = 5
     page_size_query_param = 'page_size'
     max_page_size = 10
+    include_count = True
 
 
-class UserRegistrationView(CreateAPIView):
+class UserRegistrationView(ProfilingMixin, CreateAPIView):
     """
     API для регистрации новых пользователей
     Доступно без авторизации
@@ -50,36 +61,58 @@ class UserRegistrationView(CreateAPIView):
         user = serializer.save()
 
         #Создаем токены
-        refresh = RefreshToken.for_user(user)
+        refresh = CustomRefreshToken.for_user(user)
 
-        return Response({
-            'success': True,
-            'message': 'Пользователь успешно зарегистрирован',
-            'user': UserProfileSerializer(user).data,
-            'tokens': {
-                'refresh': str(refresh),  # Refresh token
-                'access': str(refresh.access_token),  # Access token
-            }
-        }, status=status.HTTP_201_CREATED)
+        return Response(registration_data(user, refresh),
+                        status=status.HTTP_201_CREATED)
 
-class UserListView(ListAPIView):
+class UserListView(ProfilingMixin, ConditionalGetMixin, ListAPIView):
     """
     API для получения списка пользователей
     Только для авторизованных пользователей
     """
-    queryset = CustomUser.objects.filter(is_active=True)
+    queryset = CustomUser.objects.filter(is_active=True).order_by('id')
     serializer_class = UserProfileSerializer
     permission_classes = [IsAuthenticated]
     pagination_class = UserApiListPagination
 
 
-class CustomTokenObtainPairView(TokenViewBase):
+class UserExportView(ProfilingMixin, APIView):
+    """
+    Потоковая выгрузка активных пользователей (?type=ndjson|csv)
+    Только для авторизованных пользователей
+    """
+    permission_classes = [IsAuthenticated]
+
+    def get(self, request):
+        export_type = get_export_type(request)
+        queryset = CustomUser.objects.filter(is_active=True).order_by('id')
+        return stream_export(queryset, serializer_columns(UserProfileSerializer()),
+                             export_type, 'users')
+
+
+class CustomTokenObtainPairView(ProfilingMixin, TokenViewBase):
     """
-    API для входа по email и получения JWT токенов
+    API для входа по email и получения JWT токенов.
+    Частота попыток ограничивается до проверки пароля (LoginRateThrottle).
     """
     serializer_class = CustomTokenObtainPairSerializer
+    throttle_classes = [LoginRateThrottle]
+
+class CustomTokenRefreshView(ProfilingMixin, TokenRefreshView):
+    """
+    API для обновления access-токена по refresh-токену
+    """
+
+
+class CustomTokenVerifyView(ProfilingMixin, TokenVerifyView):
+    """
+    API для проверки токена
+    """
+    serializer_class = CustomTokenVerifySerializer
+
 
-class LogoutView(APIView):
+class LogoutView(ProfilingMixin, APIView):
     permission_classes = [IsAuthenticated]
 
     def post(self, request):
@@ -92,7 +125,7 @@ class LogoutView(APIView):
         )
 
 
-class UserUpdateView(RetrieveUpdateAPIView):
+class UserUpdateView(ProfilingMixin, ConditionalGetMixin, RetrieveUpdateAPIView):
     """
     API для обновления данных текущего пользователя.
     """
@@ -100,23 +133,25 @@ class UserUpdateView(RetrieveUpdateAPIView):
     permission_classes = [IsAuthenticated]
 
     def get_object(self):
-        return self.request.user
+        # request.user построен из claims токена; профилю нужны все поля
+        return CustomUser.objects.select_related('role').get(pk=self.request.user.pk)
 
-class UserDeleteView(APIView):
+class UserDeleteView(ProfilingMixin, APIView):
     """
     API для мягкого удаления (soft delete) текущего пользователя.
     """
     permission_classes = [IsAuthenticated]
 
     def delete(self, request):
-        user = request.user
+        # request.user построен из claims токена: save() записал бы только их
+        user = CustomUser.objects.get(pk=request.user.pk)
         user.soft_delete()  # метод модели
         return Response(
             {'detail': 'Пользователь удалён (soft delete)'},
             status=status.HTTP_200_OK
         )
 
-class ChangePasswordView(APIView):
+class ChangePasswordView(ProfilingMixin, APIView):
     """
     API для смены пароля текущего пользователя.
     """
@@ -125,7 +160,7 @@ class ChangePasswordView(APIView):
     def put(self, request):
         serializer = ChangePasswordSerializer(data=request.data)
         serializer.is_valid(raise_exception=True)
-        user = request.user
+        user = CustomUser.objects.get(pk=request.user.pk)
 
         if not user.check_password(serializer.validated_data['old_password']):
             return Response(
@@ -141,7 +176,7 @@ class ChangePasswordView(APIView):
         )
 
 
-class AdminDetailView(RetrieveUpdateDestroyAPIView):
+class AdminDetailView(ProfilingMixin, RetrieveUpdateDestroyAPIView):
     """
     Админ может просматривать, обновлять и удалять любого пользователя.
     При удалении пользователя вызывается soft_delete(),
@@ -0,0 +1,5 @@
+from elements.viewsets import rbac_serializer
+
+from .models import Product
+
+ProductSerializer = rbac_serializer(Product, fields=['id', 'name', 'price'])
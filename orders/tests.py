@@ -1,2 +1,110 @@
+from tempfile import TemporaryDirectory
 
-# Create your tests here.
+from django.contrib.contenttypes.models import ContentType
+from django.test import override_settings
+from rest_framework.test import APITestCase
+
+from users.models import AccessRule, CustomUser, Role
+
+from .models import Product
+
+# Общий кеш тестов — во временной папке, а не в django_cache/ проекта
+TEST_CACHE_DIR = TemporaryDirectory(prefix='test-cache-')
+test_cache = override_settings(CACHES={'default': {
+    'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache',
+    'LOCATION': TEST_CACHE_DIR.name,
+}})
+
+
+def setUpModule():
+    test_cache.enable()
+
+
+def tearDownModule():
+    test_cache.disable()
+    TEST_CACHE_DIR.cleanup()
+
+
+# Тесты входят много раз подряд с одного адреса: лимиты входа
+# проверяются отдельно (users.tests.LoginThrottleTest)
+@override_settings(LOGIN_THROTTLE={'ENABLED': False})
+class ProductAPITest(APITestCase):
+    """
+    CRUD api/products/ под RoleAccessPermission. У Product нет владельца:
+    права только на свои объекты (*_permission) ничего не разрешают.
+    """
+
+    @classmethod
+    def setUpTestData(cls):
+        role = Role.objects.create(name=Role.MANAGER)
+        cls.rule = AccessRule.objects.create(
+            role=role, content_type=ContentType.objects.get_for_model(Product),
+        )
+        user = CustomUser(email='manager@example.com', first_name='Иван', role=role)
+        user.set_password('password123')
+        user.save()
+
+    def setUp(self):
+        response = self.client.post(
+            '/api/login/',
+            {'email': 'manager@example.com', 'password': 'password123'},
+            format='json',
+        )
+        self.client.credentials(HTTP_AUTHORIZATION=f"Bearer {response.data['access']}")
+        self.product = Product.objects.create(name='товар', price='10.00')
+        self.url = f'/api/products/{self.product.pk}/'
+
+    def set_rule(self, **permissions):
+        rule = AccessRule.objects.get(pk=self.rule.pk)
+        for name, value in permissions.items():
+            setattr(rule, name, value)
+        with self.captureOnCommitCallbacks(execute=True):
+            rule.save()
+
+    def test_list(self):
+        self.assertEqual(self.client.get('/api/products/').status_code, 403)
+
+        self.set_rule(read_all_permission=True)
+        response = self.client.get('/api/products/')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual([item['name'] for item in response.data['results']], ['товар'])
+
+    def test_create(self):
+        data = {'name': 'новый', 'price': '5.50'}
+        self.assertEqual(self.client.post('/api/products/', data,
+                                          format='json').status_code, 403)
+
+        self.set_rule(create_permission=True)
+        response = self.client.post('/api/products/', data, format='json')
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(Product.objects.get(pk=response.data['id']).name, 'новый')
+
+    def test_update(self):
+        self.set_rule(update_all_permission=True)
+        response = self.client.patch(self.url, {'price': '12.00'}, format='json')
+        self.assertEqual(response.status_code, 200)
+        self.product.refresh_from_db()
+        self.assertEqual(str(self.product.price), '12.00')
+
+        self.set_rule(update_all_permission=False)
+        response = self.client.patch(self.url, {'price': '1.00'}, format='json')
+        self.assertEqual(response.status_code, 404)
+
+    def test_delete(self):
+        self.assertEqual(self.client.delete(self.url).status_code, 404)
+
+        self.set_rule(delete_all_permission=True)
+        self.assertEqual(self.client.delete(self.url).status_code, 204)
+        self.assertFalse(Product.objects.exists())
+
+    def test_own_permissions_grant_nothing(self):
+        self.set_rule(read_permission=True, update_permission=True,
+                      delete_permission=True)
+        response = self.client.get('/api/products/')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data['results'], [])
+        self.assertEqual(self.client.get(self.url).status_code, 404)
+        self.assertEqual(self.client.patch(self.url, {'price': '1.00'},
+                                           format='json').status_code, 404)
+        self.assertEqual(self.client.delete(self.url).status_code, 404)
+        self.assertTrue(Product.objects.filter(pk=self.product.pk).exists())
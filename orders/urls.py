@@ -0,0 +1,13 @@
+from django.urls import include, path
+from rest_framework.routers import SimpleRouter
+
+from .views import ProductViewSet
+
+# Корень API (api/) уже отдаёт DefaultRouter из elements.urls
+router = SimpleRouter()
+router.register(r'products', ProductViewSet, basename='product')
+
+
+urlpatterns = [
+    path('api/', include(router.urls)),
+]
@@ -1,2 +1,14 @@
+from elements.viewsets import rbac_viewset
 
-# Create your views here.
+from .models import Product
+from .serializers import ProductSerializer
+
+ProductViewSet = rbac_viewset(
+    Product,
+    serializer_class=ProductSerializer,
+    owner_field=None,
+    __doc__="""
+    CRUD для Product. У товара нет владельца, поэтому доступ дают
+    только права *_all_permission (и create_permission для создания).
+    """,
+)
@@ -24,6 +24,20 @@ DATABASES = {
 }
 
 
+# Общий кеш процессов: счётчики поколений (правила доступа и т.п.).
+# Файлы видны всем воркерам одной машины; для нескольких машин укажите
+# Redis или Memcached. С LocMemCache ускорители, которым нужен общий кеш,
+# отключаются (users.shared_cache, предупреждение users.W001).
+CACHES = {
+    'default': {
+        'BACKEND': config('CACHE_BACKEND',
+                          default='django.core.cache.backends.filebased.FileBasedCache'),
+        'LOCATION': config('CACHE_LOCATION', default=str(BASE_DIR / 'django_cache')),
+        'OPTIONS': {'MAX_ENTRIES': 10000},
+    }
+}
+
+
 INSTALLED_APPS = [
     'django.contrib.admin',
     'django.contrib.auth',
@@ -44,6 +58,10 @@ INSTALLED_APPS = [
 
 
 MIDDLEWARE = [
+    # Профилирование запросов (Server-Timing), включается REQUEST_PROFILING
+    'users.profiling.RequestProfilingMiddleware',
+    # Метрики задержки по маршрутам (/metrics), настройки METRICS
+    'users.metrics.MetricsMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
@@ -81,6 +99,18 @@ AUTH_PASSWORD_VALIDATORS = [
     {'NAME': 'django.contrib.auth.password_validation.NumericPasswordValidator',},
 ]
 
+# Пул для bcrypt (users.hashing)
+PASSWORD_HASHING = {
+    'EXECUTOR': config('PASSWORD_HASHING_EXECUTOR', default='thread'),
+    'WORKERS': config('PASSWORD_HASHING_WORKERS', default=4, cast=int),
+    'MAX_PENDING': config('PASSWORD_HASHING_MAX_PENDING', default=32, cast=int),
+    'TIMEOUT': config('PASSWORD_HASHING_TIMEOUT', default=10, cast=int),
+    'ALGORITHM': config('PASSWORD_HASHING_ALGORITHM', default='bcrypt'),
+    'BCRYPT_ROUNDS': config('BCRYPT_ROUNDS', default=12, cast=int),
+    'PBKDF2_ITERATIONS': config('PBKDF2_ITERATIONS', default=600_000, cast=int),
+    'REHASH_ON_LOGIN': config('PASSWORD_REHASH_ON_LOGIN', default=True, cast=bool),
+}
+
 
 LANGUAGE_CODE = 'en-us'
 TIME_ZONE = 'UTC'
@@ -96,14 +126,68 @@ DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
 
 AUTH_USER_MODEL = 'users.CustomUser'
 
+# Вход только через JWT (my_auth), ModelBackend не используется.
+# Email уникален среди активных пользователей (частичный UniqueConstraint),
+# поэтому предупреждение о неуникальном USERNAME_FIELD отключено.
+AUTHENTICATION_BACKENDS = []
+SILENCED_SYSTEM_CHECKS = ['auth.W004']
+
+# Профилирование запросов по фазам (users.profiling)
+REQUEST_PROFILING = {
+    'ENABLED': config('REQUEST_PROFILING_ENABLED', default=False, cast=bool),
+    'SAMPLE_RATE': config('REQUEST_PROFILING_SAMPLE_RATE', default=0.01, cast=float),
+    'HEADER': True,
+    'LOG': True,
+}
+
+# Метрики Prometheus (users.metrics, эндпоинт /metrics).
+# При нескольких воркерах gunicorn укажите METRICS_MULTIPROCESS_DIR
+# и очищайте папку перед стартом сервера.
+METRICS = {
+    'ENABLED': config('METRICS_ENABLED', default=True, cast=bool),
+    'MULTIPROCESS_DIR': config('METRICS_MULTIPROCESS_DIR', default=''),
+    'FLUSH_INTERVAL': config('METRICS_FLUSH_INTERVAL', default=5.0, cast=float),
+    'TOKEN': config('METRICS_TOKEN', default=''),
+    'SCRAPE_INTERVAL': config('METRICS_SCRAPE_INTERVAL', default=15.0, cast=float),
+}
+
 # DRF
 REST_FRAMEWORK = {
     'DEFAULT_AUTHENTICATION_CLASSES': (
-        'rest_framework_simplejwt.authentication.JWTAuthentication',
+        'my_auth.authentication.CustomUserJWTAuthentication',
     ),
     'DEFAULT_PERMISSION_CLASSES': (
         'rest_framework.permissions.IsAuthenticated',
     ),
+    # IP клиента для ограничений: число доверенных прокси перед приложением.
+    # 0 — только REMOTE_ADDR, подделанный X-Forwarded-For не учитывается
+    'NUM_PROXIES': config('NUM_PROXIES', default=0, cast=int),
+}
+
+# Кеш проверенных JWT в памяти процесса (users.token_cache)
+TOKEN_VERIFY_CACHE = {
+    'ENABLED': config('TOKEN_VERIFY_CACHE_ENABLED', default=True, cast=bool),
+    'MAX_ENTRIES': config('TOKEN_VERIFY_CACHE_MAX_ENTRIES', default=10000, cast=int),
+}
+
+# Кеш ответов списков в памяти процесса (users.response_cache)
+RESPONSE_CACHE = {
+    'ENABLED': config('RESPONSE_CACHE_ENABLED', default=True, cast=bool),
+    'MAX_BYTES': config('RESPONSE_CACHE_MAX_BYTES', default=32 * 1024 * 1024, cast=int),
+    'MAX_ENTRIES': config('RESPONSE_CACHE_MAX_ENTRIES', default=1000, cast=int),
+}
+
+# Ограничение попыток входа (users.throttling)
+LOGIN_THROTTLE = {
+    'ENABLED': config('LOGIN_THROTTLE_ENABLED', default=True, cast=bool),
+    'STORE': config('LOGIN_THROTTLE_STORE', default='sqlite'),
+    'PATH': config('LOGIN_THROTTLE_PATH',
+                   default=str(BASE_DIR / 'login_throttle.sqlite3')),
+    'RATES': {
+        'email': config('LOGIN_THROTTLE_EMAIL_RATE', default='10/m'),
+        'ip': config('LOGIN_THROTTLE_IP_RATE', default='30/m'),
+        'global': config('LOGIN_THROTTLE_GLOBAL_RATE', default='600/m'),
+    },
 }
 
 # Simple JWT
@@ -120,4 +204,21 @@ SIMPLE_JWT = {
     "USER_ID_CLAIM": "email",
     "AUTH_TOKEN_CLASSES": ("rest_framework_simplejwt.tokens.AccessToken",),
     "TOKEN_TYPE_CLAIM": "token_type",
+    "TOKEN_REFRESH_SERIALIZER": "my_auth.serializers.CustomTokenRefreshSerializer",
+}
+
+# Время жизни версии токенов пользователя в кеше (users.token_versions)
+TOKEN_VERSION_CACHE_TIMEOUT = 60 * 60 * 24
+# То же для кеша в памяти процесса: другие воркеры не видят сброса версии
+TOKEN_VERSION_LOCAL_CACHE_TIMEOUT = 5
+
+# Периодическая очистка просроченных токенов в процессе (секунды, 0 — выключено)
+TOKEN_PRUNE_INTERVAL = config('TOKEN_PRUNE_INTERVAL', default=0, cast=int)
+TOKEN_PRUNE_OPTIONS = {'batch_size': 1000, 'sleep': 0.1}
+
+# Фильтр Блума перед проверкой чёрного списка refresh-токенов
+TOKEN_BLACKLIST_FILTER = {
+    'CAPACITY': config('TOKEN_BLACKLIST_FILTER_CAPACITY', default=1_000_000, cast=int),
+    'ERROR_RATE': config('TOKEN_BLACKLIST_FILTER_ERROR_RATE', default=0.001,
+                         cast=float),
 }
@@ -21,4 +21,5 @@ urlpatterns = [
     path('', include('my_auth.urls')),
     path('', include('elements.urls')),
     path('', include('users.urls')),
+    path('', include('orders.urls')),
 ]
@@ -14,3 +14,8 @@ from django.core.wsgi import get_wsgi_application
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'testproject.settings')
 
 application = get_wsgi_application()
+
+# Периодическая очистка просроченных токенов (если задан TOKEN_PRUNE_INTERVAL)
+from users.housekeeping import start_token_pruning_scheduler  # noqa: E402
+
+start_token_pruning_scheduler()
@@ -0,0 +1,140 @@
+"""
+Скомпилированная таблица прав доступа (AccessRule) на уровне процесса.
+
+Правила меняются редко, а читаются на каждом запросе, поэтому вся таблица
+загружается одним запросом и хранится в памяти процесса в виде словаря
+``(role_id, content_type_id) -> RuleFlags``.
+
+Согласованность между процессами обеспечивает счётчик поколений в общем
+кеше Django (``CACHES['default']``): при любом изменении правил или ролей
+записывается новое поколение (users.shared_cache.bump), и каждый процесс
+перестраивает свою таблицу при следующем обращении. Если кеш живёт в памяти
+процесса (users.shared_cache), другие воркеры счётчик не увидят, поэтому
+таблица не хранится и правило читается из базы при каждом обращении.
+"""
+import threading
+import time
+from collections import namedtuple
+
+from django.core.cache import cache
+
+from .metrics import access_rule_cache
+from .shared_cache import bump, is_shared_cache
+
+PERMISSION_FIELDS = (
+    'read_permission',
+    'create_permission',
+    'update_permission',
+    'delete_permission',
+    'read_all_permission',
+    'update_all_permission',
+    'delete_all_permission',
+)
+
+RuleFlags = namedtuple('RuleFlags', PERMISSION_FIELDS)
+
+GENERATION_KEY = 'access_rules:generation'
+
+
+class AccessRuleTable:
+    """
+    Таблица флагов AccessRule по ключу (role_id, content_type_id).
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._rules = {}
+        self._generation = None
+
+    @staticmethod
+    def _shared_generation():
+        """Текущее поколение правил из общего кеша."""
+        generation = cache.get(GENERATION_KEY)
+        if generation is None:
+            # Ключ ещё не создан или вытеснен: начинаем новое поколение,
+            # которое гарантированно не совпадёт с локальным.
+            cache.add(GENERATION_KEY, time.time_ns(), timeout=None)
+            generation = cache.get(GENERATION_KEY)
+        return generation
+
+    def _load(self):
+        from .models import AccessRule
+
+        rows = AccessRule.objects.values_list(
+            'role_id', 'content_type_id', *PERMISSION_FIELDS
+        )
+        return {(row[0], row[1]): RuleFlags(*row[2:]) for row in rows}
+
+    @staticmethod
+    def _rule_query(role_id, content_type_id):
+        """Одно правило из базы — без таблицы, если кеш не общий."""
+        from .models import AccessRule
+
+        access_rule_cache.inc(result='miss')
+        return AccessRule.objects.filter(
+            role_id=role_id, content_type_id=content_type_id
+        ).values_list(*PERMISSION_FIELDS)
+
+    def get(self, role_id, content_type_id):
+        """
+        Возвращает RuleFlags для пары (роль, тип объекта) или None,
+        если правило не задано.
+        """
+        if not is_shared_cache():
+            row = self._rule_query(role_id, content_type_id).first()
+            return None if row is None else RuleFlags(*row)
+
+        generation = self._shared_generation()
+        if generation != self._generation:
+            with self._lock:
+                if generation != self._generation:
+                    self._rules = self._load()
+                    self._generation = generation
+                    access_rule_cache.inc(result='miss')
+                    return self._rules.get((role_id, content_type_id))
+        access_rule_cache.inc(result='hit')
+        return self._rules.get((role_id, content_type_id))
+
+    async def aget(self, role_id, content_type_id):
+        """Асинхронный вариант get: async API кеша и async-итерация ORM."""
+        from .models import AccessRule
+
+        if not is_shared_cache():
+            row = await self._rule_query(role_id, content_type_id).afirst()
+            return None if row is None else RuleFlags(*row)
+
+        generation = await cache.aget(GENERATION_KEY)
+        if generation is None:
+            await cache.aadd(GENERATION_KEY, time.time_ns(), timeout=None)
+            generation = await cache.aget(GENERATION_KEY)
+        if generation != self._generation:
+            rows = AccessRule.objects.values_list(
+                'role_id', 'content_type_id', *PERMISSION_FIELDS
+            )
+            rules = {(row[0], row[1]): RuleFlags(*row[2:]) async for row in rows}
+            with self._lock:
+                self._rules = rules
+                self._generation = generation
+            access_rule_cache.inc(result='miss')
+            return rules.get((role_id, content_type_id))
+        access_rule_cache.inc(result='hit')
+        return self._rules.get((role_id, content_type_id))
+
+    def invalidate(self):
+        """Сбрасывает таблицу во всех процессах."""
+        bump(GENERATION_KEY)
+        with self._lock:
+            self._generation = None
+
+
+access_rules = AccessRuleTable()
+
+
+def get_rule(role_id, content_type_id):
+    """Флаги правила для роли и типа объекта (или None)."""
+    return access_rules.get(role_id, content_type_id)
+
+
+async def aget_rule(role_id, content_type_id):
+    """Асинхронный вариант get_rule."""
+    return await access_rules.aget(role_id, content_type_id)
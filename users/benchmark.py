@@ -0,0 +1,234 @@
+"""
+Нагрузочный замер горячих путей аутентификации и RBAC.
+
+Данные создаются в тестовой базе (как в manage.py test), запросы идут
+через DRF APIClient из нескольких потоков. По каждому сценарию
+считаются перцентили задержки, число SQL-запросов на запрос
+и пропускная способность; результат сохраняется в JSON, чтобы
+сравнивать прогоны между коммитами (см. команду benchmark).
+
+elements_list измеряет путь через базу: кеш ответов списка
+(users.response_cache) в нём выключен, иначе после прогрева все запросы
+были бы попаданиями. Попадания измеряет elements_list_cached.
+"""
+import random
+import statistics
+import time
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass
+
+from django.contrib.contenttypes.models import ContentType
+from django.db import connection
+from django.test.utils import CaptureQueriesContext, override_settings
+from rest_framework.test import APIClient
+
+from .access_cache import access_rules
+from .hashing import password_hasher
+from .models import AccessRule, CustomUser, Element, Role
+from .provisioning import DEFAULT_PERMISSIONS, create_access_rules, ensure_roles
+
+PASSWORD = 'benchmark-password'
+
+
+@dataclass
+class Scale:
+    users: int = 1000
+    elements: int = 10000
+    roles: int = 10
+
+
+def seed(scale, batch_size=1000):
+    """
+    Пользователи с ролью user, элементы, распределённые между ними
+    по кругу, и scale.roles дополнительных ролей с правилами на Element.
+    Пароль у всех одинаковый и хешируется один раз.
+    """
+    roles, _ = ensure_roles()
+    user_role = next(role for role in roles if role.name == Role.USER)
+    element_ct = ContentType.objects.get_for_model(Element)
+
+    extra_roles = Role.objects.bulk_create(
+        [Role(name=f'bench-{index}') for index in range(scale.roles)]
+    )
+    rules = [AccessRule(role=role, content_type=element_ct,
+                        **DEFAULT_PERMISSIONS[role.name])
+             for role in roles]
+    rules += [AccessRule(role=role, content_type=element_ct,
+                         **DEFAULT_PERMISSIONS[Role.USER])
+              for role in extra_roles]
+    create_access_rules(rules)
+    access_rules.invalidate()
+
+    password_hash = password_hasher.hash(PASSWORD)
+    CustomUser.objects.bulk_create(
+        (CustomUser(email=f'bench{index}@example.com', first_name='Иван',
+                    role=user_role, password_hash=password_hash)
+         for index in range(scale.users)),
+        batch_size=batch_size,
+    )
+    user_ids = list(CustomUser.objects.filter(email__startswith='bench')
+                    .order_by('id').values_list('id', flat=True))
+    Element.objects.bulk_create(
+        (Element(name=f'element {index}', description='benchmark',
+                 owner_id=user_ids[index % len(user_ids)])
+         for index in range(scale.elements)),
+        batch_size=batch_size,
+    )
+    return user_ids
+
+
+class Session:
+    """Клиент одного виртуального пользователя с его токенами."""
+
+    def __init__(self, email):
+        self.email = email
+        self.client = APIClient()
+        response = self.client.post('/api/login/', {'email': email,
+                                                    'password': PASSWORD},
+                                    format='json')
+        if response.status_code != 200:
+            raise RuntimeError(f"Не удалось войти как {email}: {response.status_code}")
+        self.refresh = response.data['refresh']
+        self.client.credentials(HTTP_AUTHORIZATION=f"Bearer {response.data['access']}")
+        self.element_ids = list(Element.objects.filter(owner__email=email)
+                                .values_list('id', flat=True)[:20])
+
+
+def login(session):
+    return session.client.post('/api/login/', {'email': session.email,
+                                               'password': PASSWORD},
+                               format='json')
+
+
+def refresh(session):
+    response = session.client.post('/api/token/refresh/',
+                                   {'refresh': session.refresh}, format='json')
+    # При ROTATE_REFRESH_TOKENS старый токен попадает в чёрный список
+    session.refresh = response.data.get('refresh', session.refresh)
+    return response
+
+
+def elements_list(session):
+    return session.client.get('/api/elements/')
+
+
+def elements_retrieve(session):
+    return session.client.get(f'/api/elements/{random.choice(session.element_ids)}/')
+
+
+def elements_update(session):
+    return session.client.patch(f'/api/elements/{random.choice(session.element_ids)}/',
+                                {'description': 'updated'}, format='json')
+
+
+def users_list(session):
+    return session.client.get('/api/users')
+
+
+SCENARIOS = {
+    'login': login,
+    'token_refresh': refresh,
+    'elements_list': elements_list,
+    'elements_list_cached': elements_list,
+    'elements_retrieve': elements_retrieve,
+    'elements_update': elements_update,
+    'users_list': users_list,
+}
+
+
+# Настройки на время сценария
+SCENARIO_SETTINGS = {
+    'elements_list': {'RESPONSE_CACHE': {'ENABLED': False}},
+}
+
+
+def percentiles(latencies):
+    if len(latencies) < 2:
+        value = latencies[0] if latencies else 0.0
+        return value, value, value
+    cuts = statistics.quantiles(latencies, n=100, method='inclusive')
+    return cuts[49], cuts[94], cuts[98]
+
+
+class BenchmarkRunner:
+    """
+    Прогоняет сценарии: requests запросов на сценарий, разделённых
+    между concurrency потоками, у каждого потока своя сессия.
+    """
+
+    def __init__(self, emails, requests=200, concurrency=4, warmup=5):
+        self.emails = emails
+        self.requests = requests
+        self.concurrency = concurrency
+        self.warmup = warmup
+
+    def run_worker(self, scenario, worker, count):
+        try:
+            session = Session(self.emails[worker % len(self.emails)])
+            for _ in range(self.warmup):
+                scenario(session)
+
+            result = {'latencies': [], 'queries': 0, 'errors': 0,
+                      'started': time.perf_counter()}
+            for _ in range(count):
+                with CaptureQueriesContext(connection) as captured:
+                    started = time.perf_counter()
+                    response = scenario(session)
+                    result['latencies'].append((time.perf_counter() - started) * 1000)
+                result['queries'] += len(captured.captured_queries)
+                if response.status_code >= 400:
+                    result['errors'] += 1
+            result['finished'] = time.perf_counter()
+            return result
+        finally:
+            # У каждого потока своё соединение с базой
+            connection.close()
+
+    def run(self, name):
+        scenario = SCENARIOS[name]
+        counts = [self.requests // self.concurrency
+                  + (worker < self.requests % self.concurrency)
+                  for worker in range(self.concurrency)]
+        with (override_settings(**SCENARIO_SETTINGS.get(name, {})),
+              ThreadPoolExecutor(self.concurrency) as executor):
+            results = list(executor.map(
+                lambda worker: self.run_worker(scenario, worker, counts[worker]),
+                range(self.concurrency),
+            ))
+
+        # Пропускная способность — по окну замеров, без логина и прогрева
+        elapsed = (max(result['finished'] for result in results)
+                   - min(result['started'] for result in results))
+        latencies = [value for result in results for value in result['latencies']]
+        queries = sum(result['queries'] for result in results)
+        total = len(latencies)
+        p50, p95, p99 = percentiles(latencies)
+        return {
+            'requests': total,
+            'errors': sum(result['errors'] for result in results),
+            'p50_ms': round(p50, 3),
+            'p95_ms': round(p95, 3),
+            'p99_ms': round(p99, 3),
+            'mean_ms': round(statistics.fmean(latencies), 3) if total else 0.0,
+            'queries_per_request': round(queries / total, 2) if total else 0.0,
+            'throughput_rps': round(total / elapsed, 1) if elapsed else 0.0,
+        }
+
+
+def compare(previous, current, keys=('p50_ms', 'p95_ms', 'p99_ms',
+                                      'queries_per_request', 'throughput_rps')):
+    """Строки сравнения двух результатов: значение и изменение в процентах."""
+    lines = []
+    for name, stats in current['scenarios'].items():
+        old = previous.get('scenarios', {}).get(name)
+        if old is None:
+            continue
+        parts = []
+        for key in keys:
+            before, after = old.get(key), stats.get(key)
+            if before is None or after is None:
+                continue
+            change = (after - before) / before * 100 if before else 0.0
+            parts.append(f"{key} {before} → {after} ({change:+.1f}%)")
+        lines.append(f"{name}: " + ', '.join(parts))
+    return lines
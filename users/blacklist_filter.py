@@ -0,0 +1,165 @@
+"""
+Ускоритель проверки чёрного списка refresh-токенов.
+
+Почти все проверяемые токены не в чёрном списке, поэтому перед запросом
+к BlacklistedToken jti проверяется по фильтру Блума в памяти процесса:
+«точно нет» — отвечаем без базы, «возможно есть» — проверяем в базе.
+
+Фильтр дополняется инкрементально: при каждой вставке в BlacklistedToken
+меняется общая версия в кеше, и процессы догружают строки с id
+больше последнего загруженного. Пропуски в последовательности id
+(транзакции, зафиксированные не по порядку) перепроверяются при
+следующих синхронизациях. После очистки таблицы (users.housekeeping)
+меняется эпоха, и фильтр перестраивается целиком.
+
+Версия и эпоха должны быть видны всем процессам. С кешем в памяти
+процесса (LocMemCache) вставки в другом воркере фильтр бы не увидел,
+поэтому он отключается и каждый токен проверяется в базе.
+"""
+import hashlib
+import math
+import threading
+import time
+
+from django.conf import settings
+from django.core.cache import cache
+
+from .shared_cache import bump, is_shared_cache
+
+VERSION_KEY = 'token_blacklist:version'
+EPOCH_KEY = 'token_blacklist:epoch'
+
+# Сколько секунд перепроверять пропущенные id, прежде чем считать,
+# что вставка была откачена
+GAP_TIMEOUT = 10 * 60
+# Сколько пропущенных id перед каждой новой строкой отслеживать
+MAX_GAP = 1000
+
+
+class BloomFilter:
+    """Фильтр Блума на bytearray с двойным хешированием blake2b."""
+
+    def __init__(self, capacity, error_rate=0.001):
+        self.capacity = capacity
+        self.size = max(8, int(-capacity * math.log(error_rate) / math.log(2) ** 2))
+        self.hashes = max(1, round(self.size / capacity * math.log(2)))
+        self.bits = bytearray((self.size + 7) // 8)
+        self.count = 0
+
+    def _positions(self, value: str):
+        digest = hashlib.blake2b(value.encode(), digest_size=16).digest()
+        h1 = int.from_bytes(digest[:8], 'little')
+        h2 = int.from_bytes(digest[8:], 'little') | 1
+        return ((h1 + i * h2) % self.size for i in range(self.hashes))
+
+    def add(self, value: str):
+        for position in self._positions(value):
+            self.bits[position >> 3] |= 1 << (position & 7)
+        self.count += 1
+
+    def __contains__(self, value: str):
+        return all(self.bits[position >> 3] & (1 << (position & 7))
+                   for position in self._positions(value))
+
+
+def _shared(key):
+    value = cache.get(key)
+    if value is None:
+        cache.add(key, time.time_ns(), timeout=None)
+        value = cache.get(key)
+    return value
+
+
+class BlacklistFilter:
+    """
+    Фильтр Блума по jti из BlacklistedToken, синхронизируемый
+    по версии и эпохе в общем кеше.
+    """
+
+    def __init__(self, capacity=None, error_rate=None):
+        options = getattr(settings, 'TOKEN_BLACKLIST_FILTER', {})
+        self.capacity = capacity or options.get('CAPACITY', 1_000_000)
+        self.error_rate = error_rate or options.get('ERROR_RATE', 0.001)
+        self._lock = threading.Lock()
+        self._bloom = None
+        self._version = None
+        self._epoch = None
+        self._last_id = 0
+        self._gaps = {}
+
+    def _rows(self, queryset):
+        return queryset.order_by('id').values_list('id', 'token__jti')
+
+    def _rebuild(self):
+        from rest_framework_simplejwt.token_blacklist.models import BlacklistedToken
+
+        total = BlacklistedToken.objects.count()
+        capacity = self.capacity
+        while capacity < total * 2:
+            capacity *= 2
+        self._bloom = BloomFilter(capacity, self.error_rate)
+        self._last_id = 0
+        self._gaps = {}
+        self._load(BlacklistedToken.objects.all(), track_gaps=False)
+        # У хвоста таблицы могут быть ещё не зафиксированные вставки
+        recent = set(BlacklistedToken.objects.filter(
+            pk__gt=self._last_id - MAX_GAP
+        ).values_list('pk', flat=True))
+        now = time.monotonic()
+        self._gaps = {pk: now for pk in range(max(1, self._last_id - MAX_GAP + 1),
+                                              self._last_id)
+                      if pk not in recent}
+
+    def _load(self, queryset, track_gaps=True):
+        for token_id, jti in self._rows(queryset).iterator(chunk_size=5000):
+            self._bloom.add(jti)
+            self._gaps.pop(token_id, None)
+            if token_id > self._last_id:
+                if track_gaps:
+                    # Пропущенные id могут принадлежать ещё не зафиксированным
+                    # вставкам: перепроверим их при следующих синхронизациях
+                    now = time.monotonic()
+                    start = max(self._last_id + 1, token_id - MAX_GAP)
+                    for missing in range(start, token_id):
+                        self._gaps.setdefault(missing, now)
+                self._last_id = token_id
+
+    def _sync(self):
+        from rest_framework_simplejwt.token_blacklist.models import BlacklistedToken
+
+        epoch, version = _shared(EPOCH_KEY), _shared(VERSION_KEY)
+        if epoch == self._epoch and version == self._version:
+            return
+        with self._lock:
+            if epoch != self._epoch or self._bloom is None:
+                self._rebuild()
+            elif version != self._version:
+                deadline = time.monotonic() - GAP_TIMEOUT
+                self._gaps = {pk: seen for pk, seen in self._gaps.items()
+                              if seen > deadline}
+                if self._gaps:
+                    self._load(BlacklistedToken.objects.filter(pk__in=list(self._gaps)))
+                self._load(BlacklistedToken.objects.filter(pk__gt=self._last_id))
+                if self._bloom.count > self._bloom.capacity:
+                    self._rebuild()
+            self._epoch, self._version = epoch, version
+
+    def might_contain(self, jti: str) -> bool:
+        """False — токен точно не в чёрном списке."""
+        if not is_shared_cache():
+            return True
+        self._sync()
+        return jti in self._bloom
+
+    @staticmethod
+    def notify_added():
+        """Вызывается после вставки в BlacklistedToken."""
+        bump(VERSION_KEY)
+
+    @staticmethod
+    def notify_pruned():
+        """Вызывается после удаления строк: фильтр перестроится целиком."""
+        bump(EPOCH_KEY)
+
+
+blacklist_filter = BlacklistFilter()
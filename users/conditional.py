@@ -0,0 +1,116 @@
+"""
+Условные GET-запросы (ETag, Last-Modified, 304 Not Modified).
+
+Валидаторы считаются без сериализации ответа:
+    список — один агрегатный запрос max(updated_at), count и max(id)
+             по выборке текущей страницы (с фильтром прав): при keyset-
+             пагинации его стоимость не зависит от размера таблицы;
+    объект — updated_at уже загруженного объекта.
+
+У списков только ETag: удаление объекта не сдвигает max(updated_at),
+но меняет count, поэтому Last-Modified для списка был бы неверным.
+ETag зависит от пути с параметрами и области видимости
+(get_cache_scope — та же, что у ключа кеша ответов): разные страницы
+и разные области видимости не получают один и тот же тег.
+"""
+import hashlib
+
+from django.core.exceptions import FieldDoesNotExist
+from django.db.models import Count, Max
+from django.utils.cache import get_conditional_response, patch_cache_control
+from django.utils.http import http_date
+from rest_framework.response import Response
+
+from .pagination import KeysetPagination
+from .profiling import phase
+
+
+def make_etag(*parts):
+    basis = repr(parts).encode()
+    return '"%s"' % hashlib.md5(basis, usedforsecurity=False).hexdigest()
+
+
+class ConditionalGetMixin:
+    """
+    ETag/Last-Modified для list и retrieve DRF-представлений.
+    Модель без поля updated_field обслуживается как обычно.
+    """
+    updated_field = 'updated_at'
+
+    def get_updated_field(self, model):
+        try:
+            model._meta.get_field(self.updated_field)
+        except FieldDoesNotExist:
+            return None
+        return self.updated_field
+
+    def get_cache_scope(self):
+        """Кому виден один и тот же ответ: по умолчанию — пользователю."""
+        return ('user', self.request.user.pk)
+
+    def get_etag(self, *parts):
+        request = self.request
+        return make_etag(request.get_full_path(), self.get_cache_scope(), *parts)
+
+    def get_list_window(self, queryset):
+        """
+        Выборка текущей страницы при keyset-пагинации, иначе весь queryset.
+        С ?count=1 в ответе общее число записей, и тег считается по всему списку.
+        """
+        paginator = self.paginator
+        if (isinstance(paginator, KeysetPagination)
+                and not paginator.get_include_count(self.request)):
+            window = paginator.get_window(queryset, self.request, self)
+            if window is not None:
+                return window
+        return queryset.order_by()
+
+    def get_list_etag(self, queryset):
+        """ETag списка по max(updated_at), count и max(id) страницы или None."""
+        field = self.get_updated_field(queryset.model)
+        if field is None:
+            return None
+        window = self.get_list_window(queryset)
+        with phase('queryset'):
+            # id растут монотонно: удаление внутри страницы сдвигает её границу
+            # (max(id)) или уменьшает count, даже если max(updated_at) тот же
+            stats = window.aggregate(last=Max(field), count=Count('pk'),
+                                     last_id=Max('pk'))
+        return self.get_etag('list', stats['last'], stats['count'], stats['last_id'])
+
+    def get_object_validators(self, instance):
+        """(ETag, Last-Modified) объекта или (None, None)."""
+        field = self.get_updated_field(type(instance))
+        if field is None:
+            return None, None
+        updated = getattr(instance, field)
+        if updated is None:
+            return None, None
+        return self.get_etag('object', instance.pk, updated), int(updated.timestamp())
+
+    def conditional(self, request, etag, last_modified, build_response):
+        """Ответ 304/412 по заголовкам запроса или build_response()."""
+        if etag is None:
+            return build_response()
+        response = get_conditional_response(request, etag=etag,
+                                            last_modified=last_modified)
+        if response is None:
+            response = build_response()
+        response.headers['ETag'] = etag
+        if last_modified is not None:
+            response.headers['Last-Modified'] = http_date(last_modified)
+        # Ответы зависят от пользователя; клиент сверяет их при каждом запросе
+        patch_cache_control(response, private=True, no_cache=True)
+        return response
+
+    def list(self, request, *args, **kwargs):
+        etag = self.get_list_etag(self.filter_queryset(self.get_queryset()))
+        return self.conditional(request, etag, None,
+                                lambda: super(ConditionalGetMixin, self).list(
+                                    request, *args, **kwargs))
+
+    def retrieve(self, request, *args, **kwargs):
+        instance = self.get_object()
+        etag, last_modified = self.get_object_validators(instance)
+        return self.conditional(request, etag, last_modified,
+                                lambda: Response(self.get_serializer(instance).data))
@@ -0,0 +1,303 @@
+"""
+Хеширование паролей в ограниченном пуле воркеров.
+
+bcrypt отпускает GIL, поэтому пул потоков даёт настоящий параллелизм;
+для изоляции от основного процесса можно выбрать пул процессов.
+Число одновременно ожидающих задач ограничено (back-pressure): когда
+пул переполнен, вызов завершается ошибкой PasswordHashingBusy (HTTP 503)
+вместо бесконечной очереди.
+
+Алгоритм и его параметры задаются настройками. Хеши со старыми
+параметрами продолжают проверяться, а после успешного входа
+пересчитываются в фоне (см. CustomUser.check_password).
+
+Настройки (settings.PASSWORD_HASHING):
+    EXECUTOR          — 'thread' или 'process'
+    WORKERS           — число воркеров пула
+    MAX_PENDING       — максимум задач в работе и в очереди
+    TIMEOUT           — сколько секунд синхронный вызов ждёт места в очереди
+    ALGORITHM         — алгоритм новых хешей: 'bcrypt' или 'pbkdf2_sha256'
+    BCRYPT_ROUNDS     — cost factor bcrypt
+    PBKDF2_ITERATIONS — число итераций pbkdf2_sha256
+    REHASH_ON_LOGIN   — пересчитывать устаревшие хеши после входа
+"""
+import asyncio
+import base64
+import hashlib
+import hmac
+import logging
+import secrets
+import threading
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from itertools import repeat
+
+import bcrypt
+from django.conf import settings
+from rest_framework import status
+from rest_framework.exceptions import APIException
+
+logger = logging.getLogger(__name__)
+
+DEFAULTS = {
+    'EXECUTOR': 'thread',
+    'WORKERS': 4,
+    'MAX_PENDING': 32,
+    'TIMEOUT': 10,
+    'ALGORITHM': 'bcrypt',
+    'BCRYPT_ROUNDS': 12,
+    'PBKDF2_ITERATIONS': 600_000,
+    'REHASH_ON_LOGIN': True,
+}
+
+
+class PasswordHashingBusy(APIException):
+    status_code = status.HTTP_503_SERVICE_UNAVAILABLE
+    default_detail = "Сервис перегружен, повторите попытку позже"
+    default_code = 'password_hashing_busy'
+
+
+class BcryptHasher:
+    """Хеши вида $2b$<cost>$..., совместимы со старыми записями."""
+    algorithm = 'bcrypt'
+
+    def __init__(self, rounds=12):
+        self.rounds = rounds
+
+    @staticmethod
+    def identify(encoded: str) -> bool:
+        return encoded.startswith('$2')
+
+    def encode(self, password: str) -> str:
+        return bcrypt.hashpw(password.encode(),
+                             bcrypt.gensalt(rounds=self.rounds)).decode()
+
+    def verify(self, password: str, encoded: str) -> bool:
+        return bcrypt.checkpw(password.encode(), encoded.encode())
+
+    @staticmethod
+    def params(encoded: str) -> int:
+        return int(encoded.split('$')[2])
+
+    def is_current(self, encoded: str) -> bool:
+        return self.params(encoded) == self.rounds
+
+
+class PBKDF2Hasher:
+    """Хеши вида pbkdf2_sha256$<iterations>$<salt>$<hash>."""
+    algorithm = 'pbkdf2_sha256'
+
+    def __init__(self, iterations=600_000):
+        self.iterations = iterations
+
+    @classmethod
+    def identify(cls, encoded: str) -> bool:
+        return encoded.startswith(cls.algorithm + '$')
+
+    def _derive(self, password: str, salt: str, iterations: int) -> str:
+        digest = hashlib.pbkdf2_hmac('sha256', password.encode(),
+                                     salt.encode(), iterations)
+        return base64.b64encode(digest).decode()
+
+    def encode(self, password: str) -> str:
+        salt = secrets.token_urlsafe(16)
+        digest = self._derive(password, salt, self.iterations)
+        return f"{self.algorithm}${self.iterations}${salt}${digest}"
+
+    def verify(self, password: str, encoded: str) -> bool:
+        _, iterations, salt, digest = encoded.split('$', 3)
+        return hmac.compare_digest(
+            self._derive(password, salt, int(iterations)), digest
+        )
+
+    @staticmethod
+    def params(encoded: str) -> int:
+        return int(encoded.split('$')[1])
+
+    def is_current(self, encoded: str) -> bool:
+        return self.params(encoded) == self.iterations
+
+
+HASHERS = {
+    BcryptHasher.algorithm: BcryptHasher,
+    PBKDF2Hasher.algorithm: PBKDF2Hasher,
+}
+
+
+def identify_hasher(encoded: str):
+    """Класс хешера, которым получен encoded, или None."""
+    for hasher_class in HASHERS.values():
+        if hasher_class.identify(encoded):
+            return hasher_class
+    return None
+
+
+def _encode(hasher, password: str) -> str:
+    return hasher.encode(password)
+
+
+def _verify(hasher, password: str, encoded: str) -> bool:
+    return hasher.verify(password, encoded)
+
+
+class PasswordHasherPool:
+    """
+    Пул для хеширования паролей с ограничением числа ожидающих задач.
+    Пул создаётся лениво при первом обращении.
+    """
+
+    def __init__(self, executor='thread', workers=4, max_pending=32, timeout=10,
+                 hashers=None, algorithm='bcrypt', rehash_on_login=True):
+        if executor not in ('thread', 'process'):
+            raise ValueError(f"Неизвестный тип пула: {executor}")
+        self.executor_type = executor
+        self.workers = workers
+        self.timeout = timeout
+        self.hashers = hashers or {
+            name: hasher_class() for name, hasher_class in HASHERS.items()
+        }
+        if algorithm not in self.hashers:
+            raise ValueError(f"Неизвестный алгоритм хеширования: {algorithm}")
+        self.hasher = self.hashers[algorithm]
+        self.rehash_on_login = rehash_on_login
+        self._slots = threading.BoundedSemaphore(max_pending)
+        self._executor = None
+        self._background = None
+        self._dummy_hash = None
+        self._lock = threading.Lock()
+
+    @classmethod
+    def from_settings(cls):
+        options = {**DEFAULTS, **getattr(settings, 'PASSWORD_HASHING', {})}
+        return cls(
+            executor=options['EXECUTOR'],
+            workers=options['WORKERS'],
+            max_pending=options['MAX_PENDING'],
+            timeout=options['TIMEOUT'],
+            hashers={
+                BcryptHasher.algorithm: BcryptHasher(options['BCRYPT_ROUNDS']),
+                PBKDF2Hasher.algorithm: PBKDF2Hasher(options['PBKDF2_ITERATIONS']),
+            },
+            algorithm=options['ALGORITHM'],
+            rehash_on_login=options['REHASH_ON_LOGIN'],
+        )
+
+    @property
+    def executor(self):
+        if self._executor is None:
+            with self._lock:
+                if self._executor is None:
+                    executor_class = (ThreadPoolExecutor
+                                      if self.executor_type == 'thread'
+                                      else ProcessPoolExecutor)
+                    self._executor = executor_class(max_workers=self.workers)
+        return self._executor
+
+    def submit(self, fn, *args, blocking=True):
+        """
+        Ставит задачу в пул. При переполнении ждёт не дольше TIMEOUT
+        (или не ждёт вовсе при blocking=False) и выбрасывает
+        PasswordHashingBusy.
+        """
+        acquired = (self._slots.acquire(timeout=self.timeout) if blocking
+                    else self._slots.acquire(blocking=False))
+        if not acquired:
+            raise PasswordHashingBusy()
+        try:
+            future = self.executor.submit(fn, *args)
+        except BaseException:
+            self._slots.release()
+            raise
+        future.add_done_callback(lambda _: self._slots.release())
+        return future
+
+    def _hasher_for(self, encoded: str):
+        hasher_class = identify_hasher(encoded)
+        if hasher_class is None:
+            raise ValueError("Неизвестный формат хеша пароля")
+        return self.hashers[hasher_class.algorithm]
+
+    def hash(self, password: str) -> str:
+        return self.submit(_encode, self.hasher, password).result()
+
+    def hash_many(self, passwords, chunksize=8):
+        """
+        Хеширует пачку паролей, распределяя её по всем воркерам пула.
+        Предназначен для пакетных операций (импорт), поэтому ограничение
+        MAX_PENDING не применяется.
+        """
+        return list(self.executor.map(_encode, repeat(self.hasher), passwords,
+                                      chunksize=chunksize))
+
+    def check(self, password: str, encoded: str) -> bool:
+        hasher = self._hasher_for(encoded)
+        return self.submit(_verify, hasher, password, encoded).result()
+
+    async def ahash(self, password: str) -> str:
+        # В event loop нельзя блокироваться в ожидании места в очереди
+        future = self.submit(_encode, self.hasher, password, blocking=False)
+        return await asyncio.wrap_future(future)
+
+    async def acheck(self, password: str, encoded: str) -> bool:
+        hasher = self._hasher_for(encoded)
+        future = self.submit(_verify, hasher, password, encoded, blocking=False)
+        return await asyncio.wrap_future(future)
+
+    def check_dummy(self, password: str) -> bool:
+        """
+        Проверка пароля по фиктивному хешу для неизвестного email:
+        ответ занимает столько же времени, сколько для существующего
+        пользователя. Всегда возвращает False.
+        """
+        if self._dummy_hash is None:
+            self._dummy_hash = self.hash(secrets.token_urlsafe(16))
+        self.check(password, self._dummy_hash)
+        return False
+
+    async def acheck_dummy(self, password: str) -> bool:
+        """Асинхронный вариант check_dummy."""
+        if self._dummy_hash is None:
+            self._dummy_hash = await self.ahash(secrets.token_urlsafe(16))
+        await self.acheck(password, self._dummy_hash)
+        return False
+
+    def needs_rehash(self, encoded: str) -> bool:
+        """Хеш получен другим алгоритмом или с другими параметрами."""
+        return not (self.hasher.identify(encoded)
+                    and self.hasher.is_current(encoded))
+
+    def schedule_rehash(self, password: str, store):
+        """
+        Пересчитывает хеш в фоне и передаёт его в store(new_hash).
+        Задача необязательная: при перегрузке пула она пропускается.
+        """
+        if not self.rehash_on_login:
+            return None
+        with self._lock:
+            if self._background is None:
+                self._background = ThreadPoolExecutor(
+                    max_workers=1, thread_name_prefix='password-rehash'
+                )
+        return self._background.submit(self._rehash, password, store)
+
+    def _rehash(self, password, store):
+        from django.db import connection
+
+        try:
+            store(self.submit(_encode, self.hasher, password,
+                              blocking=False).result())
+        except PasswordHashingBusy:
+            logger.info("Пул хеширования занят, пересчёт хеша отложен")
+        except Exception:
+            logger.exception("Не удалось пересчитать хеш пароля")
+        finally:
+            connection.close()
+
+    def shutdown(self, wait=True):
+        with self._lock:
+            for executor in (self._executor, self._background):
+                if executor is not None:
+                    executor.shutdown(wait=wait)
+            self._executor = self._background = None
+
+
+password_hasher = PasswordHasherPool.from_settings()
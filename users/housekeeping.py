@@ -0,0 +1,138 @@
+"""
+Обслуживание таблиц токенов SimpleJWT.
+
+OutstandingToken пополняется при каждом логине и регистрации,
+BlacklistedToken — при логауте и soft delete, и сами по себе они
+не очищаются. TokenPruner удаляет просроченные токены пачками
+по возрастанию id с паузами между пачками, чтобы не блокировать
+таблицы надолго. Удалённые строки из базы уходят, поэтому прерванный
+проход продолжается сам: следующий начинается с наименьшего id
+оставшихся просроченных токенов, отдельно хранить прогресс не нужно.
+
+Индексы для поиска просроченных токенов создаёт миграция
+users.0004_token_blacklist_indexes.
+"""
+import logging
+import threading
+import time
+from dataclasses import dataclass
+
+from django.conf import settings
+from django.db import connection, transaction
+from django.utils import timezone
+from rest_framework_simplejwt.token_blacklist.models import (
+    BlacklistedToken,
+    OutstandingToken,
+)
+
+from .blacklist_filter import blacklist_filter
+from .models import TaskLock
+
+logger = logging.getLogger(__name__)
+
+LOCK_NAME = 'token_prune'
+
+
+@dataclass
+class PruneResult:
+    outstanding: int = 0
+    blacklisted: int = 0
+    batches: int = 0
+    last_id: int = 0
+    seconds: float = 0.0
+
+    @property
+    def rows(self):
+        return self.outstanding + self.blacklisted
+
+    @property
+    def rows_per_second(self):
+        return self.rows / self.seconds if self.seconds else 0.0
+
+
+class TokenPruner:
+    """
+    Удаляет токены с expires_at <= now пачками по batch_size.
+    """
+
+    def __init__(self, batch_size=1000, sleep=0.1, max_batches=None):
+        self.batch_size = batch_size
+        self.sleep = sleep
+        self.max_batches = max_batches
+
+    def run(self, on_batch=None):
+        result = PruneResult()
+        started = time.monotonic()
+        cutoff = timezone.now()
+        while self.max_batches is None or result.batches < self.max_batches:
+            ids = list(
+                OutstandingToken.objects.filter(expires_at__lte=cutoff,
+                                                id__gt=result.last_id)
+                .order_by('id')
+                .values_list('id', flat=True)[:self.batch_size]
+            )
+            if not ids:
+                break
+
+            with transaction.atomic():
+                blacklisted, _ = BlacklistedToken.objects.filter(
+                    token_id__in=ids
+                ).delete()
+                outstanding, _ = OutstandingToken.objects.filter(
+                    id__in=ids
+                ).delete()
+
+            result.blacklisted += blacklisted
+            result.outstanding += outstanding
+            result.batches += 1
+            result.last_id = ids[-1]
+            result.seconds = time.monotonic() - started
+            if on_batch is not None:
+                on_batch(result)
+            if len(ids) < self.batch_size:
+                break
+            if self.sleep:
+                time.sleep(self.sleep)
+
+        result.seconds = time.monotonic() - started
+        if result.blacklisted:
+            blacklist_filter.notify_pruned()
+        return result
+
+
+def _scheduled_prune(interval):
+    # Несколько воркеров (и машин): проход выполняет тот, кто взял аренду в базе
+    try:
+        acquired = TaskLock.acquire(LOCK_NAME, interval)
+    except Exception:
+        logger.exception("Не удалось взять блокировку очистки токенов")
+        acquired = False
+    if acquired:
+        try:
+            result = TokenPruner(**getattr(settings, 'TOKEN_PRUNE_OPTIONS', {})).run()
+            if result.rows:
+                logger.info("Удалено токенов: %s (%.0f строк/с)",
+                            result.rows, result.rows_per_second)
+        except Exception:
+            logger.exception("Ошибка при очистке токенов")
+        finally:
+            connection.close()
+    _start_timer(interval)
+
+
+def _start_timer(interval):
+    timer = threading.Timer(interval, _scheduled_prune, args=(interval,))
+    timer.daemon = True
+    timer.start()
+    return timer
+
+
+def start_token_pruning_scheduler():
+    """
+    Запускает периодическую очистку в фоновом потоке, если задан
+    settings.TOKEN_PRUNE_INTERVAL (секунды).
+    """
+    interval = getattr(settings, 'TOKEN_PRUNE_INTERVAL', None)
+    if interval:
+        return _start_timer(interval)
+    return None
@@ -0,0 +1,162 @@
+"""
+Пакетный импорт пользователей из CSV или NDJSON.
+
+Файл читается потоково и обрабатывается пачками: строки проверяются
+правилами UserRegistrationSerializer, занятые email ищутся одним
+запросом на пачку, пароли хешируются параллельно в пуле воркеров,
+запись идёт через bulk_create в отдельной транзакции на пачку.
+"""
+import csv
+import json
+import time
+from dataclasses import dataclass, field
+
+from django.db import DatabaseError, transaction
+
+from my_auth.serializers import UserRegistrationSerializer
+
+from .hashing import password_hasher
+from .models import CustomUser
+
+IMPORT_FORMATS = ('csv', 'ndjson')
+
+
+class ImportUserSerializer(UserRegistrationSerializer):
+    """
+    Правила регистрации без запроса на каждый email:
+    уникальность проверяется сразу для всей пачки.
+    """
+
+    def validate_email(self, value):
+        return value
+
+
+def iter_csv_rows(stream):
+    for line, row in enumerate(csv.DictReader(stream), start=2):
+        yield line, row
+
+
+def iter_ndjson_rows(stream):
+    for line, text in enumerate(stream, start=1):
+        if not text.strip():
+            continue
+        try:
+            row = json.loads(text)
+        except ValueError as exc:
+            yield line, exc
+            continue
+        yield line, row
+
+
+def get_import_format(path, default='csv'):
+    """Формат по расширению файла."""
+    if path.endswith(('.ndjson', '.jsonl')):
+        return 'ndjson'
+    if path.endswith('.csv'):
+        return 'csv'
+    return default
+
+
+@dataclass
+class ImportResult:
+    processed: int = 0
+    created: int = 0
+    batches: int = 0
+    seconds: float = 0.0
+    errors: list = field(default_factory=list)
+
+    @property
+    def rows_per_second(self):
+        return self.processed / self.seconds if self.seconds else 0.0
+
+
+class UserImporter:
+    """
+    Создаёт пользователей с ролью role пачками по batch_size строк.
+    hasher — пул хеширования (по умолчанию общий users.hashing.password_hasher).
+    """
+
+    def __init__(self, role, batch_size=1000, hasher=None):
+        self.role = role
+        self.batch_size = batch_size
+        self.hasher = hasher or password_hasher
+
+    def run(self, rows, on_batch=None):
+        """
+        rows — пары (номер строки, dict или исключение разбора).
+        Ошибки попадают в result.errors как (номер строки, ошибки).
+        """
+        result = ImportResult()
+        started = time.monotonic()
+        batch = []
+        for line, row in rows:
+            batch.append((line, row))
+            if len(batch) >= self.batch_size:
+                self.import_batch(batch, result)
+                self._report(result, started, on_batch)
+                batch = []
+        if batch:
+            self.import_batch(batch, result)
+            self._report(result, started, on_batch)
+        result.seconds = time.monotonic() - started
+        return result
+
+    def _report(self, result, started, on_batch):
+        result.batches += 1
+        result.seconds = time.monotonic() - started
+        if on_batch is not None:
+            on_batch(result)
+
+    def validate(self, batch, result):
+        """Пары (номер строки, validated_data) для корректных строк."""
+        valid, seen = [], set()
+        for line, row in batch:
+            if not isinstance(row, dict):
+                result.errors.append((line, {'detail': str(row)}))
+                continue
+            row = {key: value for key, value in row.items() if value not in ('', None)}
+            row.setdefault('password_confirm', row.get('password'))
+            serializer = ImportUserSerializer(data=row)
+            if not serializer.is_valid():
+                result.errors.append((line, serializer.errors))
+                continue
+            email = serializer.validated_data['email']
+            if email in seen:
+                result.errors.append((line, {'email': "Email повторяется в файле"}))
+                continue
+            seen.add(email)
+            valid.append((line, serializer.validated_data))
+
+        taken = set(CustomUser.objects.filter(
+            email__in=[data['email'] for _, data in valid], is_active=True
+        ).values_list('email', flat=True))
+        unique = []
+        for line, data in valid:
+            if data['email'] in taken:
+                result.errors.append(
+                    (line, {'email': "Пользователь с таким email уже существует"})
+                )
+            else:
+                unique.append((line, data))
+        return unique
+
+    def import_batch(self, batch, result):
+        result.processed += len(batch)
+        valid = self.validate(batch, result)
+        if not valid:
+            return
+
+        hashes = self.hasher.hash_many([data['password'] for _, data in valid])
+        users = []
+        for (_, data), password_hash in zip(valid, hashes):
+            data = {key: value for key, value in data.items()
+                    if key not in ('password', 'password_confirm')}
+            users.append(CustomUser(**data, role=self.role,
+                                    password_hash=password_hash))
+        try:
+            with transaction.atomic():
+                CustomUser.objects.bulk_create(users)
+        except DatabaseError as exc:
+            result.errors.extend((line, {'detail': str(exc)}) for line, _ in valid)
+            return
+        result.created += len(users)
@@ -0,0 +1,134 @@
+import json
+import os
+import platform
+import subprocess
+import tempfile
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.test.utils import (
+    override_settings,
+    setup_test_environment,
+    teardown_test_environment,
+)
+
+from users.benchmark import SCENARIOS, BenchmarkRunner, Scale, compare, seed
+
+
+def current_commit():
+    try:
+        return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'],
+                              capture_output=True, text=True,
+                              check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return ''
+
+
+class Command(BaseCommand):
+    help = ("Замер задержки, числа SQL-запросов и пропускной способности "
+            "логина, обновления токена, элементов и списка пользователей "
+            "на тестовой базе с заданным объёмом данных")
+
+    def add_arguments(self, parser):
+        parser.add_argument('--users', type=int, default=1000,
+                            help='Число пользователей (по умолчанию 1000)')
+        parser.add_argument('--elements', type=int, default=10000,
+                            help='Число элементов (по умолчанию 10000)')
+        parser.add_argument('--roles', type=int, default=10,
+                            help='Дополнительные роли с правилами (по умолчанию 10)')
+        parser.add_argument('--requests', type=int, default=200,
+                            help='Запросов на сценарий (по умолчанию 200)')
+        parser.add_argument('--concurrency', type=int, default=4,
+                            help='Число параллельных клиентов (по умолчанию 4)')
+        parser.add_argument('--scenarios', nargs='+', choices=list(SCENARIOS),
+                            default=list(SCENARIOS), help='Сценарии для запуска')
+        parser.add_argument('--output', help='Сохранить результат в JSON-файл')
+        parser.add_argument('--compare', help='Сравнить с сохранённым результатом')
+        parser.add_argument('--keepdb', action='store_true',
+                            help='Не удалять тестовую базу после замера')
+
+    def handle(self, *args, **options):
+        if options['concurrency'] < 1 or options['requests'] < 1:
+            raise CommandError("--requests и --concurrency должны быть больше нуля")
+        previous = None
+        if options['compare']:
+            with open(options['compare'], encoding='utf-8') as stream:
+                previous = json.load(stream)
+
+        scale = Scale(options['users'], options['elements'], options['roles'])
+        test_settings = connection.settings_dict['TEST']
+        if connection.vendor == 'sqlite' and not test_settings.get('NAME'):
+            # SQLite в памяти блокирует таблицы целиком:
+            # параллельным клиентам нужна база в файле
+            test_settings['NAME'] = os.path.join(tempfile.gettempdir(),
+                                                 'benchmark.sqlite3')
+        setup_test_environment()
+        old_name = connection.creation.create_test_db(
+            verbosity=0, autoclobber=True, serialize=False, keepdb=options['keepdb']
+        )
+        # Все клиенты замера входят с одного адреса: ограничение попыток
+        # входа (LOGIN_THROTTLE) отключается, иначе измерялись бы ответы 429
+        throttle = {**getattr(settings, 'LOGIN_THROTTLE', {}), 'ENABLED': False}
+        # Отдельный общий кеш: данные замера не попадают в кеш приложения,
+        # а кеши, которым нужен общий кеш, работают как в проде
+        cache_dir = tempfile.TemporaryDirectory(prefix='benchmark-cache-')
+        caches = {'default': {
+            'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache',
+            'LOCATION': cache_dir.name,
+        }}
+        try:
+            with override_settings(LOGIN_THROTTLE=throttle, CACHES=caches):
+                result = self.run_benchmark(scale, options)
+        finally:
+            cache_dir.cleanup()
+            connection.creation.destroy_test_db(old_name, verbosity=0,
+                                                keepdb=options['keepdb'])
+            teardown_test_environment()
+
+        output = json.dumps(result, ensure_ascii=False, indent=2)
+        if options['output']:
+            with open(options['output'], 'w', encoding='utf-8') as stream:
+                stream.write(output + '\n')
+            self.stdout.write(f"Результат сохранён в {options['output']}")
+        if previous is not None:
+            self.stdout.write("\nСравнение с предыдущим прогоном:")
+            for line in compare(previous, result):
+                self.stdout.write(f"  {line}")
+
+    def run_benchmark(self, scale, options):
+        started = time.monotonic()
+        user_ids = seed(scale)
+        self.stdout.write(
+            f"Данные: {scale.users} пользователей, {scale.elements} элементов, "
+            f"{scale.roles} доп. ролей ({time.monotonic() - started:.1f} с)"
+        )
+
+        emails = [f'bench{index}@example.com'
+                  for index in range(min(options['concurrency'], len(user_ids)))]
+        runner = BenchmarkRunner(emails, requests=options['requests'],
+                                 concurrency=options['concurrency'])
+        scenarios = {}
+        for name in options['scenarios']:
+            stats = runner.run(name)
+            scenarios[name] = stats
+            self.stdout.write(
+                f"{name:<20} p50 {stats['p50_ms']:>8.2f} мс  "
+                f"p95 {stats['p95_ms']:>8.2f} мс  p99 {stats['p99_ms']:>8.2f} мс  "
+                f"{stats['queries_per_request']:>5} запр.  "
+                f"{stats['throughput_rps']:>7.1f} rps  ошибок {stats['errors']}"
+            )
+
+        return {
+            'meta': {
+                'commit': current_commit(),
+                'timestamp': time.strftime('%Y-%m-%dT%H:%M:%S'),
+                'database': connection.vendor,
+                'python': platform.python_version(),
+                'scale': vars(scale),
+                'requests': options['requests'],
+                'concurrency': options['concurrency'],
+            },
+            'scenarios': scenarios,
+        }
@@ -0,0 +1,87 @@
+import re
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, transaction
+from django.utils import timezone
+from rest_framework_simplejwt.token_blacklist.models import OutstandingToken
+
+from users.models import AccessRule, CustomUser, Element
+
+# Полный просмотр таблицы в плане запроса: PostgreSQL и SQLite
+SEQ_SCAN_PATTERNS = (
+    re.compile(r'Seq Scan on (\w+)'),
+    re.compile(r'\bSCAN (?:TABLE )?(\w+)\b(?! USING)'),
+)
+
+
+def hot_queries():
+    """Горячие запросы API: (название, queryset)."""
+    return [
+        ('Логин и обновление токена',
+         CustomUser.objects.select_related('role')
+         .filter(email='user@example.com', is_active=True)),
+        ('Регистрация: проверка email',
+         CustomUser.objects.filter(email='user@example.com', is_active=True)
+         .values('pk')[:1]),
+        ('Список активных пользователей',
+         CustomUser.objects.filter(is_active=True).order_by('id')[:6]),
+        ('Список активных пользователей, следующая страница',
+         CustomUser.objects.filter(is_active=True, id__gt=100).order_by('id')[:6]),
+        ('Свои элементы',
+         Element.objects.filter(owner_id=1).order_by('id')[:101]),
+        ('Свои элементы, следующая страница',
+         Element.objects.filter(owner_id=1, id__gt=100).order_by('id')[:101]),
+        ('Правило доступа роли',
+         AccessRule.objects.filter(role_id=1, content_type_id=1)),
+        ('Действующие токены пользователя',
+         OutstandingToken.objects.filter(user_id=1, expires_at__gt=timezone.now(),
+                                         blacklistedtoken__isnull=True)
+         .order_by().values_list('id')),
+    ]
+
+
+def find_seq_scans(plan):
+    """Таблицы, которые план читает полным просмотром."""
+    tables = set()
+    for pattern in SEQ_SCAN_PATTERNS:
+        tables.update(pattern.findall(plan))
+    return sorted(tables)
+
+
+class Command(BaseCommand):
+    help = ("Выполняет EXPLAIN для горячих запросов API и сообщает о полных "
+            "просмотрах таблиц (ненулевой код выхода — для CI)")
+
+    def add_arguments(self, parser):
+        parser.add_argument('--verbose-plans', action='store_true',
+                            help='Печатать планы всех запросов')
+        parser.add_argument('--no-fail', action='store_true',
+                            help='Не завершаться с ошибкой при полных просмотрах')
+
+    def handle(self, *args, **options):
+        flagged = []
+        with transaction.atomic():
+            if connection.vendor == 'postgresql':
+                # На маленьких таблицах планировщик выбирает Seq Scan даже
+                # при подходящем индексе: запрещаем его, чтобы видеть
+                # только запросы, для которых индекса нет
+                with connection.cursor() as cursor:
+                    cursor.execute('SET LOCAL enable_seqscan = off')
+
+            for name, queryset in hot_queries():
+                plan = queryset.explain()
+                tables = find_seq_scans(plan)
+                if tables:
+                    flagged.append(name)
+                    self.stdout.write(self.style.ERROR(
+                        f"{name}: полный просмотр {', '.join(tables)}"
+                    ))
+                else:
+                    self.stdout.write(self.style.SUCCESS(f"{name}: OK"))
+                if tables or options['verbose_plans']:
+                    self.stdout.write(f"  {queryset.query}")
+                    self.stdout.write('\n'.join(f"  {line}"
+                                                for line in plan.splitlines()))
+
+        if flagged and not options['no_fail']:
+            raise CommandError(f"Полный просмотр таблиц в запросах: {len(flagged)}")
@@ -0,0 +1,56 @@
+from collections import Counter
+
+from django.core.management.base import BaseCommand
+
+from users.hashing import identify_hasher, password_hasher
+from users.models import CustomUser
+
+
+class Command(BaseCommand):
+    help = ("Показывает распределение хешей паролей по алгоритмам и параметрам "
+            "(cost factor bcrypt, итерации pbkdf2)")
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--active-only',
+            action='store_true',
+            help='Учитывать только активных пользователей',
+        )
+
+    def handle(self, *args, **options):
+        users = CustomUser.objects.all()
+        if options['active_only']:
+            users = users.filter(is_active=True)
+
+        distribution = Counter()
+        outdated = 0
+        for encoded in users.values_list('password_hash', flat=True).iterator(
+            chunk_size=2000
+        ):
+            hasher_class = identify_hasher(encoded or '')
+            if hasher_class is None:
+                distribution[('unknown', '-')] += 1
+                outdated += 1
+                continue
+            distribution[(hasher_class.algorithm, hasher_class.params(encoded))] += 1
+            if password_hasher.needs_rehash(encoded):
+                outdated += 1
+
+        total = sum(distribution.values())
+        current = password_hasher.hasher
+        self.stdout.write(
+            f"Текущий алгоритм: {current.algorithm}, параметры: "
+            f"{getattr(current, 'rounds', getattr(current, 'iterations', '-'))}"
+        )
+        self.stdout.write(f"{'Алгоритм':<16}{'Параметры':>12}{'Пользователей':>16}")
+        for (algorithm, params), count in sorted(distribution.items(),
+                                                 key=lambda item: str(item[0])):
+            self.stdout.write(f"{algorithm:<16}{params!s:>12}{count:>16}")
+
+        if outdated:
+            self.stdout.write(self.style.WARNING(
+                f"Устаревших хешей: {outdated} из {total} "
+                f"(будут пересчитаны при следующем входе)")
+            )
+        else:
+            self.stdout.write(self.style.SUCCESS(f"Все {total} хешей актуальны."))
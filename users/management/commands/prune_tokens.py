@@ -0,0 +1,34 @@
+from django.core.management.base import BaseCommand
+
+from users.housekeeping import TokenPruner
+
+
+class Command(BaseCommand):
+    help = ("Удаляет просроченные OutstandingToken и BlacklistedToken пачками "
+            "с паузами между ними")
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=1000,
+                            help='Размер пачки (по умолчанию 1000)')
+        parser.add_argument('--sleep', type=float, default=0.1,
+                            help='Пауза между пачками в секундах (по умолчанию 0.1)')
+        parser.add_argument('--max-batches', type=int, default=None,
+                            help='Остановиться после указанного числа пачек')
+
+    def handle(self, *args, **options):
+        pruner = TokenPruner(batch_size=options['batch_size'],
+                             sleep=options['sleep'],
+                             max_batches=options['max_batches'])
+        result = pruner.run(on_batch=self.report)
+
+        self.stdout.write(self.style.SUCCESS(
+            f"Удалено: {result.outstanding} outstanding, "
+            f"{result.blacklisted} blacklisted за {result.seconds:.1f} с "
+            f"({result.rows_per_second:.0f} строк/с)")
+        )
+
+    def report(self, result):
+        self.stdout.write(
+            f"Пачка {result.batches}: до id {result.last_id}, "
+            f"удалено {result.rows} строк ({result.rows_per_second:.0f} строк/с)"
+        )
@@ -1,59 +1,104 @@
 import getpass
 
+from decouple import config
 from django.contrib.contenttypes.models import ContentType
-from django.core.management.base import BaseCommand
+from django.core.exceptions import ValidationError
 from django.core.management import call_command
+from django.core.management.base import BaseCommand, CommandError
 from django.core.validators import validate_email
+from django.db import transaction
 
-from users.models import AccessRule, CustomUser, Element, Role
+from users import response_cache
+from users.models import CustomUser, Element, Role
+from users.provisioning import create_access_rules, ensure_roles, missing_access_rules
+
+ELEMENT_NAMES = ['Product', 'Store', 'Order', 'AccessRule']
 
 
 class Command(BaseCommand):
     help = 'Создает базовые роли, администратора и правила доступа'
 
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--noinput', '--no-input', action='store_false', dest='interactive',
+            help='Не задавать вопросов: данные администратора берутся из '
+                 'аргументов или переменных окружения ADMIN_EMAIL, ADMIN_PASSWORD, '
+                 'ADMIN_FIRST_NAME, ADMIN_LAST_NAME',
+        )
+        parser.add_argument('--email', help='Email администратора')
+        parser.add_argument('--password', help='Пароль администратора')
+        parser.add_argument('--first-name', help='Имя администратора')
+        parser.add_argument('--last-name', help='Фамилия администратора')
+
     def handle(self, *args, **options):
         self.stdout.write("Настройка системы...")
         self.stdout.write("Применяем миграции...")
-        call_command('makemigrations', interactive=False)  # создаёт миграции (опционально)
-        call_command('migrate', interactive=False)  # применяет миграции
+        # Миграции хранятся в репозитории: здесь они только применяются
+        call_command('migrate', interactive=False, verbosity=options['verbosity'],
+                     stdout=self.stdout)
 
-        #  Создаем роли
-        admin_role, _ = Role.objects.get_or_create(
-            name=Role.ADMIN, defaults={'description': 'Администратор'}
-        )
-        manager_role, _ = Role.objects.get_or_create(
-            name=Role.MANAGER, defaults={'description': 'Менеджер'}
-        )
-        user_role, _ = Role.objects.get_or_create(
-            name=Role.USER, defaults={'description': 'Пользователь'}
-        )
+        if options['interactive']:
+            admin_data = self.prompt_admin()
+        else:
+            admin_data = self.admin_from_options(options)
 
-        # Создаем администратора и сохраняем ссылку на него
-        admin_user = self.create_admin(admin_role)
+        # Все данные создаются в одной транзакции пакетными запросами
+        with transaction.atomic():
+            roles, _ = ensure_roles()
+            roles = {role.name: role for role in roles}
 
-        # Создаем элементы и проставляем владельца (admin_user)
-        elements_names = ['Product', 'Store', 'Order', 'AccessRule']
-        elements = []
-        for name in elements_names:
-            element, _ = Element.objects.get_or_create(
-                name=name,
-                defaults={'owner': admin_user}
-            )
-            elements.append(element)
+            # Создаем администратора и сохраняем ссылку на него
+            admin_user = self.create_admin(roles[Role.ADMIN], **admin_data)
+
+            # Создаем элементы и проставляем владельца (admin_user)
+            self.create_elements(admin_user)
 
-        #  Настраиваем AccessRule для всех ролей
-        self.create_access_rules(admin_role, manager_role, user_role, elements)
+            #  Настраиваем AccessRule для всех ролей
+            rules = missing_access_rules(
+                list(roles.values()), [ContentType.objects.get_for_model(Element)]
+            )
+            create_access_rules(rules)
 
         self.stdout.write(self.style.SUCCESS("Система настроена!"))
 
-    def create_admin(self, admin_role):
-        """Создание администратора с вводом данных в консоли."""
+    def prompt_admin(self):
+        """Ввод данных администратора в консоли."""
         self.stdout.write("\nСоздание администратора:")
 
-        email = self.get_valid_email()
-        first_name = input("Имя: ").strip()
-        last_name = input("Фамилия: ").strip()
-        password = self.get_valid_password()
+        return {
+            'email': self.get_valid_email(),
+            'first_name': input("Имя: ").strip(),
+            'last_name': input("Фамилия: ").strip(),
+            'password': self.get_valid_password(),
+        }
+
+    def admin_from_options(self, options):
+        """Данные администратора из аргументов или переменных окружения."""
+        email = options['email'] or config('ADMIN_EMAIL', default='')
+        password = options['password'] or config('ADMIN_PASSWORD', default='')
+        try:
+            validate_email(email)
+        except ValidationError:
+            raise CommandError("Укажите корректный email администратора "
+                               "(--email или ADMIN_EMAIL)") from None
+        if len(password) < 8:
+            raise CommandError("Пароль администратора должен быть не менее "
+                               "8 символов (--password или ADMIN_PASSWORD)")
+        return {
+            'email': email,
+            'first_name': (options['first_name']
+                           or config('ADMIN_FIRST_NAME', default='Admin')),
+            'last_name': (options['last_name']
+                          or config('ADMIN_LAST_NAME', default='')),
+            'password': password,
+        }
+
+    def create_admin(self, admin_role, email, first_name, last_name, password):
+        """Создание администратора; существующий пользователь не меняется."""
+        admin_user = CustomUser.objects.filter(email=email, is_active=True).first()
+        if admin_user is not None:
+            self.stdout.write(f"Пользователь {email} уже существует")
+            return admin_user
 
         admin_user = CustomUser(
             email=email,
@@ -68,13 +113,25 @@ class Command(BaseCommand):
 
         return admin_user
 
+    def create_elements(self, owner):
+        """Недостающие стартовые элементы одним bulk_create."""
+        existing = set(Element.objects.filter(name__in=ELEMENT_NAMES)
+                       .values_list('name', flat=True))
+        Element.objects.bulk_create([
+            Element(name=name, owner=owner)
+            for name in ELEMENT_NAMES if name not in existing
+        ])
+        # bulk_create не вызывает сигналы
+        transaction.on_commit(lambda: response_cache.invalidate(Element))
+
     def get_valid_email(self):
         """Проверка корректности и уникальности email."""
         while True:
             email = input("Email: ").strip()
             try:
                 validate_email(email)
-                if not CustomUser.objects.filter(email=email).exists():
+                if not CustomUser.objects.filter(email=email,
+                                                 is_active=True).exists():
                     return email
                 self.stdout.write("Ошибка: Email уже существует")
             except Exception:
@@ -91,53 +148,3 @@ class Command(BaseCommand):
                 self.stdout.write("Ошибка: Пароли не совпадают")
             else:
                 self.stdout.write("Ошибка: Пароль должен быть не менее 8 символов")
-
-    def create_access_rules(self, admin_role, manager_role, user_role, elements):
-        """Создание правил доступа для каждой роли и типа объекта."""
-        for element in elements:
-            ct = ContentType.objects.get_for_model(element.__class__)
-
-            # Админ — всё может
-            AccessRule.objects.get_or_create(
-                role=admin_role,
-                content_type=ct,
-                defaults={
-                    'read_permission': True,
-                    'create_permission': True,
-                    'update_permission': True,
-                    'delete_permission': True,
-                    'read_all_permission': True,
-                    'update_all_permission': True,
-                    'delete_all_permission': True
-                }
-            )
-
-            # Менеджер — видит все, редактирует свои
-            AccessRule.objects.get_or_create(
-                role=manager_role,
-                content_type=ct,
-                defaults={
-                    'read_permission': True,
-                    'create_permission': True,
-                    'update_permission': True,
-                    'delete_permission': True,
-                    'read_all_permission': True,
-                    'update_all_permission': True,
-                    'delete_all_permission': False
-                }
-            )
-
-            # Пользователь — видит и редактирует только свои
-            AccessRule.objects.get_or_create(
-                role=user_role,
-                content_type=ct,
-                defaults={
-                    'read_permission': True,
-                    'create_permission': True,
-                    'update_permission': True,
-                    'delete_permission': True,
-                    'read_all_permission': False,
-                    'update_all_permission': False,
-                    'delete_all_permission': False
-                }
-            )
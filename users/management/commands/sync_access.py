@@ -1,88 +1,62 @@
-from django.contrib.contenttypes.models import ContentType
+import time
+
 from django.core.management.base import BaseCommand
+from django.db import transaction
 
-from users.models import AccessRule, Role
+from users.provisioning import (
+    DEFAULT_PERMISSIONS,
+    create_access_rules,
+    ensure_roles,
+    missing_access_rules,
+    rule_content_types,
+)
 
 
 class Command(BaseCommand):
-    help = ("Синхронизирует права доступа (AccessRule) для всех моделей,"
+    help = ("Синхронизирует права доступа (AccessRule) для всех моделей, "
             "создавая недостающие записи")
 
+    def add_arguments(self, parser):
+        parser.add_argument('--dry-run', action='store_true',
+                            help='Показать недостающие правила, ничего не создавая')
+        parser.add_argument('--roles', nargs='+', choices=list(DEFAULT_PERMISSIONS),
+                            help='Синхронизировать только указанные роли')
+        parser.add_argument('--apps', nargs='+',
+                            help='Синхронизировать только модели указанных приложений')
+
     def handle(self, *args, **options):
+        started = time.monotonic()
+        dry_run = options['dry_run']
         self.stdout.write("Синхронизация AccessRule для всех моделей...")
 
-        # Загружаем все роли
-        roles = {
-            Role.ADMIN: Role.objects.get_or_create(
-                name=Role.ADMIN,
-                defaults={'description': 'Администратор'}
-            )[0],
-            Role.MANAGER: Role.objects.get_or_create(
-                name=Role.MANAGER,
-                defaults={'description': 'Менеджер'}
-            )[0],
-            Role.USER: Role.objects.get_or_create(
-                name=Role.USER,
-                defaults={'description': 'Пользователь'}
-            )[0],
-        }
-
-
-        # Шаблон прав по умолчанию
-        default_permissions = {
-            Role.ADMIN: {
-                'read_permission': True,
-                'create_permission': True,
-                'update_permission': True,
-                'delete_permission': True,
-                'read_all_permission': True,
-                'update_all_permission': True,
-                'delete_all_permission': True,
-            },
-            Role.MANAGER: {
-                'read_permission': True,
-                'create_permission': True,
-                'update_permission': True,
-                'delete_permission': True,
-                'read_all_permission': True,
-                'update_all_permission': True,
-                'delete_all_permission': False,
-            },
-            Role.USER: {
-                'read_permission': True,
-                'create_permission': True,
-                'update_permission': True,
-                'delete_permission': True,
-                'read_all_permission': False,
-                'update_all_permission': False,
-                'delete_all_permission': False,
-            },
-        }
-
-        # Перебираем все модели
-        created_count = 0
-        for ct in ContentType.objects.all():
-            model = ct.model_class()
-            if not model or model._meta.app_label in ["contenttypes", "admin", "auth",
-                                                      "sessions", "token_blacklist",
-                                                      "users"]:
-                continue
-
-            for role_key, role in roles.items():
-                exists = AccessRule.objects.filter(role=role,
-                                                   content_type=ct).exists()
-                if not exists:
-                    AccessRule.objects.create(role=role,
-                                              content_type=ct,
-                                              **default_permissions[role_key])
-                    self.stdout.write(
-                        f"Создан AccessRule: {role.name} → {ct.app_label}.{ct.model}"
-                    )
-                    created_count += 1
-
-        if created_count == 0:
-            self.stdout.write(self.style.WARNING("Новых моделей не найдено."))
+        with transaction.atomic():
+            roles, created_roles = ensure_roles(options['roles'], dry_run=dry_run)
+            prefix = "Будет создан" if dry_run else "Создан"
+            for role in created_roles:
+                self.stdout.write(f"{prefix}а роль: {role.name}")
+
+            content_types = rule_content_types(options['apps'])
+            rules = missing_access_rules(roles, content_types)
+            for rule in rules:
+                self.stdout.write(
+                    f"{prefix} AccessRule: {rule.role.name} → "
+                    f"{rule.content_type.app_label}.{rule.content_type.model}"
+                )
+            if not dry_run:
+                create_access_rules(rules)
+
+        elapsed = time.monotonic() - started
+        summary = (f"ролей: {len(roles)}, моделей: {len(content_types)}, "
+                   f"за {elapsed:.2f} с")
+        if dry_run:
+            self.stdout.write(self.style.WARNING(
+                f"Пробный запуск: будет добавлено {len(rules)} записей ({summary})."
+            ))
+        elif not rules:
+            self.stdout.write(self.style.WARNING(
+                f"Новых моделей не найдено ({summary})."
+            ))
         else:
             self.stdout.write(self.style.SUCCESS(
-                f"Синхронизация завершена: добавлено {created_count} записей.")
+                f"Синхронизация завершена: добавлено {len(rules)} записей ({summary}).")
             )
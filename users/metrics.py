@@ -0,0 +1,439 @@
+"""
+Метрики процесса в текстовом формате Prometheus.
+
+Счётчики и гистограммы хранятся в памяти процесса (registry)
+и отдаются эндпоинтом /metrics. Внешние сервисы не нужны.
+
+Несколько процессов (gunicorn): если задан MULTIPROCESS_DIR, каждый
+воркер раз в FLUSH_INTERVAL секунд записывает снимок своих метрик
+в файл <pid>.json этой папки, а /metrics суммирует снимки всех файлов.
+Файлы завершившихся воркеров остаются и продолжают входить в сумму,
+поэтому счётчики не уменьшаются при перезапуске воркеров; папку
+очищают перед стартом сервера.
+
+Gauge-метрики (число токенов, доля попаданий в кеш прав и кеш ответов) считаются
+в момент запроса /metrics функциями registry.collector. Число токенов —
+два COUNT по таблицам токенов — пересчитывается не чаще раза в SCRAPE_INTERVAL.
+
+Настройки (settings.METRICS):
+    ENABLED          — middleware задержки и эндпоинт /metrics
+    MULTIPROCESS_DIR — папка снимков воркеров (пусто — один процесс)
+    FLUSH_INTERVAL   — период записи снимка, секунды
+    TOKEN            — /metrics требует Authorization: Bearer <TOKEN>; без токена
+                       эндпоинт доступен только при DEBUG=True
+    SCRAPE_INTERVAL  — сколько секунд переиспользовать число токенов
+"""
+import atexit
+import json
+import logging
+import os
+import tempfile
+import threading
+import time
+from bisect import bisect_left
+from contextlib import contextmanager
+from pathlib import Path
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+from django.core.exceptions import MiddlewareNotUsed
+
+logger = logging.getLogger(__name__)
+
+DEFAULTS = {
+    'ENABLED': True,
+    'MULTIPROCESS_DIR': '',
+    'FLUSH_INTERVAL': 5.0,
+    'TOKEN': '',
+    'SCRAPE_INTERVAL': 15.0,
+}
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+PASSWORD_BUCKETS = (0.01, 0.025, 0.05, 0.1, 0.2, 0.3, 0.5, 1.0, 2.5)
+
+
+def get_options():
+    return {**DEFAULTS, **getattr(settings, 'METRICS', {})}
+
+
+class Metric:
+    """Метрика с метками: значения по кортежу значений меток."""
+    type = None
+
+    def __init__(self, name, documentation, labelnames=()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def _key(self, labels):
+        return tuple(str(labels[name]) for name in self.labelnames)
+
+    def snapshot(self):
+        with self._lock:
+            values = [[list(key), self._copy(value)]
+                      for key, value in self._values.items()]
+        return {'type': self.type, 'help': self.documentation,
+                'labels': list(self.labelnames), 'values': values}
+
+    @staticmethod
+    def _copy(value):
+        return value
+
+
+class Counter(Metric):
+    type = 'counter'
+
+    def inc(self, amount=1, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+
+class Histogram(Metric):
+    """Гистограмма: счётчики по корзинам (не накопленные), сумма и число."""
+    type = 'histogram'
+
+    def __init__(self, name, documentation, labelnames=(), buckets=LATENCY_BUCKETS):
+        super().__init__(name, documentation, labelnames)
+        self.buckets = tuple(buckets)
+
+    def observe(self, value, **labels):
+        key = self._key(labels)
+        index = bisect_left(self.buckets, value)
+        with self._lock:
+            state = self._values.get(key)
+            if state is None:
+                state = self._values[key] = [0] * (len(self.buckets) + 1) + [0.0, 0]
+            state[index] += 1
+            state[-2] += value
+            state[-1] += 1
+
+    @contextmanager
+    def time(self, **labels):
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - started, **labels)
+
+    @staticmethod
+    def _copy(value):
+        return list(value)
+
+    def snapshot(self):
+        return {**super().snapshot(), 'buckets': list(self.buckets)}
+
+
+def merge_snapshots(snapshots):
+    """Суммирует снимки нескольких процессов по метрикам и меткам."""
+    merged = {}
+    for snapshot in snapshots:
+        for name, metric in snapshot.items():
+            target = merged.setdefault(name, {**metric, 'values': {}})
+            values = target['values']
+            for key, value in metric['values']:
+                key = tuple(key)
+                current = values.get(key)
+                if current is None:
+                    values[key] = list(value) if isinstance(value, list) else value
+                elif isinstance(value, list):
+                    values[key] = [a + b for a, b in zip(current, value)]
+                else:
+                    values[key] = current + value
+    return merged
+
+
+def _escape(value):
+    return value.replace('\\', r'\\').replace('\n', r'\n').replace('"', r'\"')
+
+
+def _labels(names, values, extra=()):
+    pairs = [*zip(names, values), *extra]
+    if not pairs:
+        return ''
+    return '{' + ','.join(f'{name}="{_escape(str(value))}"'
+                          for name, value in pairs) + '}'
+
+
+def _number(value):
+    if value == float('inf'):
+        return '+Inf'
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+def render(merged, gauges=()):
+    """Текст в формате Prometheus (text/plain; version=0.0.4)."""
+    lines = []
+    for name, metric in sorted(merged.items()):
+        lines.append(f"# HELP {name} {metric['help']}")
+        lines.append(f"# TYPE {name} {metric['type']}")
+        labelnames = metric['labels']
+        for key, value in sorted(metric['values'].items()):
+            labels = _labels(labelnames, key)
+            if metric['type'] != 'histogram':
+                lines.append(f"{name}{labels} {_number(value)}")
+                continue
+            cumulative = 0
+            bounds = [*metric['buckets'], float('inf')]
+            for bound, count in zip(bounds, value):
+                cumulative += count
+                le = _labels(labelnames, key, [('le', _number(bound))])
+                lines.append(f"{name}_bucket{le} {cumulative}")
+            lines.append(f"{name}_sum{labels} {_number(value[-2])}")
+            lines.append(f"{name}_count{labels} {value[-1]}")
+    for name, documentation, value in gauges:
+        lines.append(f"# HELP {name} {documentation}")
+        lines.append(f"# TYPE {name} gauge")
+        lines.append(f"{name} {_number(value)}")
+    return '\n'.join(lines) + '\n'
+
+
+class SnapshotStore:
+    """Снимки метрик процессов в файлах <pid>.json одной папки."""
+
+    def __init__(self, directory):
+        self.directory = Path(directory)
+
+    def write(self, snapshot, pid=None):
+        self.directory.mkdir(parents=True, exist_ok=True)
+        path = self.directory / f'{pid or os.getpid()}.json'
+        # Запись во временный файл и rename: читатель не увидит
+        # наполовину записанный снимок
+        fd, tmp = tempfile.mkstemp(dir=self.directory, suffix='.tmp')
+        try:
+            with os.fdopen(fd, 'w', encoding='utf-8') as stream:
+                json.dump(snapshot, stream)
+            os.replace(tmp, path)
+        except BaseException:
+            Path(tmp).unlink(missing_ok=True)
+            raise
+
+    def read_all(self):
+        snapshots = []
+        for path in self.directory.glob('*.json'):
+            try:
+                with open(path, encoding='utf-8') as stream:
+                    snapshots.append(json.load(stream))
+            except (OSError, ValueError):
+                logger.warning("Не удалось прочитать снимок метрик %s", path)
+        return snapshots
+
+
+class MetricsRegistry:
+    """Метрики процесса, фоновая запись снимков и сбор для /metrics."""
+
+    def __init__(self):
+        self._metrics = {}
+        self._collectors = []
+        self._flusher_pid = None
+        self._lock = threading.Lock()
+
+    def _register(self, metric):
+        if metric.name in self._metrics:
+            raise ValueError(f"Метрика {metric.name} уже зарегистрирована")
+        self._metrics[metric.name] = metric
+        return metric
+
+    def counter(self, name, documentation, labelnames=()):
+        return self._register(Counter(name, documentation, labelnames))
+
+    def histogram(self, name, documentation, labelnames=(), buckets=LATENCY_BUCKETS):
+        return self._register(Histogram(name, documentation, labelnames, buckets))
+
+    def collector(self, func):
+        """
+        Регистрирует функцию gauge-метрик: func(merged) -> [(имя, описание, значение)].
+        Используется как декоратор.
+        """
+        self._collectors.append(func)
+        return func
+
+    def snapshot(self):
+        return {name: metric.snapshot() for name, metric in self._metrics.items()}
+
+    @staticmethod
+    def store():
+        directory = get_options()['MULTIPROCESS_DIR']
+        return SnapshotStore(directory) if directory else None
+
+    def flush(self):
+        """Записывает снимок процесса (при заданном MULTIPROCESS_DIR)."""
+        store = self.store()
+        if store is not None:
+            store.write(self.snapshot())
+
+    def ensure_flusher(self):
+        """
+        Запускает фоновую запись снимков в текущем процессе. Проверка pid:
+        после fork (gunicorn --preload) поток родителя в воркере не работает.
+        """
+        pid = os.getpid()
+        if self._flusher_pid == pid or not get_options()['MULTIPROCESS_DIR']:
+            return
+        with self._lock:
+            if self._flusher_pid == pid:
+                return
+            self._flusher_pid = pid
+            threading.Thread(target=self._flush_loop, name='metrics-flush',
+                             daemon=True).start()
+            atexit.register(self.flush)
+
+    def _flush_loop(self):
+        interval = get_options()['FLUSH_INTERVAL']
+        while True:
+            time.sleep(interval)
+            try:
+                self.flush()
+            except Exception:
+                logger.exception("Не удалось записать снимок метрик")
+
+    def collect(self):
+        """Метрики всех процессов и gauge-метрики коллекторов."""
+        store = self.store()
+        if store is None:
+            snapshots = [self.snapshot()]
+        else:
+            self.flush()
+            snapshots = store.read_all()
+        merged = merge_snapshots(snapshots)
+        gauges = []
+        for collector in self._collectors:
+            gauges.extend(collector(merged))
+        return merged, gauges
+
+    def render(self):
+        return render(*self.collect())
+
+
+registry = MetricsRegistry()
+
+password_check_seconds = registry.histogram(
+    'password_check_seconds',
+    'Время проверки пароля в CustomUser.check_password, секунды',
+    buckets=PASSWORD_BUCKETS,
+)
+login_attempts = registry.counter(
+    'login_attempts_total',
+    'Попытки входа по результату',
+    ['outcome'],
+)
+rbac_decisions = registry.counter(
+    'rbac_decisions_total',
+    'Решения RoleAccessPermission по типу объекта и методу',
+    ['content_type', 'method', 'decision'],
+)
+access_rule_cache = registry.counter(
+    'access_rule_cache_total',
+    'Обращения к таблице AccessRule: hit — без перечитывания из базы',
+    ['result'],
+)
+response_cache_lookups = registry.counter(
+    'response_cache_total',
+    'Кеш ответов списков: hit, miss и вытесненные записи (evict)',
+    ['result'],
+)
+http_request_duration = registry.histogram(
+    'http_request_duration_seconds',
+    'Время обработки запроса по маршруту, методу и статусу, секунды',
+    ['route', 'method', 'status'],
+)
+
+
+def record_rbac_decision(model_class, method, allowed):
+    """Учитывает решение о доступе и возвращает его без изменений."""
+    label = model_class._meta.label_lower if model_class is not None else ''
+    rbac_decisions.inc(content_type=label, method=method,
+                       decision='allow' if allowed else 'deny')
+    return allowed
+
+
+@registry.collector
+def access_rule_cache_ratio(merged):
+    values = merged.get('access_rule_cache_total', {}).get('values', {})
+    hits = values.get(('hit',), 0)
+    total = hits + values.get(('miss',), 0)
+    return [('access_rule_cache_hit_ratio',
+             'Доля обращений к таблице AccessRule без перечитывания',
+             hits / total if total else 0.0)]
+
+
+@registry.collector
+def response_cache_ratio(merged):
+    values = merged.get('response_cache_total', {}).get('values', {})
+    hits = values.get(('hit',), 0)
+    total = hits + values.get(('miss',), 0)
+    return [('response_cache_hit_ratio',
+             'Доля запросов списков, отданных из кеша ответов',
+             hits / total if total else 0.0)]
+
+
+# Последний подсчёт токенов: (время monotonic, значения)
+_token_counts = (None, None)
+
+
+@registry.collector
+def token_counts(merged):
+    from django.utils import timezone
+    from rest_framework_simplejwt.token_blacklist.models import (
+        BlacklistedToken,
+        OutstandingToken,
+    )
+
+    global _token_counts
+    counted_at, values = _token_counts
+    now = time.monotonic()
+    if counted_at is None or now - counted_at >= get_options()['SCRAPE_INTERVAL']:
+        values = [
+            ('jwt_outstanding_tokens', 'Неистёкшие refresh-токены',
+             OutstandingToken.objects.filter(expires_at__gt=timezone.now()).count()),
+            ('jwt_blacklisted_tokens', 'Refresh-токены в чёрном списке',
+             BlacklistedToken.objects.count()),
+        ]
+        _token_counts = (now, values)
+    return values
+
+
+class MetricsMiddleware:
+    """
+    Время обработки запросов по маршруту (шаблон URL, а не путь —
+    чтобы число меток не росло с числом объектов). Поддерживает
+    sync и async цепочки: под ASGI запрос не уходит в отдельный поток.
+    """
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        if not get_options()['ENABLED']:
+            raise MiddlewareNotUsed
+        self.get_response = get_response
+        self.async_mode = iscoroutinefunction(get_response)
+        if self.async_mode:
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if self.async_mode:
+            return self.__acall__(request)
+        registry.ensure_flusher()
+        started = time.perf_counter()
+        response = self.get_response(request)
+        self.observe(request, response, started)
+        return response
+
+    async def __acall__(self, request):
+        registry.ensure_flusher()
+        started = time.perf_counter()
+        response = await self.get_response(request)
+        self.observe(request, response, started)
+        return response
+
+    @staticmethod
+    def observe(request, response, started):
+        match = request.resolver_match
+        http_request_duration.observe(
+            time.perf_counter() - started,
+            route=match.route if match is not None else 'unmatched',
+            method=request.method,
+            status=response.status_code,
+        )
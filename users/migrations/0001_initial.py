@@ -0,0 +1,87 @@
+# Generated by Django 5.2.7 on 2026-10-17 18:42
+
+import django.core.validators
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    initial = True
+
+    dependencies = [
+        ('contenttypes', '0002_remove_content_type_name'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='CustomUser',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('first_name', models.CharField(max_length=100, validators=[django.core.validators.MinLengthValidator(2, 'Имя должно содержать минимум 2 символа'), django.core.validators.RegexValidator(message='Имя может содержать только буквы, пробелы и дефисы', regex='^[a-zA-Zа-яА-ЯёЁ\\s\\-]+$')])),
+                ('last_name', models.CharField(blank=True, max_length=100, null=True, validators=[django.core.validators.RegexValidator(message='Фамилия может содержать только буквы, пробелы и дефисы', regex='^[a-zA-Zа-яА-ЯёЁ\\s\\-]*$')])),
+                ('middle_name', models.CharField(blank=True, max_length=100, null=True, validators=[django.core.validators.RegexValidator(message='Отчество может содержать только буквы, пробелы и дефисы', regex='^[a-zA-Zа-яА-ЯёЁ\\s\\-]*$')])),
+                ('email', models.EmailField(help_text='Обязательное поле. Уникальный email пользователя.', max_length=254, unique=True, verbose_name='Email')),
+                ('password_hash', models.CharField(max_length=255)),
+                ('is_active', models.BooleanField(default=True, verbose_name='Активен')),
+                ('created_at', models.DateTimeField(auto_now_add=True, verbose_name='Дата регистрации')),
+                ('last_login', models.DateTimeField(blank=True, null=True, verbose_name='Последний вход')),
+                ('updated_at', models.DateTimeField(auto_now=True, verbose_name='Дата обновления')),
+                ('deleted_at', models.DateTimeField(blank=True, null=True, verbose_name='Дата удаления')),
+                ('token_version', models.PositiveIntegerField(default=0, help_text='Увеличивается при смене пароля, роли и удалении пользователя.', verbose_name='Версия токенов')),
+            ],
+            options={
+                'verbose_name': 'Пользователь',
+                'verbose_name_plural': 'Пользователи',
+            },
+        ),
+        migrations.CreateModel(
+            name='Role',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('name', models.CharField(choices=[('admin', 'Администратор'), ('manager', 'Менеджер'), ('user', 'Пользователь')], max_length=50, unique=True)),
+                ('description', models.TextField(blank=True, null=True)),
+            ],
+        ),
+        migrations.CreateModel(
+            name='Element',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('name', models.CharField(max_length=100, null=True, verbose_name='Название элемента')),
+                ('description', models.TextField(blank=True, null=True, verbose_name='Описание')),
+                ('updated_at', models.DateTimeField(auto_now=True, verbose_name='Дата обновления')),
+                ('owner', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='element', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'verbose_name': 'Элемент',
+                'verbose_name_plural': 'Элементы',
+            },
+        ),
+        migrations.AddField(
+            model_name='customuser',
+            name='role',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.PROTECT, to='users.role'),
+        ),
+        migrations.CreateModel(
+            name='AccessRule',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('read_permission', models.BooleanField(default=False)),
+                ('create_permission', models.BooleanField(default=False)),
+                ('update_permission', models.BooleanField(default=False)),
+                ('delete_permission', models.BooleanField(default=False)),
+                ('read_all_permission', models.BooleanField(default=False)),
+                ('update_all_permission', models.BooleanField(default=False)),
+                ('delete_all_permission', models.BooleanField(default=False)),
+                ('updated_at', models.DateTimeField(auto_now=True, verbose_name='Дата обновления')),
+                ('content_type', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='contenttypes.contenttype')),
+                ('role', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='users.role')),
+            ],
+            options={
+                'verbose_name': 'Правило доступа',
+                'verbose_name_plural': 'Правила доступа',
+                'unique_together': {('role', 'content_type')},
+            },
+        ),
+    ]
@@ -0,0 +1,41 @@
+# Generated by Django 5.2.7 on 2026-10-17 18:42
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('users', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='customuser',
+            name='email',
+            field=models.EmailField(help_text='Обязательное поле. Уникален среди активных пользователей.', max_length=254, verbose_name='Email'),
+        ),
+        migrations.AlterField(
+            model_name='element',
+            name='owner',
+            field=models.ForeignKey(blank=True, db_index=False, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='element', to=settings.AUTH_USER_MODEL),
+        ),
+        migrations.AddIndex(
+            model_name='customuser',
+            index=models.Index(fields=['email', 'is_active'], name='customuser_email_active_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='customuser',
+            index=models.Index(condition=models.Q(('is_active', True)), fields=['id'], name='customuser_active_id_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='element',
+            index=models.Index(fields=['owner', 'id'], name='element_owner_id_idx'),
+        ),
+        migrations.AddConstraint(
+            model_name='customuser',
+            constraint=models.UniqueConstraint(condition=models.Q(('is_active', True)), fields=('email',), name='customuser_active_email_uniq'),
+        ),
+    ]
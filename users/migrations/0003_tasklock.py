@@ -0,0 +1,24 @@
+# Generated by Django 5.2.7 on 2026-10-17 18:50
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('users', '0002_hot_query_indexes'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='TaskLock',
+            fields=[
+                ('name', models.CharField(max_length=100, primary_key=True, serialize=False)),
+                ('locked_until', models.DateTimeField()),
+            ],
+            options={
+                'verbose_name': 'Блокировка задачи',
+                'verbose_name_plural': 'Блокировки задач',
+            },
+        ),
+    ]
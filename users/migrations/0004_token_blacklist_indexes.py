@@ -0,0 +1,33 @@
+from django.db import migrations, models
+
+# Индексы, которых нет в миграциях token_blacklist: поиск просроченных
+# токенов при очистке (users.housekeeping) и при soft delete.
+INDEXES = (
+    models.Index(fields=['expires_at'], name='outstandingtoken_expires_at_idx'),
+    models.Index(fields=['user', 'expires_at'],
+                 name='outstandingtoken_user_expires_idx'),
+)
+
+
+def add_indexes(apps, schema_editor):
+    model = apps.get_model('token_blacklist', 'OutstandingToken')
+    for index in INDEXES:
+        schema_editor.add_index(model, index)
+
+
+def remove_indexes(apps, schema_editor):
+    model = apps.get_model('token_blacklist', 'OutstandingToken')
+    for index in INDEXES:
+        schema_editor.remove_index(model, index)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('users', '0003_tasklock'),
+        ('token_blacklist', '0013_alter_blacklistedtoken_options_and_more'),
+    ]
+
+    operations = [
+        migrations.RunPython(add_indexes, remove_indexes),
+    ]
@@ -1,16 +1,78 @@
-import datetime
+from datetime import timedelta
 
-import bcrypt
 from django.contrib.contenttypes.models import ContentType
 from django.core.validators import MinLengthValidator, RegexValidator
-from django.db import models
-from django.db.models import PROTECT
+from django.db import models, transaction
+from django.db.models import PROTECT, F
+from django.utils import timezone
 from rest_framework.exceptions import ValidationError
 from rest_framework_simplejwt.token_blacklist.models import (
     BlacklistedToken,
     OutstandingToken,
 )
 
+from . import response_cache
+from .blacklist_filter import blacklist_filter
+from .hashing import password_hasher
+from .metrics import password_check_seconds
+from .profiling import phase
+from .token_cache import token_cache
+from .token_versions import set_token_versions
+
+
+def blacklist_outstanding_tokens(user_ids):
+    """
+    Добавляет в чёрный список все действующие refresh-токены пользователей:
+    один SELECT id и один пакетный INSERT на каждые 1000 пользователей.
+    """
+    now = timezone.now()
+    for start in range(0, len(user_ids), 1000):
+        token_ids = OutstandingToken.objects.filter(
+            user_id__in=user_ids[start:start + 1000],
+            expires_at__gt=now,
+            blacklistedtoken__isnull=True,
+        ).order_by().values_list('id', flat=True)
+        BlacklistedToken.objects.bulk_create(
+            [BlacklistedToken(token_id=token_id) for token_id in token_ids],
+            batch_size=1000,
+            ignore_conflicts=True,
+        )
+    # bulk_create не вызывает post_save: оповещаем фильтр чёрного списка сами
+    transaction.on_commit(blacklist_filter.notify_added)
+    transaction.on_commit(lambda: token_cache.forget_users(user_ids))
+
+
+def publish_token_versions(user_ids):
+    """Записывает в хранилище версии токенов пользователей из базы."""
+    for start in range(0, len(user_ids), 1000):
+        set_token_versions(dict(CustomUser.objects.filter(
+            pk__in=user_ids[start:start + 1000]
+        ).values_list('pk', 'token_version')))
+
+
+class CustomUserQuerySet(models.QuerySet):
+
+    def soft_delete(self):
+        """
+        Мягкое удаление всех пользователей выборки одним UPDATE
+        и блокировка их токенов. Возвращает число удалённых.
+        """
+        with transaction.atomic():
+            user_ids = list(self.filter(is_active=True).values_list('pk', flat=True))
+            for start in range(0, len(user_ids), 1000):
+                CustomUser.objects.filter(pk__in=user_ids[start:start + 1000]).update(
+                    is_active=False,
+                    deleted_at=timezone.now(),
+                    token_version=F('token_version') + 1,
+                    updated_at=timezone.now(),
+                )
+            blacklist_outstanding_tokens(user_ids)
+            # UPDATE не вызывает сигналы: новые версии токенов и сброс ответов
+            # списков элементов (в них данные владельцев) публикуем сами
+            transaction.on_commit(lambda: publish_token_versions(user_ids))
+            transaction.on_commit(lambda: response_cache.invalidate(Element))
+        return len(user_ids)
+
 
 def validate_password(value):
     if len(value) < 8:
@@ -55,9 +117,8 @@ class CustomUser(models.Model):
         ]
     )
     email = models.EmailField(
-        unique=True,
         verbose_name="Email",
-        help_text="Обязательное поле. Уникальный email пользователя.",
+        help_text="Обязательное поле. Уникален среди активных пользователей.",
     )
     password_hash = models.CharField(max_length=255)
     is_active = models.BooleanField(default=True, verbose_name="Активен")
@@ -79,6 +140,13 @@ class CustomUser(models.Model):
         verbose_name="Дата удаления"
     )
     role = models.ForeignKey('Role', on_delete=PROTECT)
+    token_version = models.PositiveIntegerField(
+        default=0,
+        verbose_name="Версия токенов",
+        help_text="Увеличивается при смене пароля, роли и удалении пользователя.",
+    )
+
+    objects = CustomUserQuerySet.as_manager()
 
     # Для совместимости, но не используем стандартную аутентификацию
     is_anonymous = False
@@ -94,34 +162,111 @@ class CustomUser(models.Model):
     class Meta:
         verbose_name = "Пользователь"
         verbose_name_plural = "Пользователи"
+        constraints = [
+            # После soft delete email можно зарегистрировать заново
+            models.UniqueConstraint(
+                fields=['email'],
+                condition=models.Q(is_active=True),
+                name='customuser_active_email_uniq',
+            ),
+        ]
+        indexes = [
+            # Логин и регистрация: WHERE email = %s AND is_active
+            models.Index(fields=['email', 'is_active'],
+                         name='customuser_email_active_idx'),
+            # Список активных пользователей: WHERE is_active ORDER BY id
+            models.Index(fields=['id'], condition=models.Q(is_active=True),
+                         name='customuser_active_id_idx'),
+        ]
+
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        # Запоминаем роль из БД, чтобы заметить её смену при сохранении
+        instance._loaded_role_id = instance.__dict__.get('role_id')
+        return instance
+
+    def save(self, *args, **kwargs):
+        loaded_role_id = getattr(self, '_loaded_role_id', None)
+        if self.pk and loaded_role_id is not None and loaded_role_id != self.role_id:
+            self.bump_token_version()
+            update_fields = kwargs.get('update_fields')
+            if update_fields is not None:
+                kwargs['update_fields'] = {*update_fields, 'token_version'}
+        super().save(*args, **kwargs)
+        self._loaded_role_id = self.role_id
+
+    def bump_token_version(self):
+        """Делает устаревшими claims во всех выданных токенах пользователя."""
+        self.token_version += 1
 
     def set_password(self, password: str):
         """Хешируем и сохраняем пароль."""
         validate_password(password)
-        self.password_hash = bcrypt.hashpw(password.encode(), bcrypt.gensalt()).decode()
+        self.password_hash = password_hasher.hash(password)
+        if self.pk:
+            self.bump_token_version()
 
+    async def aset_password(self, password: str):
+        """Асинхронный вариант set_password."""
+        validate_password(password)
+        self.password_hash = await password_hasher.ahash(password)
+        if self.pk:
+            self.bump_token_version()
 
     def check_password(self, password: str) -> bool:
         """Проверяем введённый пароль."""
         if not self.password_hash:
             return False
-        return bcrypt.checkpw(password.encode(), self.password_hash.encode())
+        with phase('password'), password_check_seconds.time():
+            valid = password_hasher.check(password, self.password_hash)
+        if valid:
+            self._rehash_if_outdated(password)
+        return valid
+
+    async def acheck_password(self, password: str) -> bool:
+        """Асинхронный вариант check_password."""
+        if not self.password_hash:
+            return False
+        with password_check_seconds.time():
+            valid = await password_hasher.acheck(password, self.password_hash)
+        if valid:
+            self._rehash_if_outdated(password)
+        return valid
+
+    def _rehash_if_outdated(self, password: str):
+        """
+        Пересчитывает хеш со старыми параметрами в фоне после успешного входа.
+        Запись условная: если пароль успели сменить, новый хеш не сохраняется.
+        Версия токенов не меняется — пароль остался прежним.
+        """
+        if not self.pk or not password_hasher.needs_rehash(self.password_hash):
+            return
+        pk, old_hash = self.pk, self.password_hash
+
+        def store(new_hash):
+            CustomUser.objects.filter(pk=pk, password_hash=old_hash).update(
+                password_hash=new_hash
+            )
+
+        password_hasher.schedule_rehash(password, store)
 
     def soft_delete(self):
         """Мягкое удаление пользователя и блокировка всех токенов"""
-        self.is_active = False
-        self.deleted_at = datetime.datetime.now()
-        self.save()
+        with transaction.atomic():
+            self.is_active = False
+            self.deleted_at = timezone.now()
+            self.bump_token_version()
+            self.save()
 
-        # Черный список всех токенов пользователя
-        tokens = OutstandingToken.objects.filter(user=self)
-        for token in tokens:
-            BlacklistedToken.objects.get_or_create(token=token)
+            # Черный список всех токенов пользователя
+            blacklist_outstanding_tokens([self.pk])
 
     def restore(self):
         """Восстановление"""
         self.is_active = True
         self.deleted_at = None
+        self.bump_token_version()
         self.save()
 
 
@@ -163,8 +308,12 @@ class Element(models.Model):
         on_delete=models.SET_NULL,
         null=True,
         blank=True,
-        related_name='element'
+        related_name='element',
+        # Поиск по owner_id покрывает составной индекс (owner, id)
+        db_index=False,
     )
+    updated_at = models.DateTimeField(auto_now=True,
+                                      verbose_name="Дата обновления")
 
     def __str__(self):
         return self.name
@@ -172,6 +321,10 @@ class Element(models.Model):
     class Meta:
         verbose_name = "Элемент"
         verbose_name_plural = "Элементы"
+        indexes = [
+            # Свои элементы с keyset-пагинацией: WHERE owner_id = %s ORDER BY id
+            models.Index(fields=['owner', 'id'], name='element_owner_id_idx'),
+        ]
 
 
 class AccessRule(models.Model):
@@ -197,10 +350,42 @@ class AccessRule(models.Model):
     update_all_permission = models.BooleanField(default=False)
     delete_all_permission = models.BooleanField(default=False)
 
+    updated_at = models.DateTimeField(auto_now=True,
+                                      verbose_name="Дата обновления")
+
     class Meta:
+        # Уникальный индекс (role_id, content_type_id) обслуживает и поиск правила
         unique_together = ('role', 'content_type')
         verbose_name = "Правило доступа"
         verbose_name_plural = "Правила доступа"
 
     def __str__(self):
         return f"{self.role.name} → {self.content_type.model}"
+
+
+class TaskLock(models.Model):
+    """
+    Аренда периодической задачи: выполняет тот процесс, чей условный
+    UPDATE сдвинул locked_until (см. acquire).
+    """
+    name = models.CharField(max_length=100, primary_key=True)
+    locked_until = models.DateTimeField()
+
+    class Meta:
+        verbose_name = "Блокировка задачи"
+        verbose_name_plural = "Блокировки задач"
+
+    def __str__(self):
+        return self.name
+
+    @classmethod
+    def acquire(cls, name, seconds):
+        """
+        Берёт аренду на seconds секунд, если её не держит другой процесс.
+        Проверка и захват — один UPDATE, поэтому аренду получает один воркер.
+        """
+        now = timezone.now()
+        cls.objects.get_or_create(name=name, defaults={'locked_until': now})
+        return cls.objects.filter(name=name, locked_until__lte=now).update(
+            locked_until=now + timedelta(seconds=seconds)
+        ) == 1
@@ -0,0 +1,126 @@
+from rest_framework.pagination import CursorPagination
+from rest_framework.response import Response
+
+
+class KeysetPagination(CursorPagination):
+    """
+    Keyset-пагинация по id: WHERE id > <курсор> ORDER BY id LIMIT n
+    вместо COUNT(*) + OFFSET. Курсор непрозрачный (base64), порядок
+    стабильный. Общее число записей (count) — отдельный запрос,
+    его можно включить или выключить параметром ?count=1/0.
+    """
+    ordering = 'id'
+    page_size_query_param = 'page_size'
+    count_query_param = 'count'
+    # Считать ли count, если клиент не передал ?count=
+    include_count = False
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self.count = None
+        if self.get_include_count(request):
+            self.count = queryset.count()
+
+        window = self.get_window(queryset, request, view)
+        if window is None:
+            return None
+        return self.set_page(list(window))
+
+    async def apaginate_queryset(self, queryset, request, view=None):
+        """Асинхронный вариант paginate_queryset (async ORM)."""
+        self.count = None
+        if self.get_include_count(request):
+            self.count = await queryset.acount()
+
+        window = self.get_window(queryset, request, view)
+        if window is None:
+            return None
+        return self.set_page([obj async for obj in window])
+
+    # paginate_queryset из CursorPagination, разделённый на построение
+    # запроса (get_window) и разбор выборки (set_page), чтобы выборку
+    # можно было выполнить и синхронно, и через async ORM
+
+    def get_window(self, queryset, request, view=None):
+        """Queryset страницы (page_size + 1 объект) по курсору запроса."""
+        self.request = request
+        self.page_size = self.get_page_size(request)
+        if not self.page_size:
+            return None
+
+        self.base_url = request.build_absolute_uri()
+        self.ordering = self.get_ordering(request, queryset, view)
+        self.cursor = self.decode_cursor(request)
+        if self.cursor is None:
+            offset, reverse, current_position = 0, False, None
+        else:
+            offset, reverse, current_position = self.cursor
+
+        ordering = self.ordering
+        if reverse:
+            ordering = [field[1:] if field.startswith('-') else f'-{field}'
+                        for field in ordering]
+        queryset = queryset.order_by(*ordering)
+
+        if current_position is not None:
+            order = self.ordering[0]
+            lookup = 'lt' if reverse != order.startswith('-') else 'gt'
+            queryset = queryset.filter(
+                **{f"{order.lstrip('-')}__{lookup}": current_position}
+            )
+        self._window = (offset, reverse, current_position)
+        return queryset[offset:offset + self.page_size + 1]
+
+    def set_page(self, results):
+        """Страница и позиции соседних страниц по выборке get_window."""
+        offset, reverse, current_position = self._window
+        self.page = results[:self.page_size]
+
+        has_following_position = len(results) > len(self.page)
+        following_position = (self._get_position_from_instance(results[-1],
+                                                               self.ordering)
+                              if has_following_position else None)
+
+        if reverse:
+            self.page.reverse()
+            self.has_next = current_position is not None or offset > 0
+            self.has_previous = has_following_position
+            if self.has_next:
+                self.next_position = current_position
+            if self.has_previous:
+                self.previous_position = following_position
+        else:
+            self.has_next = has_following_position
+            self.has_previous = current_position is not None or offset > 0
+            if self.has_next:
+                self.next_position = following_position
+            if self.has_previous:
+                self.previous_position = current_position
+
+        if (self.has_previous or self.has_next) and self.template is not None:
+            self.display_page_controls = True
+        return self.page
+
+    def get_include_count(self, request):
+        value = request.query_params.get(self.count_query_param)
+        if value is None:
+            return self.include_count
+        return value.lower() not in ('0', 'false', 'no', 'off')
+
+    def get_paginated_data(self, data):
+        response = {}
+        if self.count is not None:
+            response['count'] = self.count
+        response.update({
+            'next': self.get_next_link(),
+            'previous': self.get_previous_link(),
+            'results': data,
+        })
+        return response
+
+    def get_paginated_response(self, data):
+        return Response(self.get_paginated_data(data))
+
+    def get_paginated_response_schema(self, schema):
+        schema = super().get_paginated_response_schema(schema)
+        schema['properties']['count'] = {'type': 'integer', 'example': 123}
+        return schema
@@ -0,0 +1,237 @@
+"""
+Профилирование запросов по фазам.
+
+RequestProfilingMiddleware для выбранной доли запросов (SAMPLE_RATE)
+собирает время фаз обработки и число/время SQL-запросов
+(connection.execute_wrapper) и отдаёт их в заголовке Server-Timing
+и строкой лога в JSON (логгер users.profiling).
+
+Фазы отмечают DRF-хуки ProfilingMixin и вызовы phase() в коде:
+    auth       — аутентификация (JWT, загрузка пользователя)
+    permission — проверка прав
+    queryset   — выборка объектов (get_object, пагинация)
+    serialize  — остальная работа view, в том числе сериализация
+    password   — проверка пароля (bcrypt)
+    render     — рендеринг ответа
+Время фазы считается без вложенных фаз. Без активного профиля
+хуки ничего не делают.
+
+Настройки (settings.REQUEST_PROFILING):
+    ENABLED     — включить middleware
+    SAMPLE_RATE — доля профилируемых запросов, от 0 до 1
+    HEADER      — добавлять заголовок Server-Timing
+    LOG         — писать строку в лог
+"""
+import json
+import logging
+import random
+import time
+from collections import defaultdict
+from contextlib import ExitStack, contextmanager, nullcontext
+from contextvars import ContextVar
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction, sync_to_async
+from django.conf import settings
+from django.core.exceptions import MiddlewareNotUsed
+from django.db import connections
+
+logger = logging.getLogger(__name__)
+
+DEFAULTS = {
+    'ENABLED': False,
+    'SAMPLE_RATE': 0.01,
+    'HEADER': True,
+    'LOG': True,
+}
+
+_current_profile = ContextVar('request_profile', default=None)
+
+
+class RequestProfile:
+    """Время фаз и SQL-запросов одного запроса."""
+
+    def __init__(self):
+        self.phases = defaultdict(float)
+        self.queries = 0
+        self.query_time = 0.0
+        # [имя фазы, начало, время вложенных фаз]
+        self._stack = []
+
+    def begin(self, name):
+        self._stack.append([name, time.perf_counter(), 0.0])
+
+    def end(self):
+        name, started, nested = self._stack.pop()
+        elapsed = time.perf_counter() - started
+        self.phases[name] += elapsed - nested
+        if self._stack:
+            self._stack[-1][2] += elapsed
+
+    @contextmanager
+    def phase(self, name):
+        self.begin(name)
+        try:
+            yield
+        finally:
+            self.end()
+
+    def __call__(self, execute, sql, params, many, context):
+        """Обёртка для connection.execute_wrapper."""
+        started = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.queries += 1
+            self.query_time += time.perf_counter() - started
+
+    def server_timing(self, total):
+        metrics = [f"{name};dur={seconds * 1000:.2f}"
+                   for name, seconds in self.phases.items()]
+        metrics.append(f'db;dur={self.query_time * 1000:.2f};'
+                       f'desc="{self.queries} queries"')
+        metrics.append(f"total;dur={total * 1000:.2f}")
+        return ', '.join(metrics)
+
+    def as_dict(self, total):
+        return {
+            'total_ms': round(total * 1000, 2),
+            'phases_ms': {name: round(seconds * 1000, 2)
+                          for name, seconds in self.phases.items()},
+            'queries': self.queries,
+            'db_ms': round(self.query_time * 1000, 2),
+        }
+
+
+def current_profile():
+    return _current_profile.get()
+
+
+def phase(name):
+    """Контекстный менеджер фазы; без активного профиля — пустой."""
+    profile = _current_profile.get()
+    if profile is None:
+        return nullcontext()
+    return profile.phase(name)
+
+
+class RequestProfilingMiddleware:
+    """
+    Профилирует долю запросов SAMPLE_RATE. Ставится первым в MIDDLEWARE,
+    чтобы total включал остальные middleware. При ENABLED=False
+    исключается из цепочки при старте (MiddlewareNotUsed). Поддерживает
+    sync и async цепочки, как MetricsMiddleware.
+    """
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        options = {**DEFAULTS, **getattr(settings, 'REQUEST_PROFILING', {})}
+        if not options['ENABLED']:
+            raise MiddlewareNotUsed
+        self.get_response = get_response
+        self.sample_rate = options['SAMPLE_RATE']
+        self.header = options['HEADER']
+        self.log = options['LOG']
+        self.async_mode = iscoroutinefunction(get_response)
+        if self.async_mode:
+            markcoroutinefunction(self)
+
+    def sampled(self):
+        return self.sample_rate >= 1 or random.random() < self.sample_rate
+
+    @staticmethod
+    def wrap_connections(stack, profile):
+        for connection in connections.all():
+            stack.enter_context(connection.execute_wrapper(profile))
+
+    def __call__(self, request):
+        if self.async_mode:
+            return self.__acall__(request)
+        if not self.sampled():
+            return self.get_response(request)
+
+        profile = RequestProfile()
+        token = _current_profile.set(profile)
+        started = time.perf_counter()
+        try:
+            with ExitStack() as stack:
+                self.wrap_connections(stack, profile)
+                response = self.get_response(request)
+        finally:
+            _current_profile.reset(token)
+        return self.finish(request, response, profile, time.perf_counter() - started)
+
+    async def __acall__(self, request):
+        if not self.sampled():
+            return await self.get_response(request)
+
+        profile = RequestProfile()
+        token = _current_profile.set(profile)
+        started = time.perf_counter()
+        # Соединения с базой у async ORM живут в потоке sync_to_async
+        # (один на запрос): обёртки ставятся и снимаются в нём же
+        stack = ExitStack()
+        try:
+            await sync_to_async(self.wrap_connections)(stack, profile)
+            response = await self.get_response(request)
+        finally:
+            await sync_to_async(stack.close)()
+            _current_profile.reset(token)
+        return self.finish(request, response, profile, time.perf_counter() - started)
+
+    def finish(self, request, response, profile, total):
+        if self.header:
+            response['Server-Timing'] = profile.server_timing(total)
+        if self.log:
+            data = {'method': request.method, 'path': request.path,
+                    'status': response.status_code, **profile.as_dict(total)}
+            logger.info(json.dumps(data, ensure_ascii=False),
+                        extra={'profile': data})
+        return response
+
+    def process_template_response(self, request, response):
+        # Вызывается прямо перед render() ответа DRF
+        profile = _current_profile.get()
+        if profile is not None:
+            profile.begin('render')
+            response.add_post_render_callback(lambda rendered: profile.end())
+        return response
+
+
+class ProfilingMixin:
+    """DRF-хуки фаз для APIView и ViewSet."""
+
+    def perform_authentication(self, request):
+        with phase('auth'):
+            super().perform_authentication(request)
+
+    def check_permissions(self, request):
+        with phase('permission'):
+            super().check_permissions(request)
+
+    def check_object_permissions(self, request, obj):
+        with phase('permission'):
+            super().check_object_permissions(request, obj)
+
+    def get_object(self):
+        with phase('queryset'):
+            return super().get_object()
+
+    def paginate_queryset(self, queryset):
+        with phase('queryset'):
+            return super().paginate_queryset(queryset)
+
+    def initial(self, request, *args, **kwargs):
+        super().initial(request, *args, **kwargs)
+        profile = _current_profile.get()
+        if profile is not None:
+            # Обработчик view: закрывается в finalize_response
+            profile.begin('serialize')
+            self._profiling_handler = profile
+
+    def finalize_response(self, request, response, *args, **kwargs):
+        profile = getattr(self, '_profiling_handler', None)
+        if profile is not None:
+            profile.end()
+            self._profiling_handler = None
+        return super().finalize_response(request, response, *args, **kwargs)
@@ -0,0 +1,114 @@
+"""
+Начальные данные RBAC: роли и правила доступа по умолчанию.
+
+Используется командами setup_system и sync_access. Всё считается
+пакетно: существующие записи читаются одним запросом, недостающие
+создаются через bulk_create.
+"""
+from django.contrib.contenttypes.models import ContentType
+from django.db import transaction
+
+from . import response_cache
+from .access_cache import access_rules
+from .models import AccessRule, Role
+
+# Приложения, для моделей которых правила не создаются
+SYSTEM_APPS = ('contenttypes', 'admin', 'auth', 'sessions',
+               'token_blacklist', 'users')
+
+ROLE_DESCRIPTIONS = dict(Role.ROLE_CHOICES)
+
+# Шаблон прав по умолчанию
+DEFAULT_PERMISSIONS = {
+    # Админ — всё может
+    Role.ADMIN: {
+        'read_permission': True,
+        'create_permission': True,
+        'update_permission': True,
+        'delete_permission': True,
+        'read_all_permission': True,
+        'update_all_permission': True,
+        'delete_all_permission': True,
+    },
+    # Менеджер — видит и редактирует все, удаляет свои
+    Role.MANAGER: {
+        'read_permission': True,
+        'create_permission': True,
+        'update_permission': True,
+        'delete_permission': True,
+        'read_all_permission': True,
+        'update_all_permission': True,
+        'delete_all_permission': False,
+    },
+    # Пользователь — видит и редактирует только свои
+    Role.USER: {
+        'read_permission': True,
+        'create_permission': True,
+        'update_permission': True,
+        'delete_permission': True,
+        'read_all_permission': False,
+        'update_all_permission': False,
+        'delete_all_permission': False,
+    },
+}
+
+
+def ensure_roles(names=None, dry_run=False):
+    """
+    Роли по именам (по умолчанию все стандартные): один SELECT
+    и один bulk_create для недостающих. Возвращает (роли, созданные роли);
+    при dry_run недостающие роли не сохраняются (pk=None).
+    """
+    names = list(names or DEFAULT_PERMISSIONS)
+    roles = {role.name: role for role in Role.objects.filter(name__in=names)}
+    missing = [Role(name=name, description=ROLE_DESCRIPTIONS.get(name, ''))
+               for name in names if name not in roles]
+    if missing and not dry_run:
+        Role.objects.bulk_create(missing)
+        if any(role.pk is None for role in missing):
+            # pk после bulk_create возвращают не все СУБД: перечитываем
+            roles = {role.name: role for role in Role.objects.filter(name__in=names)}
+    roles.update((role.name, role) for role in missing if role.name not in roles)
+    return [roles[name] for name in names], missing
+
+
+def rule_content_types(apps=None):
+    """ContentType моделей, для которых нужны правила."""
+    content_types = []
+    for ct in ContentType.objects.all():
+        model = ct.model_class()
+        if model is None or ct.app_label in SYSTEM_APPS:
+            continue
+        if apps and ct.app_label not in apps:
+            continue
+        content_types.append(ct)
+    return content_types
+
+
+def missing_access_rules(roles, content_types):
+    """
+    Недостающие правила для всех пар (роль, тип): существующие пары
+    читаются одним запросом, разница считается в памяти.
+    """
+    existing = set(AccessRule.objects.filter(
+        role__in=[role for role in roles if role.pk is not None],
+        content_type__in=content_types,
+    ).values_list('role_id', 'content_type_id'))
+    return [
+        AccessRule(role=role, content_type=ct,
+                   **DEFAULT_PERMISSIONS.get(role.name, {}))
+        for role in roles
+        for ct in content_types
+        if (role.pk, ct.pk) not in existing
+    ]
+
+
+def create_access_rules(rules):
+    """
+    Создаёт правила одним bulk_create. bulk_create не вызывает сигналы,
+    поэтому кеш правил и кеш ответов сбрасываются явно.
+    """
+    if rules:
+        AccessRule.objects.bulk_create(rules, ignore_conflicts=True)
+        transaction.on_commit(access_rules.invalidate)
+        transaction.on_commit(response_cache.invalidate)
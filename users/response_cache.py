@@ -0,0 +1,179 @@
+"""
+Кеш ответов списков в памяти процесса: повторный запрос
+не выполняет запросы к базе и сериализацию.
+
+Ключ — (модель, область, адрес запроса, версия данных):
+    область — ('role', role_id) при read_all_permission (список
+              одинаков для всей роли) или ('user', user_id) для чтения
+              только своих объектов;
+    адрес   — схема, хост и путь с параметрами: ссылки next/previous
+              в ответе абсолютные;
+    версия  — поколения в общем кеше Django: своё у модели
+              и общее для всех моделей.
+
+Сигналы на модели (users.signals) и пакетные операции, которые сигналов
+не отправляют, меняют поколение модели после фиксации транзакции;
+изменение AccessRule и Role — общее поколение. Старые записи не
+удаляются, а перестают совпадать по ключу и вытесняются LRU.
+
+Размер кеша ограничен суммой длин JSON-тел ответов (MAX_BYTES) и числом
+записей (MAX_ENTRIES). Попадания и промахи учитываются в stats()
+и в метрике response_cache_total.
+
+Поколения должны быть видны всем процессам: с кешем в памяти процесса
+(LocMemCache) изменения в другом воркере не сбрасывали бы ответы,
+поэтому кеш ответов отключается.
+
+Настройки (settings.RESPONSE_CACHE):
+    ENABLED     — кешировать ответы
+    MAX_BYTES   — максимум байт тел ответов в кеше процесса
+    MAX_ENTRIES — максимум записей
+"""
+import json
+import threading
+import time
+from collections import OrderedDict
+
+from django.conf import settings
+from django.core.cache import cache
+from rest_framework.response import Response
+
+from .metrics import response_cache_lookups
+from .shared_cache import bump, is_shared_cache
+
+DEFAULTS = {
+    'ENABLED': True,
+    'MAX_BYTES': 32 * 1024 * 1024,
+    'MAX_ENTRIES': 1000,
+}
+
+GENERATION_KEY = 'response_cache:generation:{}'
+# Поколение для всех моделей (изменение прав доступа)
+ALL_MODELS = '*'
+
+
+def get_options():
+    return {**DEFAULTS, **getattr(settings, 'RESPONSE_CACHE', {})}
+
+
+def _generation_key(model):
+    label = ALL_MODELS if model is None else model._meta.label_lower
+    return GENERATION_KEY.format(label)
+
+
+def get_version(model):
+    """Версия данных модели: (поколение модели, общее поколение)."""
+    keys = [_generation_key(model), _generation_key(None)]
+    generations = cache.get_many(keys)
+    for key in keys:
+        if key not in generations:
+            # Ключ ещё не создан или вытеснен: новое поколение не совпадёт со старым
+            cache.add(key, time.time_ns(), timeout=None)
+            generations[key] = cache.get(key)
+    return tuple(generations[key] for key in keys)
+
+
+def invalidate(model=None):
+    """Сбрасывает кешированные ответы модели (None — всех моделей) во всех процессах."""
+    bump(_generation_key(model))
+
+
+class ResponseCache:
+    """LRU ответов: ключ -> (значение, размер в байтах)."""
+
+    def __init__(self):
+        self._entries = OrderedDict()
+        self._bytes = 0
+        self._lock = threading.Lock()
+        self.hits = self.misses = self.evictions = 0
+
+    def get(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self.misses += 1
+            else:
+                self._entries.move_to_end(key)
+                self.hits += 1
+        response_cache_lookups.inc(result='miss' if entry is None else 'hit')
+        return None if entry is None else entry[0]
+
+    def set(self, key, value, size):
+        options = get_options()
+        if size > options['MAX_BYTES']:
+            return
+        with self._lock:
+            if key in self._entries:
+                self._bytes -= self._entries.pop(key)[1]
+            self._entries[key] = (value, size)
+            self._bytes += size
+            evicted = 0
+            while (self._bytes > options['MAX_BYTES']
+                   or len(self._entries) > options['MAX_ENTRIES']):
+                _, (_, old_size) = self._entries.popitem(last=False)
+                self._bytes -= old_size
+                evicted += 1
+            self.evictions += evicted
+        if evicted:
+            response_cache_lookups.inc(evicted, result='evict')
+
+    def stats(self):
+        with self._lock:
+            return {'hits': self.hits, 'misses': self.misses,
+                    'evictions': self.evictions,
+                    'entries': len(self._entries), 'bytes': self._bytes}
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._bytes = 0
+
+    def __len__(self):
+        return len(self._entries)
+
+
+response_cache = ResponseCache()
+
+
+class CachedListMixin:
+    """
+    Кеш ответа list для RBACModelViewSet. Кешируются только JSON-ответы
+    200: данные после сериализации и заголовки. ETag из ConditionalGetMixin
+    сохраняется вместе с ними, поэтому попадание с If-None-Match отвечает
+    304 без запросов к базе. Область ключа — get_cache_scope, как у ETag.
+    """
+    cache_list_responses = True
+
+    def get_list_cache_key(self, request):
+        """Ключ кеша списка или None, если ответ не кешируется."""
+        if (not self.cache_list_responses or not get_options()['ENABLED']
+                or not is_shared_cache()
+                or getattr(request.accepted_renderer, 'format', None) != 'json'):
+            return None
+        # Полный адрес: ссылки next/previous в ответе абсолютные
+        # и зависят от схемы и хоста запроса
+        return (self.model._meta.label_lower, self.get_cache_scope(),
+                request.build_absolute_uri(), get_version(self.model))
+
+    def list(self, request, *args, **kwargs):
+        key = self.get_list_cache_key(request)
+        if key is None:
+            return super().list(request, *args, **kwargs)
+
+        entry = response_cache.get(key)
+        if entry is None:
+            response = super().list(request, *args, **kwargs)
+            if response.status_code == 200:
+                body = request.accepted_renderer.render(
+                    response.data, request.accepted_media_type,
+                    self.get_renderer_context(),
+                )
+                headers = {name: value for name, value in response.items()
+                           if name.lower() != 'content-type'}
+                # Копия без ссылок на сериализатор и объекты; размер — длина тела
+                response_cache.set(key, (json.loads(body), headers), len(body))
+            return response
+
+        data, headers = entry
+        return self.conditional(request, headers.get('ETag'), None,
+                                lambda: Response(data, headers=headers))
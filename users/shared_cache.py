@@ -0,0 +1,46 @@
+"""
+Общий кеш Django (CACHES['default']) как связь между процессами.
+
+Счётчики поколений (например, у таблицы правил доступа) работают, только
+если их видят все воркеры. По умолчанию используется FileBasedCache
+(общий для процессов одной машины), для нескольких машин нужен Redis
+или Memcached.
+
+Кеш в памяти процесса (LocMemCache, DummyCache) другим воркерам не виден.
+С ним ускорители, которым нужен общий кеш, отключаются и читают базу
+(см. is_shared_cache), а проверка users.W001 предупреждает при запуске.
+
+Поколение сбрасывается записью нового уникального значения (bump), а не
+cache.incr: у FileBasedCache incr — чтение и запись без блокировки, и два
+одновременных сброса из разных процессов дали бы одно приращение.
+"""
+from uuid import uuid4
+
+from django.core.cache import DEFAULT_CACHE_ALIAS, cache, caches
+from django.core.cache.backends.dummy import DummyCache
+from django.core.cache.backends.locmem import LocMemCache
+from django.core.checks import Tags, Warning, register
+
+PROCESS_LOCAL_BACKENDS = (LocMemCache, DummyCache)
+
+
+def is_shared_cache():
+    """False, если кеш по умолчанию живёт в памяти одного процесса."""
+    return not isinstance(caches[DEFAULT_CACHE_ALIAS], PROCESS_LOCAL_BACKENDS)
+
+
+def bump(key):
+    """Новое поколение ключа: значение, не совпадающее ни с одним прежним."""
+    cache.set(key, uuid4().hex, timeout=None)
+
+
+@register(Tags.caches)
+def check_shared_cache(app_configs, **kwargs):
+    if is_shared_cache():
+        return []
+    return [Warning(
+        "Кеш по умолчанию не общий для процессов: кеши, которым нужны общие "
+        "счётчики поколений, отключены и читают базу (users.shared_cache).",
+        hint="Укажите CACHE_BACKEND с общим хранилищем (файлы, Redis, Memcached).",
+        id='users.W001',
+    )]
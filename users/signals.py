@@ -0,0 +1,52 @@
+from django.db import transaction
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+from rest_framework_simplejwt.token_blacklist.models import BlacklistedToken
+
+from . import response_cache
+from .access_cache import access_rules
+from .blacklist_filter import blacklist_filter
+from .models import AccessRule, CustomUser, Element, Role
+from .token_versions import set_token_version
+
+
+@receiver(post_save, sender=AccessRule)
+@receiver(post_delete, sender=AccessRule)
+@receiver(post_save, sender=Role)
+@receiver(post_delete, sender=Role)
+def invalidate_access_rules_on_change(sender, **kwargs):
+    """
+    Сбрасывает таблицу прав после фиксации транзакции,
+    чтобы другие процессы не перечитали незафиксированные данные.
+    """
+    transaction.on_commit(access_rules.invalidate)
+    # Права меняют состав списков любых моделей
+    transaction.on_commit(response_cache.invalidate)
+
+
+@receiver(post_save, sender=Element)
+@receiver(post_delete, sender=Element)
+@receiver(post_save, sender=CustomUser)
+@receiver(post_delete, sender=CustomUser)
+def invalidate_element_responses(sender, **kwargs):
+    """
+    Сбрасывает кешированные списки элементов после фиксации.
+    Пользователи тоже: в списке есть email владельца.
+    """
+    transaction.on_commit(lambda: response_cache.invalidate(Element))
+
+
+@receiver(post_save, sender=CustomUser)
+def remember_token_version(sender, instance, **kwargs):
+    """Публикует актуальную версию токенов пользователя после фиксации."""
+    if 'token_version' in instance.get_deferred_fields():
+        return
+    user_id, version = instance.pk, instance.token_version
+    transaction.on_commit(lambda: set_token_version(user_id, version))
+
+
+@receiver(post_save, sender=BlacklistedToken)
+def notify_token_blacklisted(sender, created, **kwargs):
+    """Процессы догрузят новый jti в фильтр чёрного списка."""
+    if created:
+        transaction.on_commit(blacklist_filter.notify_added)
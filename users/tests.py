@@ -1,2 +1,549 @@
+import json
+import os
+import re
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import timedelta
+from io import StringIO
+from tempfile import NamedTemporaryFile, TemporaryDirectory
+from unittest import mock
+from uuid import uuid4
 
-# Create your tests here.
+from django.contrib.contenttypes.models import ContentType
+from django.core.cache import cache, caches
+from django.core.management import call_command
+from django.db import connection
+from django.test import TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+from rest_framework_simplejwt.exceptions import TokenError
+from rest_framework_simplejwt.settings import api_settings
+from rest_framework_simplejwt.token_blacklist.models import (
+    BlacklistedToken,
+    OutstandingToken,
+)
+
+from my_auth.tokens import CustomRefreshToken
+from users import metrics
+from users.access_cache import AccessRuleTable
+from users.blacklist_filter import BlacklistFilter
+from users.housekeeping import TokenPruner
+from users.importing import UserImporter
+from users.models import AccessRule, CustomUser, Element, Role, TaskLock
+from users.shared_cache import check_shared_cache
+from users.throttling import LoginThrottle, check_login_throttle_store
+
+LOCAL_CACHE = {'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'}}
+
+
+# Общий кеш тестов — во временной папке, а не в django_cache/ проекта
+TEST_CACHE_DIR = TemporaryDirectory(prefix='test-cache-')
+test_cache = override_settings(CACHES={'default': {
+    'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache',
+    'LOCATION': TEST_CACHE_DIR.name,
+}})
+
+
+def setUpModule():
+    test_cache.enable()
+
+
+def tearDownModule():
+    test_cache.disable()
+    TEST_CACHE_DIR.cleanup()
+
+
+class MigrationsTest(TestCase):
+    """
+    Миграции в репозитории соответствуют моделям.
+    """
+
+    def test_no_missing_migrations(self):
+        call_command('makemigrations', '--check', '--dry-run', stdout=StringIO())
+
+
+class SetupSystemTest(TestCase):
+    """
+    setup_system --noinput: применяет миграции и повторно ничего не дублирует.
+    """
+
+    def run_setup(self):
+        call_command('setup_system', '--noinput', '--email', 'admin@example.com',
+                     '--password', 'password123', '--first-name', 'Иван',
+                     stdout=StringIO())
+
+    def test_idempotent(self):
+        self.run_setup()
+        counts = (Role.objects.count(), CustomUser.objects.count(),
+                  Element.objects.count(), AccessRule.objects.count())
+        self.run_setup()
+        self.assertEqual((Role.objects.count(), CustomUser.objects.count(),
+                          Element.objects.count(), AccessRule.objects.count()),
+                         counts)
+        admin = CustomUser.objects.get(email='admin@example.com')
+        self.assertEqual(admin.role.name, Role.ADMIN)
+        self.assertTrue(admin.check_password('password123'))
+
+
+class AccessRuleTableTest(TestCase):
+    """
+    Таблица правил в памяти процесса и её сброс между процессами.
+    Процессы моделируются отдельными экземплярами AccessRuleTable.
+    """
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.role = Role.objects.create(name=Role.USER)
+        cls.content_type = ContentType.objects.get_for_model(Element)
+        cls.rule = AccessRule.objects.create(role=cls.role,
+                                             content_type=cls.content_type,
+                                             read_permission=True)
+
+    def setUp(self):
+        cache.clear()
+
+    def get(self, table):
+        return table.get(self.role.pk, self.content_type.pk)
+
+    def test_change_reaches_other_process(self):
+        writer, reader = AccessRuleTable(), AccessRuleTable()
+        self.assertTrue(self.get(reader).read_permission)
+        with self.assertNumQueries(0):
+            self.assertTrue(self.get(reader).read_permission)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.rule.read_permission = False
+            self.rule.save()
+        self.get(writer)
+
+        self.assertFalse(self.get(reader).read_permission)
+
+    def test_concurrent_invalidations_are_not_lost(self):
+        reader = AccessRuleTable()
+        before = AccessRuleTable._shared_generation()
+        AccessRuleTable().invalidate()
+        self.get(reader)
+
+        # Второй сброс из процесса, прочитавшего поколение до первого:
+        # с incr (чтение + запись) он записал бы то же значение
+        AccessRule.objects.update(read_permission=False)
+        with mock.patch.object(caches['default'], 'get', return_value=before):
+            AccessRuleTable().invalidate()
+        self.assertFalse(self.get(reader).read_permission)
+
+    @override_settings(CACHES=LOCAL_CACHE)
+    def test_process_local_cache_reads_database(self):
+        table = AccessRuleTable()
+        self.assertTrue(self.get(table).read_permission)
+
+        # UPDATE без сигналов: со счётчиком в памяти процесса таблица бы устарела
+        AccessRule.objects.update(read_permission=False)
+        with self.assertNumQueries(1):
+            self.assertFalse(self.get(table).read_permission)
+        self.assertIsNone(table.get(self.role.pk, 0))
+
+    def test_process_local_cache_warning(self):
+        self.assertEqual(check_shared_cache(None), [])
+        with override_settings(CACHES=LOCAL_CACHE):
+            self.assertEqual([message.id for message in check_shared_cache(None)],
+                             ['users.W001'])
+
+
+class SoftDeleteTest(TestCase):
+    """
+    Мягкое удаление блокирует все действующие refresh-токены пакетно:
+    число запросов не зависит от числа токенов.
+    """
+
+    @classmethod
+    def setUpTestData(cls):
+        role = Role.objects.create(name=Role.USER)
+        cls.users = CustomUser.objects.bulk_create(
+            CustomUser(email=f'user{i}@example.com', first_name='Иван', role=role)
+            for i in range(3)
+        )
+
+    def setUp(self):
+        cache.clear()
+
+    def issue_tokens(self, user, count, expires_at=None):
+        expires_at = expires_at or timezone.now() + timedelta(days=1)
+        OutstandingToken.objects.bulk_create(
+            OutstandingToken(user_id=user.pk, jti=uuid4().hex, token='token',
+                             expires_at=expires_at)
+            for _ in range(count)
+        )
+
+    def blacklisted(self, user):
+        return BlacklistedToken.objects.filter(token__user_id=user.pk).count()
+
+    def test_instance_blacklists_all_tokens(self):
+        user = self.users[0]
+        self.issue_tokens(user, 50)
+        # Истёкшие токены в чёрный список не добавляются
+        self.issue_tokens(user, 5, expires_at=timezone.now() - timedelta(days=1))
+        # Уже заблокированный токен не мешает пакетной вставке
+        BlacklistedToken.objects.create(
+            token=OutstandingToken.objects.filter(expires_at__gt=timezone.now()).first()
+        )
+
+        user.soft_delete()
+
+        self.assertEqual(self.blacklisted(user), 50)
+        user.refresh_from_db()
+        self.assertFalse(user.is_active)
+        self.assertIsNotNone(user.deleted_at)
+
+    def test_query_count_does_not_depend_on_tokens(self):
+        self.issue_tokens(self.users[0], 1)
+        self.issue_tokens(self.users[1], 200)
+        with CaptureQueriesContext(connection) as few:
+            CustomUser.objects.filter(pk=self.users[0].pk).soft_delete()
+        with CaptureQueriesContext(connection) as many:
+            CustomUser.objects.filter(pk=self.users[1].pk).soft_delete()
+        self.assertEqual(len(few), len(many))
+
+    def test_queryset_soft_delete(self):
+        for user in self.users:
+            self.issue_tokens(user, 3)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            deleted = CustomUser.objects.filter(pk__in=[self.users[0].pk,
+                                                        self.users[1].pk]).soft_delete()
+
+        self.assertEqual(deleted, 2)
+        self.assertEqual([self.blacklisted(user) for user in self.users], [3, 3, 0])
+        self.assertEqual(list(CustomUser.objects.filter(is_active=True)),
+                         [self.users[2]])
+        # Повторное удаление не трогает уже удалённых
+        self.assertEqual(CustomUser.objects.all().soft_delete(), 1)
+
+
+class TokenPruneTest(TestCase):
+    """
+    Очистка просроченных токенов: прерванный проход продолжается
+    без сохранённого прогресса, аренду берёт один воркер.
+    """
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = CustomUser.objects.create(email='user@example.com',
+                                             first_name='Иван',
+                                             role=Role.objects.create(name=Role.USER))
+
+    def issue_tokens(self, count, days):
+        OutstandingToken.objects.bulk_create(
+            OutstandingToken(user_id=self.user.pk, jti=uuid4().hex, token='token',
+                             expires_at=timezone.now() + timedelta(days=days))
+            for _ in range(count)
+        )
+
+    def test_interrupted_pass_resumes(self):
+        self.issue_tokens(25, days=-1)
+        self.issue_tokens(5, days=1)
+        BlacklistedToken.objects.create(token=OutstandingToken.objects.order_by('id')
+                                        .first())
+
+        first = TokenPruner(batch_size=10, sleep=0, max_batches=1).run()
+        self.assertEqual((first.outstanding, first.blacklisted), (10, 1))
+
+        rest = TokenPruner(batch_size=10, sleep=0).run()
+        self.assertEqual((rest.outstanding, rest.batches), (15, 2))
+        self.assertEqual(OutstandingToken.objects.count(), 5)
+
+    def test_lease_taken_once(self):
+        self.assertTrue(TaskLock.acquire('prune', 60))
+        self.assertFalse(TaskLock.acquire('prune', 60))
+
+        TaskLock.objects.filter(name='prune').update(
+            locked_until=timezone.now() - timedelta(seconds=1)
+        )
+        self.assertTrue(TaskLock.acquire('prune', 60))
+
+    def test_migration_creates_indexes(self):
+        with connection.cursor() as cursor:
+            constraints = connection.introspection.get_constraints(
+                cursor, OutstandingToken._meta.db_table
+            )
+        self.assertTrue({'outstandingtoken_expires_at_idx',
+                         'outstandingtoken_user_expires_idx'} <= set(constraints))
+
+
+class BlacklistFilterTest(TestCase):
+    """
+    Фильтр чёрного списка в нескольких процессах. Процессы моделируются
+    отдельными экземплярами BlacklistFilter.
+    """
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = CustomUser.objects.create(email='user@example.com',
+                                             first_name='Иван',
+                                             role=Role.objects.create(name=Role.USER))
+
+    def setUp(self):
+        cache.clear()
+
+    def issue(self):
+        token = CustomRefreshToken.for_user(self.user)
+        return token, token[api_settings.JTI_CLAIM]
+
+    def test_blacklist_reaches_other_process(self):
+        reader = BlacklistFilter()
+        token, jti = self.issue()
+        self.assertFalse(reader.might_contain(jti))
+
+        with self.captureOnCommitCallbacks(execute=True):
+            token.blacklist()
+
+        self.assertTrue(reader.might_contain(jti))
+        with self.assertRaises(TokenError):
+            CustomRefreshToken(str(token))
+
+    @override_settings(CACHES=LOCAL_CACHE)
+    def test_process_local_cache_checks_database(self):
+        reader = BlacklistFilter()
+        token, jti = self.issue()
+        other_token, other_jti = self.issue()
+        reader.might_contain(other_jti)
+
+        # Вставка в другом процессе: его счётчик версии этому процессу не виден
+        BlacklistedToken.objects.bulk_create([
+            BlacklistedToken(token=OutstandingToken.objects.get(jti=jti))
+        ])
+
+        self.assertTrue(reader.might_contain(jti))
+        with self.assertRaises(TokenError):
+            CustomRefreshToken(str(token))
+        self.assertEqual(CustomRefreshToken(str(other_token))[api_settings.JTI_CLAIM],
+                         other_jti)
+
+
+class ImportUsersTest(TestCase):
+    """
+    Импорт пользователей пачками: ошибки по номерам строк,
+    один bulk_create на пачку.
+    """
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.role = Role.objects.create(name=Role.USER)
+        CustomUser.objects.create(email='taken@example.com', first_name='Иван',
+                                  role=cls.role)
+
+    def rows(self, *emails):
+        return [(line, {'email': email, 'first_name': 'Иван',
+                        'password': 'password123'})
+                for line, email in enumerate(emails, start=2)]
+
+    def test_batches_and_errors(self):
+        rows = self.rows('a@example.com', 'b@example.com', 'taken@example.com',
+                         'a@example.com', 'не email')
+        batches = []
+        result = UserImporter(self.role, batch_size=2).run(
+            rows, on_batch=lambda result: batches.append(result.processed)
+        )
+
+        self.assertEqual(batches, [2, 4, 5])
+        self.assertEqual((result.processed, result.created, result.batches), (5, 2, 3))
+        # Дубликат ищется внутри пачки и среди уже созданных пользователей
+        self.assertEqual([line for line, _ in result.errors], [4, 5, 6])
+        user = CustomUser.objects.get(email='b@example.com')
+        self.assertEqual(user.role, self.role)
+        self.assertTrue(user.check_password('password123'))
+
+    def test_query_count_per_batch(self):
+        importer = UserImporter(self.role, batch_size=10)
+        with CaptureQueriesContext(connection) as small:
+            importer.run(self.rows(*(f'small{i}@example.com' for i in range(2))))
+        with CaptureQueriesContext(connection) as large:
+            importer.run(self.rows(*(f'large{i}@example.com' for i in range(10))))
+        self.assertEqual(len(small), len(large))
+
+    def test_command_reads_ndjson(self):
+        with NamedTemporaryFile('w', suffix='.ndjson', encoding='utf-8') as stream:
+            for _, row in self.rows('c@example.com', 'd@example.com'):
+                stream.write(json.dumps(row) + '\n')
+            stream.write('{broken\n')
+            stream.flush()
+            stdout, stderr = StringIO(), StringIO()
+            call_command('import_users', stream.name, '--workers', '1',
+                         stdout=stdout, stderr=stderr)
+
+        self.assertIn('Создано 2 из 3', stdout.getvalue())
+        self.assertIn('Строка 3', stderr.getvalue())
+        self.assertEqual(CustomUser.objects.filter(email__in=['c@example.com',
+                                                              'd@example.com']).count(),
+                         2)
+
+
+class SyncAccessTest(TestCase):
+    """
+    sync_access: недостающие правила как разность множеств,
+    --dry-run показывает её и ничего не создаёт.
+    """
+
+    def sync(self, *args):
+        stdout = StringIO()
+        with self.captureOnCommitCallbacks(execute=True):
+            call_command('sync_access', *args, stdout=stdout)
+        return stdout.getvalue()
+
+    def test_dry_run_shows_diff(self):
+        output = self.sync('--dry-run', '--apps', 'orders')
+
+        expected = {(role, f'orders.{ct.model}')
+                    for role in (Role.ADMIN, Role.MANAGER, Role.USER)
+                    for ct in ContentType.objects.filter(app_label='orders')}
+        shown = {tuple(line.split(': ', 1)[1].split(' → '))
+                 for line in output.splitlines()
+                 if line.startswith('Будет создан AccessRule')}
+        self.assertEqual(shown, expected)
+        self.assertIn(f'будет добавлено {len(expected)} записей', output)
+        self.assertFalse(Role.objects.exists())
+        self.assertFalse(AccessRule.objects.exists())
+
+    def test_creates_only_missing(self):
+        self.sync('--roles', Role.USER, '--apps', 'orders')
+        count = AccessRule.objects.count()
+        self.assertEqual(list(Role.objects.values_list('name', flat=True)), [Role.USER])
+        self.assertEqual(count, ContentType.objects.filter(app_label='orders').count())
+
+        output = self.sync('--dry-run', '--apps', 'orders')
+        self.assertNotIn(f'Будет создан AccessRule: {Role.USER}', output)
+        self.assertIn(f'будет добавлено {count * 2} записей', output)
+
+        self.assertIn('Новых моделей не найдено',
+                      self.sync('--roles', Role.USER, '--apps', 'orders'))
+        self.assertEqual(AccessRule.objects.count(), count)
+
+
+@override_settings(REQUEST_PROFILING={'ENABLED': True, 'SAMPLE_RATE': 1,
+                                      'HEADER': True, 'LOG': False},
+                   LOGIN_THROTTLE={'ENABLED': False})
+class RequestProfilingTest(TestCase):
+    """
+    Server-Timing в sync и async цепочке middleware: запросы к базе
+    учитываются и у async ORM.
+    """
+    LOGIN = {'email': 'nobody@example.com', 'password': 'password123'}
+
+    def setUp(self):
+        cache.clear()
+
+    def queries(self, response):
+        match = re.search(r'db;dur=[\d.]+;desc="(\d+) queries"',
+                          response['Server-Timing'])
+        return int(match[1])
+
+    def test_sync_view(self):
+        response = self.client.post('/api/login/', self.LOGIN,
+                                    content_type='application/json')
+        self.assertEqual(response.status_code, 400)
+        self.assertGreaterEqual(self.queries(response), 1)
+
+    async def test_async_view(self):
+        response = await self.async_client.post('/api/async/login/', self.LOGIN,
+                                                content_type='application/json')
+        self.assertEqual(response.status_code, 400)
+        self.assertGreaterEqual(self.queries(response), 1)
+        self.assertIn('total;dur=', response['Server-Timing'])
+
+
+class MetricsEndpointTest(TestCase):
+    """
+    /metrics: без токена закрыт при DEBUG=False, число токенов
+    переиспользуется в пределах SCRAPE_INTERVAL.
+    """
+
+    def setUp(self):
+        metrics._token_counts = (None, None)
+
+    def test_closed_without_token(self):
+        self.assertEqual(self.client.get('/metrics').status_code, 404)
+        with override_settings(DEBUG=True):
+            self.assertEqual(self.client.get('/metrics').status_code, 200)
+
+    @override_settings(METRICS={'TOKEN': 's3cret'})
+    def test_token_required(self):
+        self.assertEqual(self.client.get('/metrics').status_code, 401)
+        response = self.client.get('/metrics', HTTP_AUTHORIZATION='Bearer s3cret')
+        self.assertEqual(response.status_code, 200)
+        self.assertIn(b'jwt_outstanding_tokens', response.content)
+
+    @override_settings(METRICS={'SCRAPE_INTERVAL': 60})
+    def test_token_counts_cached(self):
+        with self.assertNumQueries(2):
+            metrics.token_counts({})
+        with self.assertNumQueries(0):
+            metrics.token_counts({})
+
+        metrics._token_counts = (time.monotonic() - 60, None)
+        with self.assertNumQueries(2):
+            metrics.token_counts({})
+
+
+class LoginThrottleTest(TestCase):
+    """
+    Лимиты попыток входа: счётчик увеличивается до проверки,
+    отклонённые попытки вычитаются, 429 с Retry-After.
+    """
+    RATES = {'email': '3/m', 'ip': None, 'global': None}
+
+    def setUp(self):
+        cache.clear()
+        directory = TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.path = os.path.join(directory.name, 'throttle.sqlite3')
+
+    def options(self, store='sqlite'):
+        return {'STORE': store, 'PATH': self.path, 'RATES': self.RATES}
+
+    def test_limit_for_each_store(self):
+        # Начало минутного окна: предыдущее окно пустое
+        now = (time.time() // 60 + 1) * 60 + 1
+        for store in ('sqlite', 'memory', 'cache'):
+            with self.subTest(store=store), \
+                    override_settings(LOGIN_THROTTLE=self.options(store)):
+                throttle = LoginThrottle()
+                self.assertEqual([throttle.check(store, 'ip', now=now)
+                                  for _ in range(4)], [None, None, None, 59])
+                # Отклонённые попытки не копятся: в окне ровно три
+                self.assertEqual(throttle.check(store, 'ip', now=now), 59)
+                self.assertIsNone(throttle.check(store, 'ip', now=now + 60))
+
+    def test_concurrent_attempts(self):
+        # Каждый поток — отдельный процесс со своим LoginThrottle
+        with override_settings(LOGIN_THROTTLE=self.options()):
+            LoginThrottle().check('warmup', 'ip')
+            with ThreadPoolExecutor(8) as executor:
+                results = list(executor.map(
+                    lambda _: LoginThrottle().check('user@example.com', 'ip'),
+                    range(20),
+                ))
+        self.assertEqual(results.count(None), 3)
+
+    def test_retry_after(self):
+        login = {'email': 'user@example.com', 'password': 'wrong-password'}
+        with override_settings(LOGIN_THROTTLE=self.options()):
+            statuses = [self.client.post('/api/login/', login,
+                                         content_type='application/json').status_code
+                        for _ in range(4)]
+            response = self.client.post('/api/login/', login,
+                                        content_type='application/json')
+        self.assertNotIn(429, statuses[:3])
+        self.assertEqual(statuses[3], 429)
+        self.assertEqual(response.status_code, 429)
+        self.assertTrue(1 <= int(response['Retry-After']) <= 60)
+
+    def test_process_local_store_warning(self):
+        def warnings():
+            return [message.id for message in check_login_throttle_store(None)]
+
+        with override_settings(LOGIN_THROTTLE=self.options()):
+            self.assertEqual(warnings(), [])
+        with override_settings(LOGIN_THROTTLE=self.options('memory')):
+            self.assertEqual(warnings(), ['users.W002'])
+        with override_settings(LOGIN_THROTTLE=self.options('cache'),
+                               CACHES=LOCAL_CACHE):
+            self.assertEqual(warnings(), ['users.W002'])
@@ -0,0 +1,294 @@
+"""
+Ограничение частоты попыток входа.
+
+Скользящее окно по трём счётчикам: на email, на IP клиента и общий.
+Проверка выполняется до поиска пользователя и хеширования пароля,
+поэтому перебор паролей не занимает пул bcrypt: лишние попытки
+получают 429 с заголовком Retry-After. Отклонённые попытки
+не увеличивают счётчики, так что общий лимит не держит закрытым
+вход для остальных пользователей, пока идёт атака.
+
+Счётчик сначала увеличивается, и решение принимается по значению,
+которое вернуло само хранилище: параллельные запросы не проходят
+проверку по одному и тому же старому значению. Отклонённая попытка
+затем вычитается обратно.
+
+Скользящее окно считается по двум соседним фиксированным окнам:
+    оценка = текущее + предыдущее * (доля предыдущего окна в скользящем)
+
+Хранилища счётчиков (settings.LOGIN_THROTTLE['STORE']):
+    sqlite — файл SQLite PATH, общий для процессов одной машины
+             (по умолчанию; увеличение — один UPSERT ... RETURNING)
+    cache  — кеш Django (CACHES['default']); атомарен с Redis
+             и Memcached, но не с файловым кешем
+    memory — словарь в памяти процесса (один процесс)
+С хранилищем, не общим для процессов, каждый воркер считает свои
+попытки и лимит фактически умножается на число воркеров; проверка
+users.W002 предупреждает об этом при запуске.
+
+Настройки (settings.LOGIN_THROTTLE):
+    ENABLED — включить ограничение
+    STORE   — хранилище счётчиков
+    PATH    — файл для STORE='sqlite'
+    RATES   — лимиты {'email': '10/m', 'ip': '30/m', 'global': '600/m'};
+              None отключает счётчик
+"""
+import hashlib
+import os
+import sqlite3
+import threading
+import time
+
+from django.conf import settings
+from django.core.cache import cache
+from django.core.checks import Tags, Warning, register
+from rest_framework.throttling import BaseThrottle
+
+from .metrics import login_attempts
+from .shared_cache import is_shared_cache
+
+DEFAULTS = {
+    'ENABLED': True,
+    'STORE': 'sqlite',
+    'PATH': 'login_throttle.sqlite3',
+    'RATES': {'email': '10/m', 'ip': '30/m', 'global': '600/m'},
+}
+
+PERIODS = {'s': 1, 'm': 60, 'h': 3600, 'd': 86400}
+
+
+def parse_rate(rate):
+    """'10/m' -> (10, 60), как в DRF: учитывается первая буква периода."""
+    if rate is None:
+        return None
+    count, period = rate.split('/')
+    return int(count), PERIODS[period[0]]
+
+
+class CacheStore:
+    """Счётчики в кеше Django."""
+
+    def get_many(self, keys):
+        return cache.get_many(keys)
+
+    def incr(self, key, timeout):
+        """Увеличивает счётчик и возвращает новое значение."""
+        if cache.add(key, 1, timeout=timeout):
+            return 1
+        try:
+            return cache.incr(key)
+        except ValueError:
+            # Ключ истёк между add и incr
+            cache.add(key, 1, timeout=timeout)
+            return 1
+
+    def decr(self, key):
+        try:
+            cache.decr(key)
+        except ValueError:
+            pass
+
+
+class MemoryStore:
+    """Счётчики в памяти процесса; истёкшие удаляются при росте словаря."""
+
+    def __init__(self, max_entries=10000):
+        self.max_entries = max_entries
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def get_many(self, keys):
+        now = time.monotonic()
+        with self._lock:
+            values = {key: self._values.get(key) for key in keys}
+        return {key: value[0] for key, value in values.items()
+                if value is not None and value[1] > now}
+
+    def incr(self, key, timeout):
+        now = time.monotonic()
+        with self._lock:
+            count, expires = self._values.get(key, (0, 0))
+            if expires <= now:
+                count = 0
+            self._values[key] = (count + 1, now + timeout)
+            if len(self._values) > self.max_entries:
+                self._values = {key: value for key, value in self._values.items()
+                                if value[1] > now}
+        return count + 1
+
+    def decr(self, key):
+        with self._lock:
+            count, expires = self._values.get(key, (0, 0))
+            if count > 0:
+                self._values[key] = (count - 1, expires)
+
+
+class SQLiteStore:
+    """
+    Счётчики в файле SQLite: общие для процессов одной машины
+    без отдельного сервиса. Соединение своё у каждого потока.
+    """
+
+    def __init__(self, path, cleanup_every=1000):
+        self.path = path
+        self.cleanup_every = cleanup_every
+        self._local = threading.local()
+        self._writes = 0
+
+    @property
+    def connection(self):
+        # После fork соединение родителя использовать нельзя
+        if getattr(self._local, 'pid', None) != os.getpid():
+            connection = sqlite3.connect(self.path, timeout=5, isolation_level=None)
+            connection.execute('PRAGMA journal_mode=WAL')
+            connection.execute('CREATE TABLE IF NOT EXISTS login_throttle ('
+                               'key TEXT PRIMARY KEY, count INTEGER NOT NULL, '
+                               'expires REAL NOT NULL)')
+            self._local.connection = connection
+            self._local.pid = os.getpid()
+        return self._local.connection
+
+    def get_many(self, keys):
+        placeholders = ','.join('?' * len(keys))
+        rows = self.connection.execute(
+            f'SELECT key, count FROM login_throttle '
+            f'WHERE key IN ({placeholders}) AND expires > ?',
+            [*keys, time.time()],
+        )
+        return dict(rows)
+
+    def incr(self, key, timeout):
+        now = time.time()
+        # RETURNING (SQLite 3.35+): новое значение из того же UPSERT
+        (count,) = self.connection.execute(
+            'INSERT INTO login_throttle (key, count, expires) VALUES (?, 1, ?) '
+            'ON CONFLICT(key) DO UPDATE SET '
+            'count = CASE WHEN expires > ? THEN count + 1 ELSE 1 END, '
+            'expires = excluded.expires '
+            'RETURNING count',
+            (key, now + timeout, now),
+        ).fetchone()
+        self._writes += 1
+        if self._writes % self.cleanup_every == 0:
+            self.connection.execute('DELETE FROM login_throttle WHERE expires <= ?',
+                                    (now,))
+        return count
+
+    def decr(self, key):
+        self.connection.execute(
+            'UPDATE login_throttle SET count = count - 1 WHERE key = ? AND count > 0',
+            (key,),
+        )
+
+
+class LoginThrottle:
+    """Проверка и учёт попыток входа по настройкам LOGIN_THROTTLE."""
+
+    def __init__(self):
+        self._stores = {}
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def get_options():
+        return {**DEFAULTS, **getattr(settings, 'LOGIN_THROTTLE', {})}
+
+    def get_store(self, options):
+        name = options['STORE']
+        key = (name, options['PATH'])
+        store = self._stores.get(key)
+        if store is None:
+            with self._lock:
+                store = self._stores.get(key)
+                if store is None:
+                    if name == 'cache':
+                        store = CacheStore()
+                    elif name == 'memory':
+                        store = MemoryStore()
+                    elif name == 'sqlite':
+                        store = SQLiteStore(options['PATH'])
+                    else:
+                        raise ValueError(f"Неизвестное хранилище счётчиков: {name}")
+                    self._stores[key] = store
+        return store
+
+    @staticmethod
+    def _digest(value):
+        # В ключах нет email и IP в открытом виде
+        return hashlib.sha256(value.encode()).hexdigest()[:32]
+
+    def check(self, email, ident, now=None):
+        """
+        Учитывает попытку входа. Возвращает None, если попытка разрешена,
+        иначе — сколько секунд подождать.
+        """
+        options = self.get_options()
+        if not options['ENABLED']:
+            return None
+        now = time.time() if now is None else now
+        identities = {'email': self._digest((email or '').strip().lower()),
+                      'ip': self._digest(ident or ''),
+                      'global': ''}
+
+        windows = []
+        for scope, rate in options['RATES'].items():
+            parsed = parse_rate(rate)
+            if parsed is None:
+                continue
+            limit, period = parsed
+            index = int(now // period)
+            prefix = f'login_throttle:{scope}:{identities[scope]}'
+            windows.append((limit, period, index,
+                            f'{prefix}:{index}', f'{prefix}:{index - 1}'))
+        if not windows:
+            return None
+
+        store = self.get_store(options)
+        # Предыдущие окна уже закрыты и не меняются
+        previous_counts = store.get_many([window[4] for window in windows])
+        wait = None
+        for limit, period, index, current, previous in windows:
+            # Ключ нужен ещё одно окно — как предыдущее; earlier — попытки
+            # до этой, включая параллельные, успевшие увеличить счётчик раньше
+            earlier = store.incr(current, timeout=2 * period) - 1
+            # Доля предыдущего окна, ещё попадающая в скользящее окно
+            weight = 1 - (now - index * period) / period
+            if earlier + previous_counts.get(previous, 0) * weight >= limit:
+                wait = max(wait or 0, (index + 1) * period - now)
+        if wait is not None:
+            # Отклонённая попытка не учитывается
+            for window in windows:
+                store.decr(window[3])
+            login_attempts.inc(outcome='throttled')
+            return wait
+        return None
+
+
+login_throttle = LoginThrottle()
+
+
+@register(Tags.security)
+def check_login_throttle_store(app_configs, **kwargs):
+    options = LoginThrottle.get_options()
+    store = options['STORE']
+    if not options['ENABLED'] or store == 'sqlite':
+        return []
+    if store == 'cache' and is_shared_cache():
+        return []
+    return [Warning(
+        f"Счётчики попыток входа (LOGIN_THROTTLE STORE={store!r}) не общие "
+        "для процессов: каждый воркер применяет лимиты отдельно.",
+        hint="Используйте STORE='sqlite' или 'cache' с общим кешем.",
+        id='users.W002',
+    )]
+
+
+class LoginRateThrottle(BaseThrottle):
+    """DRF-throttle для представления логина (до сериализатора и bcrypt)."""
+
+    def allow_request(self, request, view):
+        email = request.data.get('email') if hasattr(request.data, 'get') else None
+        self.delay = login_throttle.check(str(email or ''), self.get_ident(request))
+        return self.delay is None
+
+    def wait(self):
+        return self.delay
@@ -0,0 +1,128 @@
+"""
+Кеш проверенных JWT в памяти процесса.
+
+Проверка подписи HS256 и разбор claims выполняются один раз на токен:
+повторные запросы с тем же токеном (JWTAuthentication, /api/token/verify/)
+берут claims из LRU по SHA-256 токена. Запись живёт до exp токена
+и удаляется при обращении после истечения.
+
+Кеш заменяет только декодирование. Остальные проверки выполняются
+на каждом запросе, как и раньше: версия токенов пользователя
+(my_auth.authentication) и чёрный список (users.blacklist_filter),
+поэтому soft delete, смена пароля и логаут в другом процессе
+не обходятся кешированными claims. В своём процессе записи
+пользователя удаляются сразу (forget_users).
+
+Настройки (settings.TOKEN_VERIFY_CACHE):
+    ENABLED     — использовать кеш
+    MAX_ENTRIES — максимум токенов в кеше
+"""
+import hashlib
+import threading
+import time
+from collections import OrderedDict
+
+from django.conf import settings
+from rest_framework_simplejwt.utils import aware_utcnow
+
+DEFAULTS = {
+    'ENABLED': True,
+    'MAX_ENTRIES': 10000,
+}
+
+# Claim с id пользователя, как my_auth.tokens.USER_ID_CLAIM
+USER_ID_CLAIM = 'user_id'
+
+
+class TokenCache:
+    """LRU проверенных токенов: (класс токена, digest) -> (payload, exp, user_id)."""
+
+    def __init__(self):
+        self._entries = OrderedDict()
+        self._by_user = {}
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def get_options():
+        return {**DEFAULTS, **getattr(settings, 'TOKEN_VERIFY_CACHE', {})}
+
+    @staticmethod
+    def _key(token_class, raw_token):
+        if isinstance(raw_token, str):
+            raw_token = raw_token.encode()
+        return token_class.__qualname__, hashlib.sha256(raw_token).digest()
+
+    def _discard(self, key):
+        payload, exp, user_id = self._entries.pop(key)
+        keys = self._by_user.get(user_id)
+        if keys is not None:
+            keys.discard(key)
+            if not keys:
+                del self._by_user[user_id]
+
+    def validate(self, token_class, raw_token):
+        """
+        Токен token_class из строки raw_token. Проверенный ранее токен
+        восстанавливается из кеша без декодирования, иначе проверяется
+        конструктором класса (TokenError — как и без кеша).
+        """
+        options = self.get_options()
+        if not options['ENABLED']:
+            return token_class(raw_token)
+
+        key = self._key(token_class, raw_token)
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                if entry[1] > time.time():
+                    self._entries.move_to_end(key)
+                    return self._restore(token_class, raw_token, entry[0])
+                self._discard(key)
+
+        token = token_class(raw_token)
+        exp = token.payload.get('exp')
+        if exp is None:
+            return token
+        user_id = token.payload.get(USER_ID_CLAIM)
+        with self._lock:
+            if key in self._entries:
+                self._discard(key)
+            self._entries[key] = (dict(token.payload), exp, user_id)
+            if user_id is not None:
+                self._by_user.setdefault(user_id, set()).add(key)
+            while len(self._entries) > options['MAX_ENTRIES']:
+                self._discard(next(iter(self._entries)))
+        return token
+
+    @staticmethod
+    def _restore(token_class, raw_token, payload):
+        # Объект токена без повторной проверки: как после __init__
+        token = token_class.__new__(token_class)
+        token.token = raw_token
+        token.current_time = aware_utcnow()
+        token.payload = dict(payload)
+        return token
+
+    def forget(self, token_class, raw_token):
+        with self._lock:
+            key = self._key(token_class, raw_token)
+            if key in self._entries:
+                self._discard(key)
+
+    def forget_users(self, user_ids):
+        """Удаляет из кеша процесса все токены пользователей."""
+        with self._lock:
+            for user_id in user_ids:
+                for key in list(self._by_user.get(user_id, ())):
+                    self._discard(key)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._by_user.clear()
+
+    def __len__(self):
+        return len(self._entries)
+
+
+token_cache = TokenCache()
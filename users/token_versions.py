@@ -0,0 +1,72 @@
+"""
+Хранилище актуальных версий токенов пользователей.
+
+Версия лежит в общем кеше Django, поэтому её видят все процессы.
+Если версия из claims токена совпадает с версией в хранилище, данным
+токена можно доверять без запроса к базе.
+
+Кеш в памяти процесса (LocMemCache) другие воркеры не видят: после смены
+пароля, роли или soft delete они принимают старый токен, пока не истечёт
+их запись. Поэтому с таким кешем версия хранится не дольше
+TOKEN_VERSION_LOCAL_CACHE_TIMEOUT секунд — это и есть окно, в которое
+отозванный доступ ещё может сработать в другом процессе.
+
+Новую версию после фиксации изменения записывает тот, кто её увеличил
+(set_token_version, set_token_versions). Версия, прочитанная из базы при
+проверке токена, записывается через remember_token_version: только если
+ключа нет или в нём версия старше. Иначе медленный запрос, прочитавший
+строку до смены роли или soft delete, вернул бы в кеш старую версию.
+"""
+from django.conf import settings
+from django.core.cache import cache
+
+from .shared_cache import is_shared_cache
+
+KEY_TEMPLATE = 'token_version:{}'
+
+
+def _timeout():
+    if not is_shared_cache():
+        return getattr(settings, 'TOKEN_VERSION_LOCAL_CACHE_TIMEOUT', 5)
+    return getattr(settings, 'TOKEN_VERSION_CACHE_TIMEOUT', 24 * 60 * 60)
+
+
+def get_token_version(user_id):
+    """Версия из хранилища или None, если её там нет."""
+    return cache.get(KEY_TEMPLATE.format(user_id))
+
+
+def set_token_version(user_id, version):
+    """Публикует версию после фиксации её изменения."""
+    cache.set(KEY_TEMPLATE.format(user_id), version, timeout=_timeout())
+
+
+def set_token_versions(versions):
+    """set_token_version для словаря {user_id: версия}."""
+    cache.set_many({KEY_TEMPLATE.format(user_id): version
+                    for user_id, version in versions.items()}, timeout=_timeout())
+
+
+def remember_token_version(user_id, version):
+    """Версия, прочитанная из базы: не затирает более новую в хранилище."""
+    key = KEY_TEMPLATE.format(user_id)
+    if cache.add(key, version, timeout=_timeout()):
+        return
+    current = cache.get(key)
+    if current is not None and current < version:
+        cache.set(key, version, timeout=_timeout())
+
+
+async def aget_token_version(user_id):
+    """Асинхронный вариант get_token_version."""
+    return await cache.aget(KEY_TEMPLATE.format(user_id))
+
+
+async def aremember_token_version(user_id, version):
+    """Асинхронный вариант remember_token_version."""
+    key = KEY_TEMPLATE.format(user_id)
+    if await cache.aadd(key, version, timeout=_timeout()):
+        return
+    current = await cache.aget(key)
+    if current is not None and current < version:
+        await cache.aset(key, version, timeout=_timeout())
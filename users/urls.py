@@ -1,7 +1,7 @@
 from django.urls import include, path
 from rest_framework.routers import DefaultRouter
 
-from .views import AccessRuleViewSet
+from .views import AccessRuleViewSet, metrics_view
 
 router = DefaultRouter()
 router.register(r'access-rules', AccessRuleViewSet, basename='access-rule')
@@ -9,5 +9,6 @@ router.register(r'access-rules', AccessRuleViewSet, basename='access-rule')
 
 urlpatterns = [
     path('api/', include(router.urls)),
+    path('metrics', metrics_view, name='metrics'),
 ]
 
@@ -1,4 +1,9 @@
+import hmac
+
+from django.conf import settings
 from django.contrib.contenttypes.models import ContentType
+from django.db import transaction
+from django.http import Http404, HttpResponse
 from rest_framework import viewsets
 from rest_framework.decorators import action
 from rest_framework.permissions import IsAuthenticated
@@ -6,19 +11,35 @@ from rest_framework.response import Response
 
 from my_auth.permissions import IsAdmin
 
+from . import metrics
+from .access_cache import access_rules
+from .conditional import ConditionalGetMixin
 from .models import AccessRule
+from .profiling import ProfilingMixin
 from .serializers import AccessRuleSerializer
 
 
-class AccessRuleViewSet(viewsets.ModelViewSet):
+class AccessRuleViewSet(ProfilingMixin, ConditionalGetMixin, viewsets.ModelViewSet):
     """
     ViewSet для управления правилами доступа (AccessRule).
     Доступ только для авторизованных администраторов.
     """
-    queryset = AccessRule.objects.select_related('role').all()
+    queryset = AccessRule.objects.select_related('role', 'content_type').order_by('id')
     serializer_class = AccessRuleSerializer
     permission_classes = [IsAuthenticated, IsAdmin]
 
+    def perform_create(self, serializer):
+        super().perform_create(serializer)
+        transaction.on_commit(access_rules.invalidate)
+
+    def perform_update(self, serializer):
+        super().perform_update(serializer)
+        transaction.on_commit(access_rules.invalidate)
+
+    def perform_destroy(self, instance):
+        super().perform_destroy(instance)
+        transaction.on_commit(access_rules.invalidate)
+
     @action(detail=False, methods=['get'], url_path='by-model/(?P<model_name>[^/.]+)')
     def by_model(self, request, model_name=None):
         """
@@ -32,3 +53,21 @@ class AccessRuleViewSet(viewsets.ModelViewSet):
         rules = self.queryset.filter(content_type=content_type)
         serializer = self.get_serializer(rules, many=True)
         return Response(serializer.data)
+
+
+def metrics_view(request):
+    """
+    Метрики в формате Prometheus. При заданном METRICS['TOKEN']
+    требуется заголовок Authorization: Bearer <TOKEN>; без токена
+    эндпоинт открыт только при DEBUG=True.
+    """
+    options = metrics.get_options()
+    if not options['ENABLED'] or not (options['TOKEN'] or settings.DEBUG):
+        raise Http404
+    if options['TOKEN']:
+        expected = f"Bearer {options['TOKEN']}".encode()
+        received = request.headers.get('Authorization', '').encode()
+        if not hmac.compare_digest(received, expected):
+            return HttpResponse(status=401)
+    return HttpResponse(metrics.registry.render(),
+                        content_type='text/plain; version=0.0.4; charset=utf-8')